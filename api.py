@@ -0,0 +1,405 @@
+# API HTTP sem interface: pontuação, ROI, benchmarking e relatório PDF para parceiros
+#
+# Uso:
+#   python api.py --porta 8080
+#   python api.py --host 0.0.0.0 --porta 8080 --processos 4 --fila 32
+#
+# Rotas (corpo e respostas em JSON, exceto o PDF):
+#   GET  /perguntas   catálogo de perguntas e opções
+#   POST /pontuacao   {"respostas": {chave: opção} ou "0120..."}  -> resultados do teste
+#   POST /roi         {"entradas": {campo: valor}}                -> resultados do ROI
+#   POST /benchmark   {"setor": ..., "respostas": ...}            -> comparação com o setor
+#   POST /relatorio   {"empresa", "respostas", "entradas_roi", "setor", "graficos"} -> application/pdf
+#   GET  /saude       estado do serviço e da fila de relatórios
+#   GET  /metrics     métricas no formato do Prometheus
+#
+# Pontuação, ROI e benchmarking são cálculos rápidos feitos na própria thread da conexão
+# (conexões persistentes, HTTP/1.1). Os relatórios (gráficos, rasterização e PDF) rodam em um
+# pool de processos; a fila de relatórios tem tamanho máximo e, cheia, a API responde 503 com
+# Retry-After em vez de acumular pedidos. Com FORM_SEGURANCA_API_CHAVE definida, todas as rotas
+# exceto /saude exigem o cabeçalho "Authorization: Bearer <chave>".
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import secrets
+import socket
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from assessment import (
+    CATEGORIES, QUESTIONS, ROI_CHOICE_FIELDS, ROI_INPUT_FIELDS, ROI_INT_FIELDS, YES_NO_OPTIONS,
+    compute_roi_results, compute_vulnerability_results, decode_answers, encode_answers
+)
+from benchmarks import SECTORS, get_benchmark_data, get_confidence_intervals, get_percentile_ranks, get_question_pass_rates, scores_from_results
+from metrics import API_REQUESTS, API_SECONDS, render_metrics
+
+# Variável de ambiente com a chave de acesso da API (sem ela, a API fica aberta)
+API_KEY_ENV = 'FORM_SEGURANCA_API_CHAVE'
+
+# Tamanho máximo do corpo das requisições (bytes)
+MAX_BODY_BYTES = 64 * 1024
+
+# Relatórios aguardando ou em geração, por processo de renderização
+DEFAULT_QUEUE_PER_WORKER = 8
+
+# Tempo máximo de espera por um relatório (segundos)
+REPORT_TIMEOUT = 120
+
+ROUTES = ("/perguntas", "/pontuacao", "/roi", "/benchmark", "/relatorio", "/saude", "/metrics")
+
+QUESTION_CATALOG = [
+    {"chave": q["key"], "categoria": q["category"], "texto": q["text"], "opcoes": q["options"]}
+    for q in QUESTIONS
+]
+
+
+class ApiError(Exception):
+    """Erro com o status HTTP da resposta"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# Função para validar as respostas: {chave: opção} ou a string compacta de índices
+def parse_answers(raw):
+    """Retorna {chave: opção}; ApiError(400) se faltar pergunta ou a opção não existir"""
+    if isinstance(raw, str):
+        if len(raw) != len(QUESTIONS) or any(
+            # Só dígitos ASCII: isdigit() aceita '²' e '٣', que int() não converte
+            digit not in "0123456789" or int(digit) >= len(q["options"]) for q, digit in zip(QUESTIONS, raw)
+        ):
+            raise ApiError(400, f"'respostas' codificadas devem ter {len(QUESTIONS)} índices válidos")
+        return decode_answers(raw)
+    if not isinstance(raw, dict):
+        raise ApiError(400, "'respostas' deve ser um objeto {chave: opção} ou a string codificada")
+
+    answers = {}
+    for q in QUESTIONS:
+        option = raw.get(q["key"])
+        if option not in q["options"]:
+            raise ApiError(400, f"Resposta inválida para '{q['key']}': use uma de {q['options']}")
+        answers[q["key"]] = option
+    return answers
+
+
+# Função para validar as entradas do ROI (campos ausentes assumem o padrão do formulário)
+def parse_roi_inputs(raw):
+    if not isinstance(raw, dict):
+        raise ApiError(400, "'entradas' deve ser um objeto {campo: valor}")
+    unknown = set(raw) - set(ROI_INPUT_FIELDS)
+    if unknown:
+        raise ApiError(400, f"Campos de ROI desconhecidos: {', '.join(sorted(unknown))}")
+
+    inputs = {}
+    for field in ROI_INPUT_FIELDS:
+        value = raw.get(field)
+        if field in ROI_CHOICE_FIELDS:
+            if value is None:
+                value = "Não"
+            elif value not in YES_NO_OPTIONS:
+                raise ApiError(400, f"'{field}' deve ser um de {YES_NO_OPTIONS}")
+        else:
+            # true/false do JSON chegam como bool, que o Python trata como 1/0
+            if isinstance(value, bool):
+                raise ApiError(400, f"'{field}' deve ser um número finito")
+            try:
+                value = (int if field in ROI_INT_FIELDS else float)(0 if value is None else value)
+                # NaN e infinito não são JSON válido na resposta; inteiros enormes não cabem em float
+                finite = math.isfinite(float(value))
+            except (TypeError, ValueError, OverflowError):
+                finite = False
+            if not finite:
+                raise ApiError(400, f"'{field}' deve ser um número finito")
+            if value < 0:
+                raise ApiError(400, f"'{field}' não pode ser negativo")
+        inputs[field] = value
+    return inputs
+
+
+def parse_sector(raw):
+    if raw not in SECTORS:
+        raise ApiError(400, f"'setor' deve ser um de {SECTORS}")
+    return raw
+
+
+# Função para montar a comparação com o setor (mesmo formato de benchmark_results do app)
+def benchmark_comparison(sector, vulnerability_results):
+    company_scores = scores_from_results(vulnerability_results)
+    return {
+        "Company": company_scores,
+        "Industry": dict(get_benchmark_data()[sector]),
+        "IndustryName": sector
+    }
+
+
+# Funções das rotas: recebem o corpo (JSON) e retornam o objeto da resposta
+def handle_score(payload):
+    answers = parse_answers(payload.get("respostas"))
+    return dict(compute_vulnerability_results(answers), respostas_codificadas=encode_answers(answers))
+
+
+def handle_roi(payload):
+    return compute_roi_results(parse_roi_inputs(payload.get("entradas")))
+
+
+def handle_benchmark(payload):
+    sector = parse_sector(payload.get("setor"))
+    vulnerability_results = compute_vulnerability_results(parse_answers(payload.get("respostas")))
+    comparison = benchmark_comparison(sector, vulnerability_results)
+    comparison["Percentis"] = get_percentile_ranks(sector, comparison["Company"])
+    comparison["Intervalos"] = get_confidence_intervals(sector)
+    return comparison
+
+
+# Função para preparar o pedido de relatório (validação e cálculos rápidos no processo da API)
+def report_job(payload):
+    """Retorna os argumentos de _render_report; ApiError(400) se o pedido não tiver nenhuma análise"""
+    company = str(payload.get("empresa") or "Sua Empresa")[:200]
+    vulnerability_results = encoded_answers = roi_results = benchmark_results = None
+
+    if payload.get("respostas") is not None:
+        answers = parse_answers(payload["respostas"])
+        encoded_answers = encode_answers(answers)
+        vulnerability_results = compute_vulnerability_results(answers)
+    if payload.get("entradas_roi") is not None:
+        roi_results = compute_roi_results(parse_roi_inputs(payload["entradas_roi"]))
+    if payload.get("setor") is not None:
+        if vulnerability_results is None:
+            raise ApiError(400, "A comparação com o setor requer 'respostas'")
+        benchmark_results = benchmark_comparison(parse_sector(payload["setor"]), vulnerability_results)
+    if not (vulnerability_results or roi_results):
+        raise ApiError(400, "Informe 'respostas' e/ou 'entradas_roi'")
+
+    charts = None
+    if payload.get("graficos", True):
+        sector = benchmark_results["IndustryName"] if benchmark_results else None
+        charts = {
+            'benchmarks': {name: dict(values) for name, values in get_benchmark_data().items()},
+            'intervalos': {sector: get_confidence_intervals(sector)} if sector else {},
+        }
+    pass_rates = get_question_pass_rates(benchmark_results["IndustryName"]) if benchmark_results else None
+    return company, vulnerability_results, roi_results, benchmark_results, encoded_answers, pass_rates, charts
+
+
+# Função executada nos processos de renderização
+def _render_report(company, vulnerability_results, roi_results, benchmark_results, encoded_answers, pass_rates, charts):
+    from charts import complete_report_figures
+    from reports import complete_report_data, create_pdf_report, report_cache
+
+    all_results, all_vulnerabilities, all_recommendations = complete_report_data(
+        vulnerability_results,
+        roi_results,
+        benchmark_results,
+        encoded_answers=encoded_answers,
+        pass_rates=pass_rates
+    )
+    figures = None
+    if charts is not None:
+        figures = complete_report_figures(
+            vulnerability_results, roi_results, benchmark_results, None, charts['benchmarks'], charts['intervalos']
+        )
+    # Pedidos idênticos (mesmas respostas e figuras) são servidos pelo cache de relatórios
+    return report_cache.get_or_build(
+        create_pdf_report, all_results, all_vulnerabilities, all_recommendations, company, "complete", figures=figures
+    )
+
+
+def _init_worker(image_cache_dir):
+    from reports import set_image_cache_dir
+    set_image_cache_dir(image_cache_dir)
+
+
+class ReportPool:
+    """Pool de processos de renderização com fila limitada (pedidos além do limite são recusados)"""
+
+    def __init__(self, workers, queue_size, image_cache_dir=None):
+        self.queue_size = queue_size
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._pending = 0
+        self._lock = threading.Lock()
+        # 'spawn': os processos não herdam as conexões e threads do servidor
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(image_cache_dir,)
+        )
+
+    def pending(self):
+        return self._pending
+
+    def render(self, job, timeout=REPORT_TIMEOUT):
+        if not self._slots.acquire(blocking=False):
+            raise ApiError(503, "Fila de relatórios cheia, tente novamente em instantes")
+        with self._lock:
+            self._pending += 1
+        try:
+            future = self._pool.submit(_render_report, *job)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            raise ApiError(504, "Tempo esgotado ao gerar o relatório")
+        except Exception as e:
+            raise ApiError(500, f"Erro ao gerar o relatório: {type(e).__name__}")
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def shutdown(self):
+        self._pool.shutdown(cancel_futures=True)
+
+
+def _json_default(value):
+    if hasattr(value, 'item'):
+        return value.item()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FormSegurancaAPI/1.0"
+
+    # Definidos em make_server
+    report_pool = None
+    api_key = None
+
+    def setup(self):
+        super().setup()
+        # Cabeçalhos e corpo saem em escritas separadas; sem TCP_NODELAY, cada resposta em uma
+        # conexão persistente esperaria o ACK atrasado do cliente (~40 ms)
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method):
+        started = time.perf_counter()
+        path = self.path.split('?')[0].rstrip('/') or '/'
+        route = path if path in ROUTES else "outra"
+        try:
+            status, body, content_type = self._route(method, path)
+        except ApiError as e:
+            status, body, content_type = e.status, self._json({"erro": str(e)}), "application/json"
+        except Exception as e:
+            print(f"Erro na API ({path}): {e}")
+            status, body, content_type = 500, self._json({"erro": "Erro interno"}), "application/json"
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if status == 503:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(body)
+        API_REQUESTS.labels(route, status).inc()
+        API_SECONDS.labels(route).observe(time.perf_counter() - started)
+
+    def _route(self, method, path):
+        if path == "/saude" and method == "GET":
+            pending = self.report_pool.pending() if self.report_pool else 0
+            return 200, self._json({"status": "ok", "relatorios_na_fila": pending}), "application/json"
+
+        if self.api_key and not secrets.compare_digest(self.headers.get("Authorization", ""), f"Bearer {self.api_key}"):
+            raise ApiError(401, "Chave de acesso inválida")
+
+        if method == "GET":
+            if path == "/perguntas":
+                return 200, self._json({"categorias": CATEGORIES, "perguntas": QUESTION_CATALOG}), "application/json"
+            if path == "/metrics":
+                return 200, render_metrics().encode('utf-8'), "text/plain; version=0.0.4; charset=utf-8"
+            raise ApiError(404, "Rota não encontrada")
+
+        payload = self._read_json()
+        if path == "/pontuacao":
+            return 200, self._json(handle_score(payload)), "application/json"
+        if path == "/roi":
+            return 200, self._json(handle_roi(payload)), "application/json"
+        if path == "/benchmark":
+            return 200, self._json(handle_benchmark(payload)), "application/json"
+        if path == "/relatorio":
+            if self.report_pool is None:
+                raise ApiError(503, "Geração de relatórios desativada")
+            pdf_data = self.report_pool.render(report_job(payload))
+            return 200, pdf_data, "application/pdf"
+        raise ApiError(404, "Rota não encontrada")
+
+    def _read_json(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            raise ApiError(400, "Content-Length inválido")
+        if length > MAX_BODY_BYTES:
+            # A conexão é encerrada: o corpo não lido não pode ser reaproveitado
+            self.close_connection = True
+            raise ApiError(413, f"Corpo maior que {MAX_BODY_BYTES} bytes")
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            raise ApiError(400, "Corpo não é um JSON válido")
+        if not isinstance(payload, dict):
+            raise ApiError(400, "O corpo deve ser um objeto JSON")
+        return payload
+
+    @staticmethod
+    def _json(data):
+        return json.dumps(data, ensure_ascii=False, default=_json_default).encode('utf-8')
+
+    def log_message(self, format, *args):
+        # Sem uma linha no stdout por requisição (ver as métricas em /metrics)
+        pass
+
+
+# Função para criar o servidor (report_pool=None desativa a rota /relatorio)
+def make_server(host, port, report_pool=None, api_key=None):
+    handler = type("ConfiguredApiHandler", (ApiHandler,), {"report_pool": report_pool, "api_key": api_key})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API HTTP de pontuação, ROI, benchmarking e relatórios PDF.")
+    parser.add_argument('--host', default='127.0.0.1', help="endereço de escuta (padrão: 127.0.0.1)")
+    parser.add_argument('--porta', type=int, default=8080, help="porta (padrão: 8080)")
+    parser.add_argument('--processos', type=int, default=None, help="processos de renderização dos relatórios (padrão: todos os núcleos)")
+    parser.add_argument('--fila', type=int, default=None,
+                        help=f"relatórios aguardando ou em geração antes de recusar (padrão: {DEFAULT_QUEUE_PER_WORKER} por processo)")
+    parser.add_argument('--cache-imagens', default=None, help="diretório do cache de imagens dos gráficos (padrão: desativado)")
+    parser.add_argument('--sem-relatorios', action='store_true', help="desativa a rota /relatorio (sem pool de processos)")
+    args = parser.parse_args(argv)
+
+    report_pool = None
+    if not args.sem_relatorios:
+        workers = args.processos or os.cpu_count() or 1
+        report_pool = ReportPool(workers, args.fila or DEFAULT_QUEUE_PER_WORKER * workers, args.cache_imagens)
+
+    server = make_server(args.host, args.porta, report_pool, os.environ.get(API_KEY_ENV))
+    print(f"API em http://{args.host}:{args.porta}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if report_pool is not None:
+            report_pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
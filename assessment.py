@@ -0,0 +1,550 @@
+# Catálogo de perguntas e cálculos da avaliação de segurança
+# Mantido fora do main.py para que as respostas possam ser codificadas, persistidas
+# e recalculadas sem depender dos widgets do Streamlit.
+import hashlib
+import re
+import unicodedata
+
+# Versão do catálogo: incrementar sempre que perguntas, opções ou pesos mudarem,
+# para que avaliações antigas continuem interpretáveis
+CATALOG_VERSION = 1
+
+CATEGORIES = ["Infraestrutura", "Políticas", "Proteção"]
+
+# Dimensões opcionais do cadastro usadas no benchmarking (porte e região)
+NOT_INFORMED = "Não informado"
+SIZE_BANDS = ["Micro (até 9)", "Pequena (10 a 49)", "Média (50 a 249)", "Grande (250 ou mais)"]
+REGIONS = ["Norte", "Nordeste", "Centro-Oeste", "Sudeste", "Sul"]
+
+YES_NO_OPTIONS = ["Sim", "Não", "Não sei"]
+BACKUP_OPTIONS = ["Diariamente", "Semanalmente", "Mensalmente", "Nunca", "Não sei"]
+
+# Perguntas do teste de vulnerabilidade, na ordem em que são exibidas.
+# "weights" é a pontuação de cada opção e "vulnerable" são os índices das opções
+# que caracterizam a vulnerabilidade ("Não sei" é tratado como "Não").
+# Perguntas sem "widget" são exibidas com st.radio.
+QUESTIONS = [
+    {
+        "key": "infra_q1",
+        "category": "Infraestrutura",
+        "text": "Sua empresa utiliza autenticação multifator (MFA) para acessos críticos?",
+        "options": YES_NO_OPTIONS,
+        "weights": [1, 0, 0],
+        "vulnerable": [1, 2],
+        "vulnerability": "Falta de autenticação multifator (MFA)",
+        "recommendation": "Implemente MFA para todos os acessos críticos e contas de administrador",
+    },
+    {
+        "key": "infra_q2",
+        "category": "Infraestrutura",
+        "text": "Os funcionários possuem diferentes níveis de acesso aos dados, de acordo com suas funções?",
+        "options": YES_NO_OPTIONS,
+        "weights": [1, 0, 0],
+        "vulnerable": [1, 2],
+        "vulnerability": "Ausência de controle de acesso baseado em funções",
+        "recommendation": "Defina e implemente diferentes níveis de acesso para os funcionários",
+    },
+    {
+        "key": "infra_q3",
+        "category": "Infraestrutura",
+        "text": "Os servidores da sua empresa estão protegidos por firewalls e monitoramento contínuo?",
+        "options": YES_NO_OPTIONS,
+        "weights": [1, 0, 0],
+        "vulnerable": [1, 2],
+        "vulnerability": "Servidores sem proteção adequada de firewall",
+        "recommendation": "Instale e configure firewalls e implemente monitoramento contínuo",
+    },
+    {
+        "key": "infra_q4",
+        "category": "Infraestrutura",
+        "text": "A empresa realiza backup frequente dos dados críticos?",
+        "options": BACKUP_OPTIONS,
+        "widget": "selectbox",
+        "weights": [1, 0.75, 0.5, 0, 0],
+        "vulnerable": [3, 4],
+        "vulnerability": "Ausência de backup de dados críticos",
+        "recommendation": "Implemente uma rotina de backup diário e teste regularmente a restauração",
+    },
+    {
+        "key": "infra_q5",
+        "category": "Infraestrutura",
+        "text": "Os dispositivos utilizados pelos funcionários possuem criptografia de dados ativada?",
+        "options": YES_NO_OPTIONS,
+        "weights": [1, 0, 0],
+        "vulnerable": [1, 2],
+        "vulnerability": "Dispositivos sem criptografia de dados",
+        "recommendation": "Ative a criptografia em todos os dispositivos corporativos",
+    },
+    {
+        "key": "policy_q1",
+        "category": "Políticas",
+        "text": "Sua empresa possui uma política de segurança da informação formalizada e documentada?",
+        "options": YES_NO_OPTIONS,
+        "weights": [1, 0, 0],
+        "vulnerable": [1, 2],
+        "vulnerability": "Ausência de política de segurança formalizada",
+        "recommendation": "Desenvolva e documente uma política de segurança da informação",
+    },
+    {
+        "key": "policy_q2",
+        "category": "Políticas",
+        "text": "Os funcionários passam por treinamentos regulares de conscientização sobre segurança da informação?",
+        "options": YES_NO_OPTIONS,
+        "weights": [1, 0, 0],
+        "vulnerable": [1, 2],
+        "vulnerability": "Falta de treinamento de segurança para funcionários",
+        "recommendation": "Implemente treinamentos regulares de conscientização sobre segurança",
+    },
+    {
+        "key": "policy_q3",
+        "category": "Políticas",
+        "text": "Há um plano de resposta a incidentes para lidar com ataques cibernéticos?",
+        "options": YES_NO_OPTIONS,
+        "weights": [1, 0, 0],
+        "vulnerable": [1, 2],
+        "vulnerability": "Sem plano de resposta a incidentes",
+        "recommendation": "Desenvolva um plano de resposta a incidentes de segurança",
+    },
+    {
+        "key": "policy_q4",
+        "category": "Políticas",
+        "text": "Os fornecedores e terceiros que acessam dados da empresa seguem normas de segurança definidas?",
+        "options": YES_NO_OPTIONS,
+        "weights": [1, 0, 0],
+        "vulnerable": [1, 2],
+        "vulnerability": "Terceiros acessam dados sem seguir normas de segurança",
+        "recommendation": "Estabeleça requisitos de segurança para fornecedores e parceiros",
+    },
+    {
+        "key": "policy_q5",
+        "category": "Políticas",
+        "text": "Existe uma política de atualização frequente para sistemas e softwares críticos?",
+        "options": YES_NO_OPTIONS,
+        "weights": [1, 0, 0],
+        "vulnerable": [1, 2],
+        "vulnerability": "Falta de política de atualização de sistemas",
+        "recommendation": "Crie uma política para atualização regular de sistemas e softwares",
+    },
+    {
+        "key": "protect_q1",
+        "category": "Proteção",
+        "text": "A empresa realiza testes de invasão (pentests) regularmente para avaliar a segurança da rede?",
+        "options": YES_NO_OPTIONS,
+        "weights": [1, 0, 0],
+        "vulnerable": [1, 2],
+        "vulnerability": "Ausência de testes de invasão regulares",
+        "recommendation": "Realize pentests semestralmente para identificar vulnerabilidades",
+    },
+    {
+        "key": "protect_q2",
+        "category": "Proteção",
+        "text": "Existem sistemas ativos de detecção e resposta a ameaças (EDR, SIEM)?",
+        "options": YES_NO_OPTIONS,
+        "weights": [1, 0, 0],
+        "vulnerable": [1, 2],
+        "vulnerability": "Sem sistemas de detecção e resposta a ameaças",
+        "recommendation": "Implemente soluções EDR/SIEM para monitoramento em tempo real",
+    },
+    {
+        "key": "protect_q3",
+        "category": "Proteção",
+        "text": "As senhas utilizadas pelos funcionários seguem boas práticas (mínimo de 12 caracteres, complexas, não reutilizadas)?",
+        "options": YES_NO_OPTIONS,
+        "weights": [1, 0, 0],
+        "vulnerable": [1, 2],
+        "vulnerability": "Senhas fracas ou reutilizadas",
+        "recommendation": "Implemente política de senhas fortes e use gerenciador de senhas",
+    },
+    {
+        "key": "protect_q4",
+        "category": "Proteção",
+        "text": "Há um controle ativo para detectar vazamentos de dados da empresa na dark web?",
+        "options": YES_NO_OPTIONS,
+        "weights": [1, 0, 0],
+        "vulnerable": [1, 2],
+        "vulnerability": "Sem monitoramento de vazamentos na dark web",
+        "recommendation": "Contrate serviço de monitoramento de vazamentos de dados",
+    },
+    {
+        "key": "protect_q5",
+        "category": "Proteção",
+        "text": "Existe uma política formal para gerenciamento de dispositivos móveis e trabalho remoto?",
+        "options": YES_NO_OPTIONS,
+        "weights": [1, 0, 0],
+        "vulnerable": [1, 2],
+        "vulnerability": "Ausência de política para dispositivos móveis e trabalho remoto",
+        "recommendation": "Desenvolva política específica para trabalho remoto e BYOD",
+    },
+]
+
+# Número máximo de pontos por categoria (5 perguntas com peso máximo 1)
+CATEGORY_MAX_POINTS = {
+    category: sum(max(q["weights"]) for q in QUESTIONS if q["category"] == category)
+    for category in CATEGORIES
+}
+TOTAL_MAX_POINTS = sum(CATEGORY_MAX_POINTS.values())
+
+# Campos do formulário da calculadora de ROI, na ordem usada na codificação compacta.
+# O nome de cada campo corresponde à chave do widget sem o prefixo "roi_".
+ROI_INPUT_FIELDS = [
+    "num_incidents",
+    "cost_per_incident",
+    "hours",
+    "minutes",
+    "hourly_cost",
+    "security_investment",
+    "reduced_incidents",
+    "new_num_incidents",
+    "new_cost_per_incident",
+    "new_hours",
+    "new_minutes",
+    "lost_customers",
+    "num_lost_customers",
+    "average_ticket",
+]
+
+# Campos inteiros (number_input com step=1) e campos de escolha Sim/Não/Não sei
+ROI_INT_FIELDS = {"num_incidents", "hours", "minutes", "new_num_incidents", "new_hours", "new_minutes", "num_lost_customers"}
+ROI_CHOICE_FIELDS = {"reduced_incidents", "lost_customers"}
+
+# Resultados de ROI persistidos, na ordem usada na codificação compacta
+ROI_OUTPUT_FIELDS = [
+    "Investimento",
+    "Economia",
+    "ROI",
+    "Perda de Clientes",
+    "Impacto Total",
+    "Custo Total Antes",
+    "Custo Total Depois",
+]
+
+
+# Função para normalizar textos usados em chaves (minúsculas, sem acentos e espaços extras)
+def normalize_key_part(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+# Função para gerar a chave do lead a partir do e-mail e da empresa normalizados
+def lead_key(email, company):
+    """Chave estável usada como id do documento em 'usuarios' (uma linha por lead)"""
+    raw = f"{normalize_key_part(email)}|{normalize_key_part(company)}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+
+# Função para codificar as respostas em uma string compacta (um dígito por pergunta)
+def encode_answers(answers):
+    """Converte {chave: opção} em uma string com o índice da opção de cada pergunta"""
+    return "".join(str(q["options"].index(answers[q["key"]])) for q in QUESTIONS)
+
+
+# Função para decodificar a string compacta de respostas
+def decode_answers(encoded):
+    """Converte a string de índices de volta para {chave: opção}"""
+    return {q["key"]: q["options"][int(digit)] for q, digit in zip(QUESTIONS, encoded)}
+
+
+# Função para gerar a máscara de bits das perguntas atendidas (bit i = pergunta i sem vulnerabilidade)
+def answers_mask(encoded):
+    mask = 0
+    for i, (q, digit) in enumerate(zip(QUESTIONS, encoded)):
+        if int(digit) not in q["vulnerable"]:
+            mask |= 1 << i
+    return mask
+
+
+# Função para calcular os resultados do teste de vulnerabilidade
+def compute_vulnerability_results(answers):
+    """Calcula pontuações, nível de risco, vulnerabilidades e recomendações a partir de {chave: opção}"""
+    category_points = {category: 0 for category in CATEGORIES}
+    vulnerabilities = []
+    recommendations = []
+
+    for q in QUESTIONS:
+        option_index = q["options"].index(answers[q["key"]])
+        category_points[q["category"]] += q["weights"][option_index]
+
+        if option_index in q["vulnerable"]:
+            vulnerabilities.append(q["vulnerability"])
+            recommendations.append(q["recommendation"])
+
+    # Calcular pontuação total e porcentagens por categoria
+    total_points = sum(category_points.values())
+    total_percent = (total_points / TOTAL_MAX_POINTS) * 100
+
+    category_percent = {
+        category: (category_points[category] / CATEGORY_MAX_POINTS[category]) * 100
+        for category in CATEGORIES
+    }
+
+    # Classificação de risco
+    risk_level = "Crítico" if total_percent <= 40 else "Moderado" if total_percent <= 70 else "Bom"
+
+    return {
+        "Pontuação Geral": total_percent,
+        "Nível de Risco": risk_level,
+        "Pontuação Infraestrutura": category_percent["Infraestrutura"],
+        "Pontuação Políticas": category_percent["Políticas"],
+        "Pontuação Proteção": category_percent["Proteção"],
+        "Total de Vulnerabilidades": len(vulnerabilities),
+        "Vulnerabilidades": vulnerabilities,
+        "Recomendações": recommendations
+    }
+
+
+# Função para codificar as entradas do formulário de ROI em uma lista compacta de números
+def encode_roi_inputs(inputs):
+    encoded = []
+    for field in ROI_INPUT_FIELDS:
+        value = inputs[field]
+        if field in ROI_CHOICE_FIELDS:
+            value = YES_NO_OPTIONS.index(value)
+        encoded.append(value)
+    return encoded
+
+
+# Função para decodificar a lista compacta de entradas de ROI
+def decode_roi_inputs(encoded):
+    inputs = {}
+    for field, value in zip(ROI_INPUT_FIELDS, encoded):
+        if field in ROI_CHOICE_FIELDS:
+            value = YES_NO_OPTIONS[int(value)]
+        elif field in ROI_INT_FIELDS:
+            value = int(value)
+        else:
+            value = float(value)
+        inputs[field] = value
+    return inputs
+
+
+# Função para obter os valores efetivos de incidentes antes e depois do investimento
+def _effective_roi_inputs(inputs):
+    # Calcular o valor total em horas
+    hours_per_incident = inputs["hours"] + (inputs["minutes"] / 60)
+
+    # Tratar respostas "Não sei" como "Não": sem redução, os valores depois são iguais aos de antes
+    if inputs["reduced_incidents"] == "Sim":
+        new_num_incidents = inputs["new_num_incidents"]
+        new_cost_per_incident = inputs["new_cost_per_incident"]
+        new_hours_per_incident = inputs["new_hours"] + (inputs["new_minutes"] / 60)
+    else:
+        new_num_incidents = inputs["num_incidents"]
+        new_cost_per_incident = inputs["cost_per_incident"]
+        new_hours_per_incident = hours_per_incident
+
+    return {
+        "Num Incidentes Antes": inputs["num_incidents"],
+        "Num Incidentes Depois": new_num_incidents,
+        "Custo por Incidente Antes": inputs["cost_per_incident"],
+        "Custo por Incidente Depois": new_cost_per_incident,
+        "Horas por Incidente Antes": hours_per_incident,
+        "Horas por Incidente Depois": new_hours_per_incident,
+        "hourly_cost": inputs["hourly_cost"]
+    }
+
+
+# Função para calcular os resultados da calculadora de ROI
+def compute_roi_results(inputs):
+    """Calcula os resultados de ROI a partir dos valores do formulário (campos de ROI_INPUT_FIELDS)"""
+    effective = _effective_roi_inputs(inputs)
+    num_incidents = effective["Num Incidentes Antes"]
+    cost_per_incident = effective["Custo por Incidente Antes"]
+    hours_per_incident = effective["Horas por Incidente Antes"]
+    new_num_incidents = effective["Num Incidentes Depois"]
+    new_cost_per_incident = effective["Custo por Incidente Depois"]
+    new_hours_per_incident = effective["Horas por Incidente Depois"]
+    hourly_cost = effective["hourly_cost"]
+    security_investment = inputs["security_investment"]
+
+    if inputs["lost_customers"] == "Sim":
+        num_lost_customers = inputs["num_lost_customers"]
+        average_ticket = inputs["average_ticket"]
+    else:
+        num_lost_customers = 0
+        average_ticket = 0.0
+
+    # Calcular custo total antes
+    total_cost_before = (num_incidents * cost_per_incident) + (num_incidents * hours_per_incident * hourly_cost)
+
+    # Calcular custo total depois
+    total_cost_after = (new_num_incidents * new_cost_per_incident) + (new_num_incidents * new_hours_per_incident * hourly_cost)
+
+    # Calcular economia obtida
+    savings = total_cost_before - total_cost_after
+
+    # Calcular ROI
+    if security_investment > 0:
+        roi = ((savings - security_investment) / security_investment) * 100
+    else:
+        roi = 0
+
+    # Calcular perda de receita com clientes
+    revenue_loss = num_lost_customers * average_ticket
+
+    return {
+        "Investimento": security_investment,
+        "Economia": savings,
+        "ROI": roi,
+        "Perda de Clientes": revenue_loss,
+        "Impacto Total": savings - revenue_loss,
+        "Custo Total Antes": total_cost_before,
+        "Custo Total Depois": total_cost_after,
+        **effective
+    }
+
+
+# Função para montar o registro compacto de uma avaliação para persistência
+def build_assessment_record(user_data, encoded_answers=None, vulnerability_results=None,
+                            roi_inputs=None, roi_results=None, benchmark_results=None):
+    """Monta o registro compacto (respostas codificadas, pontuações, ROI e versão do catálogo)"""
+    record = {
+        "versao_catalogo": CATALOG_VERSION,
+        "lead_id": lead_key(user_data.get("email", ""), user_data.get("empresa", "")),
+        "nome_completo": user_data.get("nome_completo", ""),
+        "email": user_data.get("email", ""),
+        "empresa": user_data.get("empresa", ""),
+        "setor": user_data.get("industry", ""),
+        "porte": user_data.get("porte", NOT_INFORMED),
+        "regiao": user_data.get("regiao", NOT_INFORMED),
+        "respostas": None,
+        "mascara": None,
+        "pontuacoes": None,
+        "roi_entradas": None,
+        "roi_saidas": None,
+        "benchmark_setor": None,
+    }
+
+    if encoded_answers and vulnerability_results:
+        record["respostas"] = encoded_answers
+        record["mascara"] = answers_mask(encoded_answers)
+        record["pontuacoes"] = [
+            round(vulnerability_results["Pontuação Infraestrutura"], 2),
+            round(vulnerability_results["Pontuação Políticas"], 2),
+            round(vulnerability_results["Pontuação Proteção"], 2),
+            round(vulnerability_results["Pontuação Geral"], 2),
+        ]
+
+    if roi_inputs and roi_results:
+        record["roi_entradas"] = encode_roi_inputs(roi_inputs)
+        record["roi_saidas"] = [float(roi_results[field]) for field in ROI_OUTPUT_FIELDS]
+
+    if benchmark_results:
+        industry_data = benchmark_results["Industry"]
+        record["benchmark_setor"] = [
+            industry_data["Infraestrutura"],
+            industry_data["Políticas"],
+            industry_data["Proteção"],
+            industry_data["Total"],
+        ]
+
+    return record
+
+
+# Função para reconstruir os resultados de vulnerabilidade a partir de um registro persistido
+def vulnerability_results_from_record(record):
+    """Usa as pontuações gravadas e a máscara de bits, sem recalcular a avaliação"""
+    if not record.get("pontuacoes"):
+        return None
+
+    infra_percent, policy_percent, protect_percent, total_percent = record["pontuacoes"]
+    mask = record["mascara"]
+
+    vulnerabilities = []
+    recommendations = []
+    for i, q in enumerate(QUESTIONS):
+        if not mask & (1 << i):
+            vulnerabilities.append(q["vulnerability"])
+            recommendations.append(q["recommendation"])
+
+    risk_level = "Crítico" if total_percent <= 40 else "Moderado" if total_percent <= 70 else "Bom"
+
+    return {
+        "Pontuação Geral": total_percent,
+        "Nível de Risco": risk_level,
+        "Pontuação Infraestrutura": infra_percent,
+        "Pontuação Políticas": policy_percent,
+        "Pontuação Proteção": protect_percent,
+        "Total de Vulnerabilidades": len(vulnerabilities),
+        "Vulnerabilidades": vulnerabilities,
+        "Recomendações": recommendations
+    }
+
+
+# Função para reconstruir os resultados de ROI a partir de um registro persistido
+def roi_results_from_record(record):
+    if not record.get("roi_saidas"):
+        return None
+
+    return {
+        **dict(zip(ROI_OUTPUT_FIELDS, record["roi_saidas"])),
+        **_effective_roi_inputs(decode_roi_inputs(record["roi_entradas"]))
+    }
+
+
+# Função para reconstruir os resultados de benchmarking a partir de um registro persistido
+def benchmark_results_from_record(record):
+    if not record.get("benchmark_setor") or not record.get("pontuacoes"):
+        return None
+
+    company_values = record["pontuacoes"]
+    industry_values = record["benchmark_setor"]
+    keys = CATEGORIES + ["Total"]
+
+    return {
+        "Company": dict(zip(keys, company_values)),
+        "Industry": dict(zip(keys, industry_values)),
+        "IndustryName": record["setor"]
+    }
+
+
+# Função para comparar a avaliação atual com a anterior da mesma empresa
+def assessment_progress(previous_record, encoded_answers, vulnerability_results):
+    """Variação das pontuações e perguntas corrigidas/novas lacunas (diferença entre as máscaras)
+
+    As listas de perguntas ficam vazias quando a avaliação anterior usa outra versão do catálogo.
+    """
+    keys = CATEGORIES + ["Total"]
+    # Mesmo arredondamento das pontuações persistidas, para que avaliações iguais tenham variação zero
+    current_scores = [
+        round(vulnerability_results["Pontuação Infraestrutura"], 2),
+        round(vulnerability_results["Pontuação Políticas"], 2),
+        round(vulnerability_results["Pontuação Proteção"], 2),
+        round(vulnerability_results["Pontuação Geral"], 2),
+    ]
+    previous_scores = previous_record["pontuacoes"]
+
+    fixed, opened = [], []
+    if previous_record.get("versao_catalogo") == CATALOG_VERSION and previous_record.get("mascara") is not None:
+        previous_mask = previous_record["mascara"]
+        current_mask = answers_mask(encoded_answers)
+        fixed_mask = current_mask & ~previous_mask
+        opened_mask = previous_mask & ~current_mask
+        fixed = [q["key"] for i, q in enumerate(QUESTIONS) if fixed_mask >> i & 1]
+        opened = [q["key"] for i, q in enumerate(QUESTIONS) if opened_mask >> i & 1]
+
+    return {
+        "data_anterior": previous_record.get("data_avaliacao"),
+        "anterior": dict(zip(keys, previous_scores)),
+        "atual": dict(zip(keys, current_scores)),
+        "variacao": {key: round(current - previous, 2) for key, current, previous in zip(keys, current_scores, previous_scores)},
+        "corrigidas": fixed,
+        "novas_lacunas": opened,
+    }
+
+
+# Função para calcular o progresso a partir das avaliações anteriores da mesma empresa
+def progress_from_history(history, encoded_answers, vulnerability_results, assessed_at):
+    """history: registros anteriores com pontuação, em ordem de data (None se estiver vazio)
+
+    Inclui a série histórica (avaliações anteriores + atual) usada no gráfico de tendência.
+    """
+    if not history:
+        return None
+
+    progress = assessment_progress(history[-1], encoded_answers, vulnerability_results)
+    progress["historico"] = {
+        "datas": [record.get("data_avaliacao") for record in history] + [assessed_at],
+        "pontuacoes": [record["pontuacoes"] for record in history] + [list(progress["atual"].values())],
+    }
+    return progress
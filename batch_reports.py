@@ -0,0 +1,247 @@
+# Geração em lote dos relatórios completos em PDF
+#
+# Uso:
+#   python batch_reports.py --saida relatorios --todas
+#   python batch_reports.py --saida relatorios --arquivo codigos.txt --processos 8
+#   python batch_reports.py --saida relatorios YwEfPNukvdlk4u8H a0000001
+#
+# Regenera o mesmo relatório completo baixado no app (create_pdf_report com report_type="complete")
+# a partir das avaliações salvas, por exemplo após mudanças de identidade visual ou de texto.
+# O processo principal lê os registros e o histórico de cada empresa; a renderização dos gráficos
+# e dos PDFs é distribuída entre processos. Os dados de benchmark são enviados uma única vez para
+# cada processo e as imagens dos gráficos ficam em um cache em disco compartilhado, então gráficos
+# idênticos entre empresas são rasterizados uma única vez.
+import argparse
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from assessment import (
+    CATALOG_VERSION, benchmark_results_from_record, progress_from_history, roi_results_from_record,
+    vulnerability_results_from_record
+)
+from benchmarks import SECTORS, get_benchmark_data, get_confidence_intervals, get_question_pass_rates
+from charts import complete_report_figures
+from portfolio import parse_assessment_ids
+from reports import complete_report_data, create_pdf_report, set_image_cache_dir
+from storage import ASSESSMENTS_COLLECTION, LOCAL_DB_ENV, ORDER_FIELDS, get_backend, load_assessment_history, load_assessments
+
+# Intervalo mínimo entre as linhas de progresso (segundos)
+PROGRESS_INTERVAL = 5
+
+# Dados compartilhados com os processos de renderização (definidos no inicializador)
+_context = None
+
+
+# Função para ler as avaliações a gerar: {id: registro}
+def collect_records(backend, assessment_ids=None, page_size=1000):
+    if assessment_ids:
+        return load_assessments(assessment_ids)
+
+    records = {}
+    pages = backend.iter_pages(
+        ASSESSMENTS_COLLECTION,
+        ORDER_FIELDS[ASSESSMENTS_COLLECTION],
+        page_size=page_size
+    )
+    for page in pages:
+        for doc_id, data in page:
+            records[doc_id] = data
+    return records
+
+
+# Função para agrupar o histórico das empresas: {lead_id: [registros com pontuação em ordem de data]}
+def collect_histories(records, all_loaded):
+    """Com a coleção inteira em memória agrupa os próprios registros; senão consulta cada empresa"""
+    lead_ids = {record.get('lead_id') for record in records.values() if record.get('lead_id')}
+    if all_loaded:
+        histories = {lead_id: [] for lead_id in lead_ids}
+        for record in records.values():
+            if record.get('lead_id') in histories:
+                histories[record['lead_id']].append(record)
+    else:
+        histories = {lead_id: [record for _, record in load_assessment_history(lead_id)] for lead_id in lead_ids}
+
+    for lead_id, history in histories.items():
+        history = [record for record in history if record.get('pontuacoes') and record.get('data_avaliacao')]
+        histories[lead_id] = sorted(history, key=lambda record: record['data_avaliacao'])
+    return histories
+
+
+# Função para montar os resultados de uma avaliação salva, como o app faz ao retomar a sessão
+def record_results(record, history):
+    """Retorna (vulnerabilidade, ROI, benchmarking, respostas, progresso); ausentes ficam None"""
+    vulnerability_results = None
+    encoded_answers = None
+    # Respostas gravadas com outra versão do catálogo não são reaproveitadas
+    if record.get('respostas') and record.get('versao_catalogo') == CATALOG_VERSION:
+        encoded_answers = record['respostas']
+        vulnerability_results = vulnerability_results_from_record(record)
+
+    progress = None
+    assessed_at = record.get('data_avaliacao')
+    if vulnerability_results and assessed_at:
+        # Progresso em relação às avaliações anteriores a esta (não às posteriores)
+        earlier = [previous for previous in history if previous['data_avaliacao'] < assessed_at]
+        progress = progress_from_history(earlier, encoded_answers, vulnerability_results, assessed_at)
+
+    roi_results = roi_results_from_record(record) if record.get('roi_entradas') else None
+    return vulnerability_results, roi_results, benchmark_results_from_record(record), encoded_answers, progress
+
+
+# Função para o nome do arquivo do relatório (empresa + código da avaliação)
+def report_filename(assessment_id, record):
+    company = re.sub(r'\W+', '_', record.get('empresa') or 'empresa').strip('_')
+    return f"relatorio_completo_{company}_{assessment_id}.pdf"
+
+
+# Funções executadas nos processos de renderização
+def _init_worker(context):
+    global _context
+    _context = context
+    set_image_cache_dir(context['cache_imagens'])
+
+
+def _render_report(assessment_id, record, history):
+    """Gera e grava um PDF; retorna (id, bytes gravados, segundos, erro)"""
+    started = time.perf_counter()
+    try:
+        vulnerability_results, roi_results, benchmark_results, encoded_answers, progress = record_results(record, history)
+        sector = benchmark_results["IndustryName"] if benchmark_results else None
+        all_results, all_vulnerabilities, all_recommendations = complete_report_data(
+            vulnerability_results,
+            roi_results,
+            benchmark_results,
+            encoded_answers=encoded_answers,
+            pass_rates=_context['taxas'].get(sector),
+            progress=progress
+        )
+
+        figures = None
+        if _context['graficos']:
+            figures = complete_report_figures(
+                vulnerability_results, roi_results, benchmark_results, progress,
+                _context['benchmarks'], _context['intervalos']
+            )
+
+        pdf_data = create_pdf_report(
+            all_results,
+            all_vulnerabilities,
+            all_recommendations,
+            record.get('empresa') or "Sua Empresa",
+            report_type="complete" if all_results else None,
+            figures=figures
+        )
+
+        path = os.path.join(_context['saida'], report_filename(assessment_id, record))
+        with open(path, 'wb') as f:
+            f.write(pdf_data)
+        return assessment_id, len(pdf_data), time.perf_counter() - started, None
+    except Exception as e:
+        return assessment_id, 0, time.perf_counter() - started, f"{type(e).__name__}: {e}"
+
+
+# Função para gerar os relatórios no pool de processos, com progresso e vazão
+def generate_reports(records, histories, context, workers=None, log=sys.stderr):
+    """Retorna o resumo da execução: relatórios gerados, falhas, bytes, tempo total e vazão"""
+    os.makedirs(context['saida'], exist_ok=True)
+    started = time.perf_counter()
+    done, written, render_seconds = 0, 0, 0.0
+    failures = []
+    last_progress = started
+
+    # 'spawn': os processos não herdam conexões abertas do armazenamento (gRPC do Firestore)
+    pool = ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count() or 1,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(context,)
+    )
+    with pool:
+        futures = [
+            pool.submit(_render_report, assessment_id, record, histories.get(record.get('lead_id'), []))
+            for assessment_id, record in records.items()
+        ]
+        for future in as_completed(futures):
+            assessment_id, size, seconds, error = future.result()
+            done += 1
+            render_seconds += seconds
+            if error:
+                failures.append((assessment_id, error))
+            else:
+                written += size
+
+            now = time.perf_counter()
+            if now - last_progress >= PROGRESS_INTERVAL or done == len(futures):
+                last_progress = now
+                print(f"{done}/{len(futures)} relatórios ({done / (now - started):.1f}/s, {len(failures)} falhas)", file=log)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "relatorios": done - len(failures),
+        "falhas": failures,
+        "bytes": written,
+        "segundos": elapsed,
+        "por_segundo": done / elapsed if elapsed > 0 else 0.0,
+        "segundos_por_relatorio": render_seconds / done if done else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera em lote os relatórios completos em PDF das avaliações salvas.")
+    parser.add_argument('codigos', nargs='*', help="códigos ou links de retomada das avaliações")
+    parser.add_argument('--arquivo', help="arquivo com códigos ou links, um por linha")
+    parser.add_argument('--todas', action='store_true', help="gera os relatórios de todas as avaliações salvas")
+    parser.add_argument('--saida', default='relatorios', help="diretório dos PDFs (padrão: 'relatorios')")
+    parser.add_argument('--processos', type=int, default=None, help="processos de renderização (padrão: todos os núcleos)")
+    parser.add_argument('--cache-imagens', default=None,
+                        help="diretório do cache de imagens dos gráficos (padrão: <saida>/.cache_imagens)")
+    parser.add_argument('--sem-graficos', action='store_true', help="gera os PDFs sem os gráficos")
+    parser.add_argument('--tamanho-pagina', type=int, default=1000, help="documentos por página com --todas (padrão: 1000)")
+    args = parser.parse_args(argv)
+
+    assessment_ids = list(args.codigos)
+    if args.arquivo:
+        with open(args.arquivo, encoding='utf-8') as f:
+            assessment_ids.append(f.read())
+    assessment_ids = parse_assessment_ids(" ".join(assessment_ids))
+    if not assessment_ids and not args.todas:
+        parser.error("informe os códigos das avaliações, --arquivo ou --todas")
+
+    backend = get_backend()
+    if backend is None:
+        sys.exit(f"Nenhum armazenamento configurado (Firebase nos secrets ou {LOCAL_DB_ENV}).")
+
+    records = collect_records(backend, None if args.todas else assessment_ids, page_size=args.tamanho_pagina)
+    missing = [assessment_id for assessment_id in assessment_ids if assessment_id not in records]
+    if missing and not args.todas:
+        print(f"Avaliações não encontradas: {', '.join(missing)}", file=sys.stderr)
+    histories = collect_histories(records, all_loaded=args.todas)
+    print(f"{len(records)} avaliações lidas", file=sys.stderr)
+
+    context = {
+        'saida': args.saida,
+        'graficos': not args.sem_graficos,
+        'cache_imagens': None if args.sem_graficos else args.cache_imagens or os.path.join(args.saida, '.cache_imagens'),
+        'benchmarks': {sector: dict(values) for sector, values in get_benchmark_data().items()},
+        'intervalos': {sector: get_confidence_intervals(sector) for sector in SECTORS},
+        'taxas': {sector: get_question_pass_rates(sector) for sector in SECTORS},
+    }
+    summary = generate_reports(records, histories, context, workers=args.processos)
+
+    for assessment_id, error in summary['falhas']:
+        print(f"Falha em {assessment_id}: {error}", file=sys.stderr)
+    print(
+        f"{summary['relatorios']} relatórios gravados em {args.saida} ({summary['bytes'] / 1e6:.1f} MB), "
+        f"{len(summary['falhas'])} falhas, {summary['segundos']:.1f} s, {summary['por_segundo']:.1f} relatórios/s "
+        f"({summary['segundos_por_relatorio'] * 1000:.0f} ms por relatório em cada processo)"
+    )
+    if summary['falhas']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
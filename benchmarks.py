@@ -0,0 +1,552 @@
+# Benchmarks por setor calculados a partir das avaliações persistidas
+#
+# Cada avaliação atualiza incrementalmente agregados aditivos por setor e categoria
+# (contagem, soma, soma dos quadrados e histograma das pontuações). Como todos os valores
+# são somas, os workers atualizam o mesmo documento com incrementos atômicos, sem reler
+# o histórico. A interface e o PDF leem um snapshot em cache, renovado a cada TTL.
+import itertools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+import numpy as np
+
+from assessment import CATEGORIES, NOT_INFORMED, QUESTIONS, REGIONS, SIZE_BANDS
+from storage import AGGREGATES_COLLECTION, get_backend, run_in_background
+
+# Chaves comparadas no benchmarking (categorias + pontuação geral)
+BENCHMARK_KEYS = CATEGORIES + ["Total"]
+
+# Documento com os agregados de todos os setores
+SECTORS_DOC = 'setores'
+
+# Valores de referência usados enquanto um setor não tiver avaliações suficientes
+DEFAULT_BENCHMARKS = {
+    "Tecnologia": {
+        "Infraestrutura": 85,
+        "Políticas": 82,
+        "Proteção": 88,
+        "Total": 85
+    },
+    "Finanças": {
+        "Infraestrutura": 90,
+        "Políticas": 92,
+        "Proteção": 94,
+        "Total": 92
+    },
+    "Saúde": {
+        "Infraestrutura": 78,
+        "Políticas": 85,
+        "Proteção": 82,
+        "Total": 82
+    },
+    "Varejo": {
+        "Infraestrutura": 70,
+        "Políticas": 65,
+        "Proteção": 68,
+        "Total": 68
+    },
+    "Educação": {
+        "Infraestrutura": 65,
+        "Políticas": 70,
+        "Proteção": 62,
+        "Total": 66
+    },
+    "Manufatura": {
+        "Infraestrutura": 72,
+        "Políticas": 68,
+        "Proteção": 70,
+        "Total": 70
+    },
+    "Serviços": {
+        "Infraestrutura": 68,
+        "Políticas": 72,
+        "Proteção": 65,
+        "Total": 68
+    }
+}
+
+SECTORS = list(DEFAULT_BENCHMARKS.keys())
+
+# Número mínimo de avaliações para substituir o valor de referência de um setor
+MIN_SAMPLES = 20
+
+# Tempo de validade do snapshot (segundos)
+BENCHMARK_SNAPSHOT_TTL = 300
+
+# Resolução do histograma: as pontuações são múltiplos de 5 (categorias) ou de 5/3 (geral),
+# portanto round(pontuação * 3) identifica cada valor possível sem perda
+HISTOGRAM_SCALE = 3
+
+
+# Função para extrair as pontuações comparadas a partir dos resultados de vulnerabilidade
+def scores_from_results(vulnerability_results):
+    return {
+        "Infraestrutura": vulnerability_results["Pontuação Infraestrutura"],
+        "Políticas": vulnerability_results["Pontuação Políticas"],
+        "Proteção": vulnerability_results["Pontuação Proteção"],
+        "Total": vulnerability_results["Pontuação Geral"]
+    }
+
+
+# Função para montar os incrementos de uma avaliação (sign=-1 remove uma avaliação anterior)
+def assessment_deltas(sector, scores, mask, sign=1):
+    deltas = {"n": sign}
+    for key in BENCHMARK_KEYS:
+        value = scores[key]
+        deltas[key] = {
+            "s": sign * value,
+            "ss": sign * value * value,
+            "h": {str(round(value * HISTOGRAM_SCALE)): sign}
+        }
+
+    # Contadores por pergunta: um incremento para cada bit ligado da máscara de respostas
+    if mask is not None:
+        deltas["q"] = {"n": sign}
+        for i in range(len(QUESTIONS)):
+            if mask >> i & 1:
+                deltas["q"][str(i)] = sign
+    return {sector: deltas}
+
+
+# Função para calcular um quantil a partir do histograma {bin: contagem}
+def histogram_quantile(histogram, q):
+    items = sorted((int(bin_), count) for bin_, count in histogram.items() if count > 0)
+    total = sum(count for _, count in items)
+    if total == 0:
+        return None
+
+    target = q * (total - 1)
+    cumulative = 0
+    for bin_, count in items:
+        cumulative += count
+        if cumulative > target:
+            return bin_ / HISTOGRAM_SCALE
+    return items[-1][0] / HISTOGRAM_SCALE
+
+
+class ScoreIndex:
+    """Índice ordenado das pontuações de um setor em uma categoria
+
+    As pontuações possíveis são discretas, então o índice guarda apenas os valores distintos
+    em ordem crescente e a contagem acumulada abaixo de cada um; o tamanho não depende do
+    número de avaliações e a consulta é uma busca binária.
+    """
+
+    def __init__(self, histogram):
+        levels = sorted((int(bin_), count) for bin_, count in histogram.items() if count > 0)
+        self.levels = [bin_ for bin_, _ in levels]
+        self.below = []
+        cumulative = 0
+        for _, count in levels:
+            self.below.append(cumulative)
+            cumulative += count
+        self.total = cumulative
+
+    def percentile(self, score):
+        """Percentual das avaliações com pontuação estritamente menor que score"""
+        if self.total == 0:
+            return None
+        position = bisect_left(self.levels, round(score * HISTOGRAM_SCALE))
+        below = self.below[position] if position < len(self.levels) else self.total
+        return 100.0 * below / self.total
+
+
+class BenchmarkSnapshot:
+    """Visão imutável dos benchmarks em um instante (não deve ser alterada após criada)
+
+    - table: {setor: {categoria: média}} no formato usado pelos gráficos e pelo PDF
+    - counts: {setor: número de avaliações}
+    - stats: {setor: {categoria: {"media", "desvio", "p25", "p50", "p75"}}}
+    - indexes: {setor: {categoria: ScoreIndex}} para o ranking percentil
+    - pass_rates: {setor: {chave da pergunta: % de empresas que atendem}}
+    """
+
+    def __init__(self, aggregates):
+        self.created_at = time.time()
+        self.table = {}
+        self.counts = {}
+        self.stats = {}
+        self.indexes = {}
+        self.pass_rates = {}
+
+        for sector in SECTORS:
+            sector_data = aggregates.get(sector) or {}
+            n = sector_data.get("n", 0)
+            self.counts[sector] = n
+
+            # Taxas por pergunta (contadas à parte, pois avaliações antigas não têm máscara)
+            question_data = sector_data.get("q") or {}
+            question_n = question_data.get("n", 0)
+            if question_n >= MIN_SAMPLES:
+                self.pass_rates[sector] = {
+                    q["key"]: 100.0 * question_data.get(str(i), 0) / question_n
+                    for i, q in enumerate(QUESTIONS)
+                }
+
+            if n < MIN_SAMPLES:
+                # Poucas avaliações: manter os valores de referência
+                self.table[sector] = dict(DEFAULT_BENCHMARKS[sector])
+                continue
+
+            self.table[sector] = {}
+            self.stats[sector] = {}
+            self.indexes[sector] = {}
+            for key in BENCHMARK_KEYS:
+                key_data = sector_data[key]
+                mean = key_data["s"] / n
+                variance = max(key_data["ss"] / n - mean * mean, 0.0)
+                histogram = key_data.get("h", {})
+
+                self.table[sector][key] = round(mean, 1)
+                self.stats[sector][key] = {
+                    "media": mean,
+                    "desvio": variance ** 0.5,
+                    "p25": histogram_quantile(histogram, 0.25),
+                    "p50": histogram_quantile(histogram, 0.50),
+                    "p75": histogram_quantile(histogram, 0.75),
+                }
+                self.indexes[sector][key] = ScoreIndex(histogram)
+
+    def percentile_ranks(self, sector, scores):
+        """Percentil da empresa em cada categoria ({} se o setor tiver poucas avaliações)"""
+        indexes = self.indexes.get(sector)
+        if not indexes:
+            return {}
+        return {key: indexes[key].percentile(scores[key]) for key in BENCHMARK_KEYS}
+
+
+class BenchmarkService:
+    """Mantém os agregados por setor e fornece o snapshot em cache
+
+    Os incrementos entram nos agregados em memória na hora e ficam pendentes até serem gravados.
+    A releitura do armazenamento soma os pendentes ao documento lido; gravações e releituras são
+    serializadas, então cada incremento está no documento lido ou entre os pendentes, nunca nos dois.
+    """
+
+    def __init__(self, ttl=BENCHMARK_SNAPSHOT_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._storage_lock = threading.Lock()
+        self._aggregates = {}
+        self._pending = {}
+        self._sequence = itertools.count()
+        self._snapshot = None
+        self._refreshing = False
+
+    def record(self, sector, scores, mask, previous_scores=None, previous_mask=None, previous_sector=None):
+        """Adiciona uma avaliação aos agregados (substituindo a anterior da mesma sessão, se houver)"""
+        if sector not in DEFAULT_BENCHMARKS:
+            return
+
+        deltas = assessment_deltas(sector, scores, mask)
+        if previous_scores is not None:
+            previous_sector = previous_sector or sector
+            for key, value in assessment_deltas(previous_sector, previous_scores, previous_mask, sign=-1).items():
+                deltas[key] = _merge_deltas(deltas.get(key, {}), value)
+
+        with self._lock:
+            _merge_deltas(self._aggregates, deltas)
+            sequence = next(self._sequence)
+            self._pending[sequence] = deltas
+
+        run_in_background(self._persist, sequence, deltas)
+
+    def _persist(self, sequence, deltas):
+        with self._storage_lock:
+            try:
+                backend = get_backend()
+                if backend is not None:
+                    backend.increment(AGGREGATES_COLLECTION, SECTORS_DOC, deltas)
+            except Exception as e:
+                print(f"Erro ao atualizar benchmarks no Firebase: {e}")
+            finally:
+                with self._lock:
+                    del self._pending[sequence]
+
+    def _reload(self):
+        """Relê os agregados do armazenamento (uma leitura) e publica um novo snapshot"""
+        with self._storage_lock:
+            try:
+                backend = get_backend()
+                stored = backend.get(AGGREGATES_COLLECTION, SECTORS_DOC) if backend is not None else None
+            except Exception as e:
+                print(f"Erro ao carregar benchmarks do Firebase: {e}")
+                stored = None
+
+            with self._lock:
+                if stored is not None:
+                    # Incrementos ainda na fila de gravação não estão no documento lido
+                    for deltas in self._pending.values():
+                        _merge_deltas(stored, deltas)
+                    self._aggregates = stored
+                self._snapshot = BenchmarkSnapshot(self._aggregates)
+                self._refreshing = False
+
+    def snapshot(self):
+        """Retorna o snapshot atual; quando expirado, agenda a renovação em segundo plano"""
+        if self._snapshot is None:
+            self._reload()
+            return self._snapshot
+
+        with self._lock:
+            expired = time.time() - self._snapshot.created_at > self.ttl
+            if expired and not self._refreshing:
+                self._refreshing = True
+                run_in_background(self._reload)
+            return self._snapshot
+
+
+# Função auxiliar para somar dicionários aninhados de incrementos
+def _merge_deltas(target, deltas):
+    for key, value in deltas.items():
+        if isinstance(value, dict):
+            target[key] = _merge_deltas(target.get(key) or {}, value)
+        else:
+            target[key] = target.get(key, 0) + value
+    return target
+
+
+# Instância compartilhada por todas as sessões do processo
+benchmark_service = BenchmarkService()
+
+
+# Dados de benchmarking por setor
+def get_benchmark_data():
+    """Médias por setor e categoria do snapshot em cache (não alterar o dicionário retornado)"""
+    return benchmark_service.snapshot().table
+
+
+# Ranking percentil da empresa no seu setor
+def get_percentile_ranks(sector, scores):
+    """Percentual de empresas do setor com pontuação menor, por categoria (usa o snapshot em cache)"""
+    return benchmark_service.snapshot().percentile_ranks(sector, scores)
+
+
+# Taxas de atendimento por pergunta no setor
+def get_question_pass_rates(sector):
+    """{chave da pergunta: % de empresas do setor que atendem} ({} se houver poucas avaliações)"""
+    return benchmark_service.snapshot().pass_rates.get(sector, {})
+
+
+# Snapshot offline de benchmarks
+#
+# Gerado por rebuild_benchmarks.py (job noturno) a partir das avaliações salvas. É composto por
+# um manifesto JSON pequeno ('<caminho>.json') e por arrays NumPy em arquivos com a versão no
+# nome ('<caminho>.<versão>.<nome>.npy'). O manifesto é substituído de forma atômica depois que
+# todos os arrays da nova versão foram gravados, então um worker nunca combina arquivos de
+# versões diferentes. Os arrays são mapeados em memória: carregar o snapshot lê apenas os
+# cabeçalhos, sem desserializar os dados.
+
+# Variável de ambiente com o caminho do snapshot (sem extensão)
+BENCHMARK_CUBE_ENV = 'FORM_SEGURANCA_CUBO'
+DEFAULT_CUBE_PATH = 'cubo_benchmarks'
+
+# Versão do formato do snapshot (incrementar se os arrays mudarem de forma ou significado)
+SNAPSHOT_FORMAT = 1
+
+# Número de versões anteriores mantidas em disco (workers podem ainda estar usando-as)
+SNAPSHOT_KEEP_VERSIONS = 2
+
+
+# Função para gravar uma nova versão do snapshot offline
+def write_offline_snapshot(path, arrays, metadata):
+    """Grava os arrays {nome: array} e publica o manifesto; retorna a versão gravada"""
+    directory = os.path.dirname(os.path.abspath(path))
+    base_name = os.path.basename(path)
+    version = time.strftime("%Y%m%dT%H%M%S")
+    if any(name.startswith(f"{base_name}.{version}.") for name in os.listdir(directory)):
+        # Nunca sobrescrever arrays que podem estar mapeados por algum worker
+        version = f"{version}-{os.getpid()}"
+
+    files = {}
+    for name, array in arrays.items():
+        file_name = f"{base_name}.{version}.{name}.npy"
+        np.save(os.path.join(directory, file_name), np.ascontiguousarray(array))
+        files[name] = file_name
+
+    manifest = dict(metadata, formato=SNAPSHOT_FORMAT, versao=version, arquivos=files)
+    with open(f"{path}.tmp.json", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(f"{path}.tmp.json", f"{path}.json")
+
+    # Remover versões antigas além das mais recentes
+    prefix = f"{base_name}."
+    versions = sorted({
+        name[len(prefix):].split('.')[0]
+        for name in os.listdir(directory)
+        if name.startswith(prefix) and name.endswith('.npy')
+    })
+    for old_version in versions[:-SNAPSHOT_KEEP_VERSIONS]:
+        for name in os.listdir(directory):
+            if name.startswith(f"{prefix}{old_version}."):
+                os.remove(os.path.join(directory, name))
+    return version
+
+
+class OfflineSnapshot:
+    """Manifesto e arrays (mapeados em memória) de uma versão do snapshot offline"""
+
+    def __init__(self, path):
+        with open(f"{path}.json", encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("formato") != SNAPSHOT_FORMAT:
+            raise ValueError(f"formato de snapshot não suportado: {self.manifest.get('formato')}")
+
+        directory = os.path.dirname(os.path.abspath(path))
+        self.version = self.manifest["versao"]
+        self.arrays = {
+            name: np.load(os.path.join(directory, file_name), mmap_mode='r')
+            for name, file_name in self.manifest["arquivos"].items()
+        }
+
+
+_offline = None
+_offline_mtime = None
+_offline_lock = threading.Lock()
+
+
+# Função para obter o snapshot offline (recarregado quando o manifesto é substituído)
+def get_offline_snapshot():
+    global _offline, _offline_mtime
+    path = os.environ.get(BENCHMARK_CUBE_ENV, DEFAULT_CUBE_PATH)
+    try:
+        mtime = os.path.getmtime(f"{path}.json")
+    except OSError:
+        return None
+
+    with _offline_lock:
+        if _offline is None or mtime != _offline_mtime:
+            try:
+                _offline = OfflineSnapshot(path)
+                _offline_mtime = mtime
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Erro ao carregar o snapshot de benchmarks: {e}")
+        return _offline
+
+
+# Cubo de benchmarks (setor × porte × região × ano)
+#
+# Cada eixo tem o índice 0 reservado para "todos" (o total do eixo, já somado na geração), de
+# modo que qualquer fatia ou roll-up é uma leitura direta no array, sem agregação na consulta.
+
+CUBE_DIMENSIONS = ["setor", "porte", "regiao", "ano"]
+
+# Ordem em que as dimensões são descartadas quando uma célula tem poucas avaliações
+CUBE_FALLBACK_ORDER = ["ano", "regiao", "porte", "setor"]
+
+# Estatísticas por célula: contagem, somas e somas dos quadrados de cada chave
+CUBE_STATS = 1 + 2 * len(BENCHMARK_KEYS)
+
+
+class BenchmarkCube:
+    """Agregados pré-calculados por célula; array com forma (setores, portes, regiões, anos, estatísticas)"""
+
+    def __init__(self, data, years):
+        self.data = data
+        self.labels = {
+            "setor": SECTORS,
+            "porte": SIZE_BANDS,
+            "regiao": REGIONS,
+            "ano": list(years),
+        }
+
+    @classmethod
+    def from_arrays(cls, sectors, sizes, regions, years, scores):
+        """Monta o cubo a partir de colunas alinhadas (índices base 1, 0 = não informado; scores n×4)"""
+        years = np.asarray(years, dtype=np.int64)
+        year_labels = sorted(int(y) for y in np.unique(years[years > 0]))
+        year_index = np.where(years > 0, np.searchsorted(year_labels, years) + 1, 0)
+
+        shape = (len(SECTORS) + 1, len(SIZE_BANDS) + 1, len(REGIONS) + 1, len(year_labels) + 1)
+        cells = np.ravel_multi_index((sectors, sizes, regions, year_index), shape)
+        size = int(np.prod(shape))
+
+        data = np.empty(shape + (CUBE_STATS,), dtype=np.float64)
+        data[..., 0] = np.bincount(cells, minlength=size).reshape(shape)
+        for k in range(len(BENCHMARK_KEYS)):
+            data[..., 1 + k] = np.bincount(cells, weights=scores[:, k], minlength=size).reshape(shape)
+            data[..., 1 + len(BENCHMARK_KEYS) + k] = np.bincount(
+                cells, weights=scores[:, k] ** 2, minlength=size
+            ).reshape(shape)
+
+        # Roll-up: o índice 0 de cada eixo passa a conter o total do eixo (incluindo "não informado")
+        for axis in range(len(shape)):
+            head = [slice(None)] * data.ndim
+            tail = [slice(None)] * data.ndim
+            head[axis] = 0
+            tail[axis] = slice(1, None)
+            data[tuple(head)] += data[tuple(tail)].sum(axis=axis)
+
+        return cls(data, year_labels)
+
+    def _index(self, dimension, value):
+        # None ou "não informado" selecionam o total do eixo
+        if value is None or value == NOT_INFORMED or value not in self.labels[dimension]:
+            return 0
+        return self.labels[dimension].index(value) + 1
+
+    def cell(self, **filters):
+        """Estatísticas de uma célula exata; filtros omitidos correspondem a "todos" """
+        position = tuple(self._index(d, filters.get(d)) for d in CUBE_DIMENSIONS)
+        values = self.data[position]
+        n = int(values[0])
+        result = {"n": n, "filtros": {d: filters.get(d) for d in CUBE_DIMENSIONS if self._index(d, filters.get(d))}}
+        if n:
+            result["medias"] = {}
+            result["desvios"] = {}
+            for k, key in enumerate(BENCHMARK_KEYS):
+                mean = values[1 + k] / n
+                variance = max(values[1 + len(BENCHMARK_KEYS) + k] / n - mean * mean, 0.0)
+                result["medias"][key] = float(mean)
+                result["desvios"][key] = float(variance ** 0.5)
+        return result
+
+    def query(self, min_samples=MIN_SAMPLES, **filters):
+        """Célula mais específica com pelo menos min_samples avaliações (roll-up progressivo)"""
+        filters = dict(filters)
+        result = self.cell(**filters)
+        for dimension in CUBE_FALLBACK_ORDER:
+            if result["n"] >= min_samples:
+                break
+            if filters.get(dimension) is not None:
+                filters[dimension] = None
+                result = self.cell(**filters)
+        return result if result["n"] >= min_samples else None
+
+    def slice(self, dimension, **filters):
+        """Uma célula por valor da dimensão, com os demais filtros fixos: {valor: célula}"""
+        return {
+            value: self.cell(**dict(filters, **{dimension: value}))
+            for value in self.labels[dimension]
+        }
+
+
+# Função para obter o cubo do snapshot offline
+def get_benchmark_cube():
+    snapshot = get_offline_snapshot()
+    if snapshot is None or "cubo" not in snapshot.arrays:
+        return None
+    return BenchmarkCube(snapshot.arrays["cubo"], snapshot.manifest["anos"])
+
+
+# Intervalos de confiança (bootstrap) da média de cada setor
+#
+# Array do snapshot com forma (setores, chaves, 4): avaliações, média, limite inferior e
+# limite superior do intervalo de 95%.
+def get_confidence_intervals(sector):
+    """{chave: (inferior, superior, média)} do setor, ou {} sem snapshot ou com poucas avaliações
+
+    A média é a do próprio snapshot, da qual o intervalo foi calculado; a média exibida no app vem
+    dos agregados incrementais (ou dos valores padrão) e pode ser diferente.
+    """
+    snapshot = get_offline_snapshot()
+    if snapshot is None or "intervalos" not in snapshot.arrays or sector not in SECTORS:
+        return {}
+
+    values = snapshot.arrays["intervalos"][SECTORS.index(sector)]
+    if values[0, 0] < MIN_SAMPLES:
+        return {}
+    return {key: (float(values[k, 2]), float(values[k, 3]), float(values[k, 1])) for k, key in enumerate(BENCHMARK_KEYS)}
@@ -0,0 +1,513 @@
+# Gráficos Plotly usados na interface e nos relatórios PDF
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from assessment import CATEGORIES
+from reports import format_currency
+from tracing import traced
+
+# Função para criar o gráfico de velocímetro com Plotly
+@traced()
+def create_gauge_chart_plotly(score):
+    if score <= 40:
+        color = "red"
+        risk_level = "🚨 CRÍTICO"
+    elif score <= 70:
+        color = "orange"
+        risk_level = "⚠️ MODERADO"
+    else:
+        color = "green"
+        risk_level = "✅ BOM"
+    
+    fig = go.Figure(go.Indicator(
+        mode = "gauge+number",
+        value = score,
+        domain = {'x': [0, 1], 'y': [0, 1]},
+        title = {
+            'text': f"Nível de Segurança<br><span style='font-size:0.8em;color:{color}'>{risk_level}</span>", 
+            'font': {'size': 20},
+            'align': 'center'
+        },
+        gauge = {
+            'axis': {'range': [None, 100], 'tickwidth': 1, 'tickcolor': "darkblue"},
+            'bar': {'color': color},
+            'bgcolor': "white",
+            'borderwidth': 2,
+            'bordercolor': "gray",
+            'steps': [
+                {'range': [0, 40], 'color': 'rgba(255, 0, 0, 0.3)'},
+                {'range': [40, 70], 'color': 'rgba(255, 165, 0, 0.3)'},
+                {'range': [70, 100], 'color': 'rgba(0, 128, 0, 0.3)'}],
+            'threshold': {
+                'line': {'color': "black", 'width': 4},
+                'thickness': 0.75,
+                'value': score}}))
+    
+    fig.update_layout(
+        height=350,  # Aumentar a altura para acomodar o título
+        margin=dict(l=20, r=20, t=90, b=20),  # Aumentar a margem superior (t) para o título
+        paper_bgcolor="white",
+        font={'color': "darkblue", 'family': "Arial"}
+    )
+    
+    return fig
+
+# Função para criar gráfico de barras para categorias com Plotly
+@traced()
+def create_category_chart_plotly(scores, benchmark_data=None, industry=None):
+    categories = list(scores.keys())
+    values = list(scores.values())
+    
+    # Criar DataFrame para Plotly
+    df = pd.DataFrame({
+        'Categoria': categories,
+        'Pontuação': values
+    })
+    
+    # Adicionar dados de benchmark se disponíveis
+    if benchmark_data and industry:
+        benchmark_values = []
+        for cat in categories:
+            if cat in benchmark_data[industry]:
+                benchmark_values.append(benchmark_data[industry][cat])
+            else:
+                benchmark_values.append(0)
+        
+        df['Benchmark'] = benchmark_values
+        
+        fig = go.Figure()
+        fig.add_trace(go.Bar(
+            x=df['Categoria'],
+            y=df['Pontuação'],
+            name='Sua Empresa',
+            marker_color='blue'
+        ))
+        fig.add_trace(go.Bar(
+            x=df['Categoria'],
+            y=df['Benchmark'],
+            name=f'Média do Setor: {industry}',
+            marker_color='green'
+        ))
+    else:
+        # Definir as cores com base nos valores
+        colors = []
+        for value in values:
+            if value <= 40:
+                colors.append('red')
+            elif value <= 70:
+                colors.append('orange')
+            else:
+                colors.append('green')
+                
+        fig = go.Figure()
+        fig.add_trace(go.Bar(
+            x=df['Categoria'],
+            y=df['Pontuação'],
+            marker_color=colors
+        ))
+    
+    fig.update_layout(
+        title='Pontuação por Categoria',
+        xaxis_title='Categoria',
+        yaxis_title='Pontuação (%)',
+        yaxis=dict(range=[0, 100]),
+        bargap=0.2,
+        bargroupgap=0.1,
+        height=400,
+        margin=dict(l=50, r=50, t=80, b=50)
+    )
+    
+    # Adicionar anotações com valores
+    for i, value in enumerate(values):
+        fig.add_annotation(
+            x=categories[i],
+            y=value,
+            text=f"{value:.1f}%",
+            showarrow=False,
+            yshift=10,
+            font=dict(size=14)
+        )
+        
+    return fig
+
+# Função para criar gráfico de radar para comparação de benchmarking
+@traced()
+def create_radar_chart(scores, benchmark_data, industry, intervals=None):
+    # Preparar os dados
+    categories = list(scores.keys())
+    company_values = list(scores.values())
+    
+    benchmark_values = []
+    for cat in categories:
+        if cat in benchmark_data[industry]:
+            benchmark_values.append(benchmark_data[industry][cat])
+        else:
+            benchmark_values.append(0)
+    
+    # Criar o gráfico de radar
+    fig = go.Figure()
+    
+    # Adicionar dados da empresa
+    fig.add_trace(go.Scatterpolar(
+        r=company_values,
+        theta=categories,
+        fill='toself',
+        name='Sua Empresa',
+        line_color='blue'
+    ))
+    
+    # Adicionar dados do benchmark
+    fig.add_trace(go.Scatterpolar(
+        r=benchmark_values,
+        theta=categories,
+        fill='toself',
+        name=f'Média do Setor: {industry}',
+        line_color='green'
+    ))
+    
+    # Adicionar intervalo de confiança de 95% da média do setor, se disponível, com a média do
+    # snapshot noturno de que ele foi calculado (a média do setor acima vem dos agregados atuais)
+    if intervals:
+        if all(len(intervals[cat]) > 2 for cat in categories if cat in intervals):
+            fig.add_trace(go.Scatterpolar(
+                r=[intervals[cat][2] if cat in intervals else 0 for cat in categories],
+                theta=categories,
+                name='Média do Snapshot (IC 95%)',
+                line=dict(color='green', dash='dash', width=1)
+            ))
+        for bound, label in ((0, 'Limite Inferior'), (1, 'Limite Superior')):
+            fig.add_trace(go.Scatterpolar(
+                r=[intervals[cat][bound] if cat in intervals else 0 for cat in categories],
+                theta=categories,
+                name=f'{label} (IC 95%)',
+                line=dict(color='green', dash='dot', width=1)
+            ))
+    
+    # Atualizar layout
+    fig.update_layout(
+        polar=dict(
+            radialaxis=dict(
+                visible=True,
+                range=[0, 100]
+            )
+        ),
+        showlegend=True,
+        title=f"Comparação com o Setor: {industry}",
+        height=500
+    )
+    
+    return fig
+
+# Função para criar gráfico de ROI com Plotly
+@traced()
+def create_roi_chart_plotly(investment, total_before, total_after):
+    savings = total_before - total_after
+    roi = ((savings - investment) / investment) * 100 if investment > 0 else 0
+    
+    # Criar DataFrame para Plotly
+    df = pd.DataFrame({
+        'Categoria': ['Investimento', 'Economia', 'ROI (%)'],
+        'Valor': [investment, savings, roi]
+    })
+    
+    # Definir cores
+    colors = ['blue', 'green', 'orange']
+    
+    # Criar dois subplots: um para valores monetários, outro para percentual
+    fig = make_subplots(rows=1, cols=2, specs=[[{"type": "bar"}, {"type": "bar"}]])
+    
+    # Valores monetários
+    fig.add_trace(
+        go.Bar(
+            x=['Investimento', 'Economia'],
+            y=[investment, savings],
+            marker_color=['blue', 'green'],
+            text=[format_currency(investment), format_currency(savings)],
+            textposition='auto',
+            name='Valores (R$)'
+        ),
+        row=1, col=1
+    )
+    
+    # ROI percentual
+    fig.add_trace(
+        go.Bar(
+            x=['ROI'],
+            y=[roi],
+            marker_color='orange',
+            text=[f"{roi:.1f}%"],
+            textposition='auto',
+            name='ROI (%)'
+        ),
+        row=1, col=2
+    )
+    
+    # Atualizar layout
+    fig.update_layout(
+        title='Análise de ROI em Segurança da Informação',
+        height=400,
+        showlegend=False,
+        margin=dict(l=50, r=50, t=80, b=50)
+    )
+    
+    fig.update_yaxes(title_text="Valor (R$)", row=1, col=1)
+    fig.update_yaxes(title_text="Percentual (%)", row=1, col=2)
+    
+    return fig
+
+# Função para criar gráfico de tendências de incidentes
+@traced()
+def create_incident_trend_chart(incidents_data):
+    fig = px.line(
+        incidents_data, 
+        x='Mês', 
+        y='Número de Incidentes',
+        markers=True,
+        line_shape='linear',
+        title='Tendência de Incidentes de Segurança'
+    )
+    
+    fig.update_layout(
+        xaxis_title='Mês',
+        yaxis_title='Número de Incidentes',
+        height=400,
+        margin=dict(l=50, r=50, t=80, b=50)
+    )
+    
+    return fig
+
+# Função para separar os custos antes e depois do investimento (dados dos gráficos de pizza)
+def roi_cost_breakdown(roi_results):
+    cost_breakdown_before = {
+        "Custos diretos com incidentes": roi_results.get('Num Incidentes Antes', 0) * roi_results.get('Custo por Incidente Antes', 0),
+        "Custos com horas de trabalho": roi_results.get('Num Incidentes Antes', 0) * roi_results.get('Horas por Incidente Antes', 0) * roi_results.get('hourly_cost', 0)
+    }
+    
+    cost_breakdown_after = {
+        "Custos diretos com incidentes": roi_results.get('Num Incidentes Depois', 0) * roi_results.get('Custo por Incidente Depois', 0),
+        "Custos com horas de trabalho": roi_results.get('Num Incidentes Depois', 0) * roi_results.get('Horas por Incidente Depois', 0) * roi_results.get('hourly_cost', 0)
+    }
+    return cost_breakdown_before, cost_breakdown_after
+
+# Função para criar gráfico de pizza melhorado
+@traced()
+def create_pie_chart_plotly(data, title):
+    labels = list(data.keys())
+    values = list(data.values())
+    
+    # Criar gráfico de pizza com tamanho adequado
+    fig = go.Figure(data=[go.Pie(
+        labels=labels,
+        values=values,
+        textinfo='percent+label',
+        insidetextorientation='radial',
+        textposition='inside',
+        hole=0.3,
+        marker=dict(
+            colors=['#FF6B6B', '#4ECDC4'],
+            line=dict(color='#FFFFFF', width=2)
+        )
+    )])
+    
+    fig.update_layout(
+        title=title,
+        height=400,
+        margin=dict(l=20, r=20, t=50, b=20),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=-0.2,
+            xanchor="center",
+            x=0.5
+        ),
+        font=dict(size=12)
+    )
+    
+    # Ajuste para garantir visibilidade adequada dos rótulos
+    fig.update_traces(
+        textfont_size=12,
+        hoverinfo="label+percent+value"
+    )
+    
+    return fig
+
+# Função para criar gráfico de evolução das pontuações entre avaliações
+@traced()
+def create_progress_chart(dates, scores):
+    # scores: uma lista [infraestrutura, políticas, proteção, geral] por avaliação, na ordem de dates
+    labels = CATEGORIES + ["Geral"]
+    df = pd.DataFrame(scores, columns=labels)
+    df['Data'] = dates
+    df = df.melt(id_vars='Data', var_name='Categoria', value_name='Pontuação')
+    
+    fig = px.line(
+        df,
+        x='Data',
+        y='Pontuação',
+        color='Categoria',
+        markers=True,
+        title='Evolução das Pontuações'
+    )
+    
+    fig.update_layout(
+        yaxis_title='Pontuação (%)',
+        yaxis=dict(range=[0, 100]),
+        xaxis_title='',
+        height=400
+    )
+    
+    return fig
+
+# Função para criar gráfico de radar com uma série por empresa do portfólio
+@traced()
+def create_portfolio_radar_chart(portfolio_df):
+    categories = ['Infraestrutura', 'Políticas', 'Proteção', 'Total']
+    scored = portfolio_df.dropna(subset=categories)
+    
+    fig = go.Figure()
+    for label, values in zip(scored['Rótulo'], scored[categories].to_numpy()):
+        fig.add_trace(go.Scatterpolar(
+            r=values,
+            theta=categories,
+            fill='toself',
+            opacity=0.5,
+            name=label
+        ))
+    
+    fig.update_layout(
+        polar=dict(
+            radialaxis=dict(
+                visible=True,
+                range=[0, 100]
+            )
+        ),
+        showlegend=True,
+        title="Comparação por Categoria entre as Empresas",
+        height=500
+    )
+    
+    return fig
+
+# Função para criar gráfico de barras com o ranking do portfólio
+@traced()
+def create_portfolio_ranking_chart(portfolio_df):
+    ranking_df = portfolio_df.dropna(subset=['Total'])
+    
+    fig = px.bar(
+        ranking_df,
+        x='Rótulo',
+        y='Total',
+        text_auto='.1f',
+        title='Ranking do Portfólio por Pontuação Geral',
+        color='Setor'
+    )
+    
+    fig.update_layout(
+        yaxis_title='Pontuação (%)',
+        yaxis=dict(range=[0, 100]),
+        xaxis_title='',
+        xaxis=dict(categoryorder='array', categoryarray=list(ranking_df['Rótulo'])),
+        height=500
+    )
+    
+    return fig
+
+# Função para criar gráfico de barras comparando a empresa com todos os setores
+@traced()
+def create_all_sectors_chart(company_total, benchmark_data, industry):
+    all_industries_data = []
+    for ind in benchmark_data.keys():
+        all_industries_data.append({
+            'Setor': ind,
+            'Pontuação': benchmark_data[ind]['Total']
+        })
+    
+    # Adicionar a empresa
+    all_industries_data.append({
+        'Setor': 'Sua Empresa',
+        'Pontuação': company_total
+    })
+    
+    all_industries_df = pd.DataFrame(all_industries_data)
+    all_industries_df = all_industries_df.sort_values('Pontuação', ascending=False)
+    
+    fig = px.bar(
+        all_industries_df,
+        x='Setor',
+        y='Pontuação',
+        text_auto='.1f',
+        title='Comparação com Todos os Setores',
+        color='Setor',
+        color_discrete_map={
+            'Sua Empresa': 'blue',
+            **{ind: 'lightgreen' if ind == industry else 'lightgray' for ind in benchmark_data.keys()}
+        }
+    )
+    
+    fig.update_layout(
+        yaxis_title='Pontuação (%)',
+        yaxis=dict(range=[0, 100]),
+        xaxis_title='',
+        height=500
+    )
+    
+    return fig
+
+# Função para criar os gráficos do relatório completo a partir dos resultados de cada análise
+def complete_report_figures(vulnerability_results, roi_results, benchmark_results, progress, benchmark_data, intervals):
+    figures = {}
+
+    if vulnerability_results:
+        figures['gauge'] = create_gauge_chart_plotly(vulnerability_results["Pontuação Geral"])
+        figures['category'] = create_category_chart_plotly({
+            "Infraestrutura": vulnerability_results["Pontuação Infraestrutura"],
+            "Políticas": vulnerability_results["Pontuação Políticas"],
+            "Proteção": vulnerability_results["Pontuação Proteção"]
+        })
+
+    if roi_results:
+        figures['roi'] = create_roi_chart_plotly(
+            roi_results["Investimento"],
+            roi_results.get("Custo Total Antes", 0),
+            roi_results.get("Custo Total Depois", 0)
+        )
+        cost_breakdown_before, cost_breakdown_after = roi_cost_breakdown(roi_results)
+        figures['pie_before'] = create_pie_chart_plotly(cost_breakdown_before, "Custos Antes do Investimento")
+        figures['pie_after'] = create_pie_chart_plotly(cost_breakdown_after, "Custos Após o Investimento")
+
+    if benchmark_results:
+        company_scores = benchmark_results["Company"]
+        industry = benchmark_results["IndustryName"]
+        figures['radar'] = create_radar_chart(company_scores, benchmark_data, industry, intervals.get(industry))
+        figures['all_sectors'] = create_all_sectors_chart(company_scores['Total'], benchmark_data, industry)
+
+    if progress:
+        figures['progress'] = create_progress_chart(progress['historico']['datas'], progress['historico']['pontuacoes'])
+
+    return figures
+
+# Função para criar o gráfico da linha do tempo de um rerun (painel de administração)
+def create_timeline_chart(timeline):
+    spans = timeline["spans"]
+    labels = [f"{i + 1}. {'· ' * span['nivel']}{span['nome']}" for i, span in enumerate(spans)]
+    
+    fig = go.Figure(go.Bar(
+        y=labels,
+        x=[span["duracao_ms"] for span in spans],
+        base=[span["inicio_ms"] for span in spans],
+        orientation='h',
+        marker_color=['#1f77b4' if span["nivel"] == 0 else '#ff7f0e' for span in spans],
+        hovertemplate='%{y}<br>início: %{base:.1f} ms<br>duração: %{x:.1f} ms<extra></extra>'
+    ))
+    
+    fig.update_layout(
+        title=f"Rerun de {timeline['inicio'][11:19]} ({timeline['duracao_ms']:.0f} ms, {timeline['status']})",
+        xaxis_title='Tempo desde o início do rerun (ms)',
+        yaxis=dict(autorange='reversed'),
+        height=max(300, 22 * len(spans) + 120),
+        margin=dict(l=10, r=10, t=60, b=40)
+    )
+    
+    return fig
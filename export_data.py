@@ -0,0 +1,217 @@
+# Exportação paginada de leads e avaliações para CSV ou Parquet
+#
+# Uso:
+#   python export_data.py usuarios --saida leads.csv
+#   python export_data.py avaliacoes --formato parquet --saida avaliacoes.parquet --since 2025-01-01
+#   python export_data.py usuarios --saida leads.csv --checkpoint leads.checkpoint.json
+#
+# A coleção é percorrida com paginação por cursor (Firestore ou banco local definido em
+# FORM_SEGURANCA_DB) e cada página é gravada antes da próxima ser lida, de modo que o uso
+# de memória fica limitado ao tamanho da página. Com --checkpoint, uma exportação
+# interrompida continua a partir do último documento gravado.
+import argparse
+import csv
+import json
+import os
+import sys
+from datetime import datetime
+
+from assessment import CATEGORIES, ROI_INPUT_FIELDS, ROI_OUTPUT_FIELDS, normalize_key_part
+from storage import ASSESSMENTS_COLLECTION, LOCAL_DB_ENV, ORDER_FIELDS, USERS_COLLECTION, get_backend
+
+# Colunas exportadas para cada coleção
+USER_COLUMNS = ['id', 'nome_completo', 'telefone', 'email', 'empresa', 'industry', 'porte', 'regiao', 'data_cadastro', 'ultimo_acesso']
+
+SCORE_COLUMNS = [f"pontuacao_{normalize_key_part(c)}" for c in CATEGORIES] + ['pontuacao_geral']
+BENCHMARK_COLUMNS = [f"setor_{normalize_key_part(c)}" for c in CATEGORIES] + ['setor_geral']
+ROI_INPUT_COLUMNS = [f"roi_{field}" for field in ROI_INPUT_FIELDS]
+ROI_OUTPUT_COLUMNS = [f"roi_{normalize_key_part(field).replace(' ', '_')}" for field in ROI_OUTPUT_FIELDS]
+
+ASSESSMENT_BASE_COLUMNS = [
+    'id', 'lead_id', 'versao_catalogo', 'email', 'empresa', 'setor', 'porte', 'regiao', 'data_avaliacao', 'respostas', 'mascara'
+]
+
+ASSESSMENT_COLUMNS = (
+    ASSESSMENT_BASE_COLUMNS
+    + SCORE_COLUMNS + ROI_INPUT_COLUMNS + ROI_OUTPUT_COLUMNS + BENCHMARK_COLUMNS
+)
+
+
+# Função para achatar um documento de 'usuarios' em uma linha
+def user_row(doc_id, data):
+    row = {column: data.get(column) for column in USER_COLUMNS}
+    row['id'] = doc_id
+    return row
+
+
+# Função para achatar um documento de 'avaliacoes' em uma linha (listas viram colunas)
+def assessment_row(doc_id, data):
+    row = {column: data.get(column) for column in ASSESSMENT_BASE_COLUMNS}
+    row['id'] = doc_id
+    for columns, field in (
+        (SCORE_COLUMNS, 'pontuacoes'),
+        (ROI_INPUT_COLUMNS, 'roi_entradas'),
+        (ROI_OUTPUT_COLUMNS, 'roi_saidas'),
+        (BENCHMARK_COLUMNS, 'benchmark_setor'),
+    ):
+        values = data.get(field) or [None] * len(columns)
+        row.update(zip(columns, values))
+    return row
+
+
+EXPORTS = {
+    USERS_COLLECTION: (USER_COLUMNS, user_row),
+    ASSESSMENTS_COLLECTION: (ASSESSMENT_COLUMNS, assessment_row),
+}
+
+
+# Função para formatar datas de forma uniforme entre Firestore e banco local
+def _normalize_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class CsvWriter:
+    """Grava as linhas em um único CSV, acrescentando ao arquivo ao retomar"""
+
+    def __init__(self, path, columns, resume):
+        append = resume and os.path.exists(path)
+        self.file = open(path, 'a' if append else 'w', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.file, fieldnames=columns)
+        if not append:
+            self.writer.writeheader()
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    """Grava cada página como um row group; ao retomar, cria um novo arquivo de parte"""
+
+    def __init__(self, path, columns, resume, part):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            sys.exit("A exportação em Parquet requer o pacote pyarrow (pip install pyarrow).")
+
+        if resume and part > 0:
+            stem, ext = os.path.splitext(path)
+            path = f"{stem}-parte-{part}{ext}"
+
+        self.pa = pa
+        self.columns = columns
+        self.schema = pa.schema([(column, pa.string()) for column in columns])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        # Valores gravados como texto para manter um esquema estável entre páginas
+        arrays = [
+            self.pa.array([None if row[column] is None else str(row[column]) for row in rows], type=self.pa.string())
+            for column in self.columns
+        ]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+# Funções para ler e gravar o checkpoint da exportação
+def load_checkpoint(path):
+    if path and os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def save_checkpoint(path, checkpoint):
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+# Função principal de exportação
+def export_collection(collection, output, file_format='csv', since=None, checkpoint_path=None, page_size=500):
+    """Exporta a coleção página por página e retorna o total de documentos gravados"""
+    backend = get_backend()
+    if backend is None:
+        sys.exit(f"Nenhum armazenamento configurado (Firebase nos secrets ou {LOCAL_DB_ENV}).")
+
+    columns, to_row = EXPORTS[collection]
+    checkpoint = load_checkpoint(checkpoint_path)
+    resume = checkpoint.get('colecao') == collection and checkpoint.get('saida') == output
+    if not resume:
+        checkpoint = {
+            'colecao': collection,
+            'saida': output,
+            'since': since.isoformat() if since else None,
+            'ultimo_id': None,
+            'exportados': 0,
+            'partes': 0,
+        }
+    else:
+        # Ao retomar, o filtro usado na exportação original prevalece
+        since = datetime.fromisoformat(checkpoint['since']) if checkpoint.get('since') else None
+
+    if file_format == 'parquet':
+        writer = ParquetWriter(output, columns, resume, checkpoint['partes'])
+        checkpoint['partes'] += 1
+    else:
+        writer = CsvWriter(output, columns, resume)
+
+    try:
+        pages = backend.iter_pages(
+            collection,
+            ORDER_FIELDS[collection],
+            since=since,
+            after_id=checkpoint['ultimo_id'],
+            page_size=page_size
+        )
+        for page in pages:
+            rows = [{k: _normalize_value(v) for k, v in to_row(doc_id, data).items()} for doc_id, data in page]
+            writer.write(rows)
+
+            # O checkpoint só avança depois que a página foi gravada
+            checkpoint['ultimo_id'] = page[-1][0]
+            checkpoint['exportados'] += len(page)
+            save_checkpoint(checkpoint_path, checkpoint)
+            print(f"{checkpoint['exportados']} documentos exportados...", file=sys.stderr)
+    finally:
+        writer.close()
+
+    return checkpoint['exportados']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta leads e avaliações com paginação por cursor.")
+    parser.add_argument('colecao', choices=sorted(EXPORTS), help="coleção a exportar")
+    parser.add_argument('--saida', required=True, help="arquivo de saída (.csv ou .parquet)")
+    parser.add_argument('--formato', choices=['csv', 'parquet'], default=None, help="formato (padrão: pela extensão)")
+    parser.add_argument('--since', type=datetime.fromisoformat, default=None,
+                        help="exporta apenas documentos a partir desta data (AAAA-MM-DD), pelo campo de data da coleção")
+    parser.add_argument('--checkpoint', default=None, help="arquivo de checkpoint para retomar a exportação")
+    parser.add_argument('--tamanho-pagina', type=int, default=500, help="documentos por página (padrão: 500)")
+    args = parser.parse_args(argv)
+
+    file_format = args.formato or ('parquet' if args.saida.endswith('.parquet') else 'csv')
+    total = export_collection(
+        args.colecao,
+        args.saida,
+        file_format=file_format,
+        since=args.since,
+        checkpoint_path=args.checkpoint,
+        page_size=args.tamanho_pagina
+    )
+    print(f"Exportação concluída: {total} documentos em {args.saida}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+# Teste de carga com sessões simultâneas simuladas (Streamlit AppTest)
+#
+# Uso:
+#   python loadtest.py --sessoes 40 --concorrencia 8
+#   python loadtest.py --sessoes 100 --concorrencia 20 --pausa 0.5 --saida carga.json
+#
+# Cada sessão percorre a jornada de um usuário real em main.py, sem navegador: cadastro,
+# respostas do questionário (um rerun por resposta, como no navegador), cálculo do ROI,
+# comparação com o setor e download do relatório completo. As sessões gravam no banco SQLite
+# local (FORM_SEGURANCA_DB) no lugar do Firestore; sem a variável, um banco temporário é criado.
+#
+# O AppTest não suporta várias sessões em threads do mesmo processo (o estado global do Runtime e
+# a compilação do script não são isolados por sessão), então cada sessão simultânea roda em um
+# processo próprio. Os processos disputam a CPU como as sessões de um servidor e mantêm suas
+# sessões abertas até o fim, como abas abertas no navegador.
+#
+# Ao final são exibidos a vazão (sessões e reruns por segundo), a latência dos reruns
+# (p50/p95/p99, no total e por etapa) e a memória por sessão (aumento do RSS de cada processo
+# após o aquecimento, dividido pelas sessões abertas nele).
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from assessment import QUESTIONS
+from session_memory import process_rss
+from storage import LOCAL_DB_ENV
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+# Etapas da jornada, na ordem
+STEPS = ["abertura", "cadastro", "questionario", "roi", "benchmarking", "relatorio"]
+
+# Tempo máximo de um rerun antes de a sessão falhar (segundos)
+RERUN_TIMEOUT = 120
+
+# Espera pelo relatório completo, gerado em segundo plano: limite e intervalo entre reruns (segundos)
+REPORT_TIMEOUT = 120
+REPORT_POLL_SECONDS = 1
+
+SECTORS = ["Tecnologia", "Finanças", "Saúde", "Varejo", "Educação", "Manufatura", "Serviços"]
+
+# Estado de cada processo de sessões (definido no inicializador)
+_worker = None
+
+
+class Session:
+    """Uma sessão simulada: o AppTest, as latências de cada rerun e as falhas por etapa"""
+
+    def __init__(self, number, seed, pause=0.0):
+        from streamlit.testing.v1 import AppTest
+
+        self.number = number
+        self.rng = random.Random(seed * 100003 + number)
+        self.pause = pause
+        self.app = AppTest.from_file(APP_PATH, default_timeout=RERUN_TIMEOUT)
+        self.reruns = []
+        self.errors = []
+        self.report_downloaded = False
+
+    def rerun(self, step, widget=None):
+        """Executa um rerun (clique ou mudança de valor) e registra a latência e as exceções"""
+        if self.pause:
+            time.sleep(self.pause * self.rng.uniform(0.5, 1.5))
+        started = time.perf_counter()
+        (widget or self.app).run()
+        self.reruns.append((step, time.perf_counter() - started))
+        if self.app.exception:
+            raise RuntimeError(self.app.exception[0].message)
+
+    def register(self):
+        app = self.app
+        app.text_input(key="nome_completo").input(f"Usuário {self.number}")
+        app.text_input(key="telefone").input(f"119{self.number:08d}")
+        app.text_input(key="email").input(f"carga{self.number}@exemplo.com.br")
+        app.text_input(key="empresa").input(f"Empresa {self.number}")
+        app.selectbox(key="industry").select(self.rng.choice(SECTORS))
+        self.rerun("cadastro", app.button[0].click())
+        # st.rerun após o cadastro: o AppTest executa o script de novo na mesma chamada
+        if not app.session_state.user_registered:
+            raise RuntimeError("cadastro não concluído")
+
+    def answer_questionnaire(self):
+        for question in QUESTIONS:
+            key = f"vulnerability_{question['key']}"
+            widget = self.app.selectbox(key=key) if question.get("widget") == "selectbox" else self.app.radio(key=key)
+            self.rerun("questionario", widget.set_value(self.rng.choice(question["options"])))
+        self.rerun("questionario", self.app.button(key="vulnerability_calculate").click())
+
+    def compute_roi(self):
+        app = self.app
+        values = [
+            ("roi_num_incidents", self.rng.randint(1, 20)),
+            ("roi_cost_per_incident", float(self.rng.randrange(5000, 200000, 1000))),
+            ("roi_hours", self.rng.randint(1, 72)),
+            ("roi_hourly_cost", float(self.rng.randrange(50, 500, 10))),
+            ("roi_security_investment", float(self.rng.randrange(10000, 500000, 1000))),
+        ]
+        for key, value in values:
+            self.rerun("roi", app.number_input(key=key).set_value(value))
+        self.rerun("roi", app.radio(key="roi_reduced_incidents").set_value("Sim"))
+        self.rerun("roi", app.number_input(key="roi_new_num_incidents").set_value(self.rng.randint(0, values[0][1])))
+        self.rerun("roi", app.button(key="roi_calculate").click())
+
+    def compare_benchmark(self):
+        self.rerun("benchmarking", self.app.button(key="benchmark_compare").click())
+
+    def download_report(self):
+        # O link do relatório completo substitui a barra de progresso quando a geração em segundo
+        # plano termina; até lá, a página é recarregada como faz o fragmento do app
+        deadline = time.monotonic() + REPORT_TIMEOUT
+        while True:
+            if any("Erro ao gerar o relatório" in error.value for error in self.app.error):
+                raise RuntimeError("erro ao gerar o relatório completo")
+            self.report_downloaded = any(
+                "relatorio_completo_" in markdown.value and "data:application/pdf;base64," in markdown.value
+                for markdown in self.app.markdown
+            )
+            if self.report_downloaded:
+                return
+            if time.monotonic() > deadline:
+                raise RuntimeError("link do relatório completo não encontrado")
+            time.sleep(REPORT_POLL_SECONDS)
+            self.rerun("relatorio")
+
+    def run(self):
+        """Percorre a jornada; uma falha encerra as etapas que dependem dela"""
+        journey = [
+            ("abertura", lambda: self.rerun("abertura")),
+            ("cadastro", self.register),
+            ("questionario", self.answer_questionnaire),
+            ("roi", self.compute_roi),
+            ("benchmarking", self.compare_benchmark),
+            ("relatorio", self.download_report),
+        ]
+        for step, action in journey:
+            try:
+                action()
+            except Exception as e:
+                self.errors.append((step, f"{type(e).__name__}: {e}"))
+                # Sem cadastro não há o restante da jornada; as demais etapas seguem independentes
+                if step in ("abertura", "cadastro"):
+                    break
+        return self
+
+
+# Função para calcular p50/p95/p99 e média de uma lista de latências (ms)
+def latency_summary(seconds):
+    if not seconds:
+        return {"reruns": 0}
+    values = np.array(seconds) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "reruns": int(len(values)),
+        "media_ms": float(values.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(values.max()),
+    }
+
+
+# Funções executadas nos processos de sessões
+def _init_worker(seed, pause):
+    global _worker
+    # Aquecimento: importações e caches de módulo não entram na memória por sessão
+    Session(0, seed).run()
+    _worker = {'semente': seed, 'pausa': pause, 'rss_inicial': process_rss(), 'sessoes': []}
+
+
+def _run_session(number):
+    """Executa uma sessão e a mantém aberta; retorna as medições e a memória do processo"""
+    session = Session(number, _worker['semente'], _worker['pausa']).run()
+    _worker['sessoes'].append(session)
+    return {
+        "reruns": session.reruns,
+        "falhas": session.errors,
+        "relatorio_baixado": session.report_downloaded,
+        "processo": os.getpid(),
+        "memoria": max(0, process_rss() - _worker['rss_inicial']),
+        "sessoes_abertas": len(_worker['sessoes']),
+    }
+
+
+# Função para executar as sessões simultâneas e resumir o resultado
+def run_load(sessions, concurrency, seed=0, pause=0.0, log=sys.stderr):
+    finished = []
+    memory = {}
+    # 'spawn': cada processo importa o app do zero, como um servidor recém-iniciado
+    pool = ProcessPoolExecutor(
+        max_workers=concurrency,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(seed, pause)
+    )
+    with pool:
+        # O aquecimento dos processos não entra no tempo medido
+        list(pool.map(time.sleep, [0.5] * concurrency))
+        started = time.perf_counter()
+        futures = [pool.submit(_run_session, number) for number in range(1, sessions + 1)]
+        for future in as_completed(futures):
+            result = future.result()
+            finished.append(result)
+            # Vale a última medição de cada processo, com todas as suas sessões abertas
+            memory[result["processo"]] = max(memory.get(result["processo"], (0, 0)), (result["sessoes_abertas"], result["memoria"]))
+            if len(finished) % max(1, sessions // 10) == 0 or len(finished) == sessions:
+                print(f"{len(finished)}/{sessions} sessões ({time.perf_counter() - started:.1f} s)", file=log)
+        elapsed = time.perf_counter() - started
+
+    open_sessions = sum(count for count, _ in memory.values())
+    reruns = [seconds for result in finished for _, seconds in result["reruns"]]
+    errors = {}
+    for result in finished:
+        for step, message in result["falhas"]:
+            errors.setdefault(step, {}).setdefault(message, 0)
+            errors[step][message] += 1
+
+    return {
+        "sessoes": sessions,
+        "concorrencia": concurrency,
+        "segundos": elapsed,
+        "sessoes_por_segundo": sessions / elapsed if elapsed > 0 else 0.0,
+        "reruns_por_segundo": len(reruns) / elapsed if elapsed > 0 else 0.0,
+        "sessoes_completas": sum(1 for result in finished if not result["falhas"]),
+        "relatorios_baixados": sum(1 for result in finished if result["relatorio_baixado"]),
+        "latencia": latency_summary(reruns),
+        "latencia_por_etapa": {
+            step: latency_summary([seconds for result in finished for name, seconds in result["reruns"] if name == step])
+            for step in STEPS if step != "relatorio"
+        },
+        "memoria_por_sessao_mb": sum(rss for _, rss in memory.values()) / open_sessions / 1e6 if open_sessions else 0.0,
+        "processos": len(memory),
+        "falhas": errors,
+    }
+
+
+def print_summary(summary):
+    latency = summary["latencia"]
+    print(
+        f"{summary['sessoes']} sessões ({summary['concorrencia']} simultâneas) em {summary['segundos']:.1f} s: "
+        f"{summary['sessoes_por_segundo']:.2f} sessões/s, {summary['reruns_por_segundo']:.1f} reruns/s"
+    )
+    print(f"{summary['sessoes_completas']} jornadas completas, {summary['relatorios_baixados']} relatórios baixados")
+    if latency["reruns"]:
+        print(
+            f"Latência dos reruns ({latency['reruns']}): p50 {latency['p50_ms']:.0f} ms, "
+            f"p95 {latency['p95_ms']:.0f} ms, p99 {latency['p99_ms']:.0f} ms, máx. {latency['max_ms']:.0f} ms"
+        )
+    for step, step_latency in summary["latencia_por_etapa"].items():
+        if step_latency["reruns"]:
+            print(
+                f"  {step:<14}{step_latency['reruns']:>6} reruns  p50 {step_latency['p50_ms']:>7.0f} ms  "
+                f"p95 {step_latency['p95_ms']:>7.0f} ms  p99 {step_latency['p99_ms']:>7.0f} ms"
+            )
+    print(f"Memória: {summary['memoria_por_sessao_mb']:.1f} MB por sessão aberta ({summary['processos']} processos)")
+    for step, messages in summary["falhas"].items():
+        for message, count in messages.items():
+            print(f"Falha em {step} ({count} sessões): {message}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga do app com sessões simultâneas simuladas.")
+    parser.add_argument('--sessoes', type=int, default=20, help="número de sessões simuladas (padrão: 20)")
+    parser.add_argument('--concorrencia', type=int, default=4, help="sessões executadas ao mesmo tempo, uma por processo (padrão: 4)")
+    parser.add_argument('--pausa', type=float, default=0.0,
+                        help="pausa média entre as ações de cada usuário, em segundos (padrão: 0)")
+    parser.add_argument('--semente', type=int, default=0, help="semente das respostas simuladas (padrão: 0)")
+    parser.add_argument('--saida', help="grava o resumo em JSON neste arquivo")
+    args = parser.parse_args(argv)
+
+    # Sem banco configurado, as sessões gravam em um banco SQLite temporário
+    if not os.environ.get(LOCAL_DB_ENV):
+        os.environ[LOCAL_DB_ENV] = os.path.join(tempfile.mkdtemp(prefix="carga_"), "carga.db")
+    print(f"Banco de dados: {os.environ[LOCAL_DB_ENV]}", file=sys.stderr)
+
+    summary = run_load(args.sessoes, args.concorrencia, seed=args.semente, pause=args.pausa)
+    print_summary(summary)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    # O AppTest troca o módulo __main__ dos processos pelo app; as funções enviadas a eles
+    # precisam vir do módulo loadtest
+    from loadtest import main
+    main()
@@ -0,0 +1,269 @@
+# Métricas do app (contadores e histogramas) no formato de texto do Prometheus
+#
+# Uso:
+#   from metrics import REPORTS
+#   REPORTS.labels("gerado").inc()
+#   with RERUN_SECONDS.time(): ...
+#
+# As atualizações não usam trava: cada thread incrementa a sua própria parcela de cada métrica
+# e a leitura (/metrics) soma as parcelas. A trava só é usada quando uma thread atualiza uma
+# métrica pela primeira vez; nesse momento, as parcelas de threads encerradas (o Streamlit usa uma
+# thread por rerun) são incorporadas ao total acumulado, então a memória não cresce com os reruns.
+#
+# Com FORM_SEGURANCA_METRICAS_PORTA definida, start_metrics_server expõe as métricas em
+# http://127.0.0.1:<porta>/metrics para coleta pelo Prometheus.
+import bisect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Variáveis de ambiente do servidor de métricas (sem porta, o servidor não é iniciado)
+METRICS_PORT_ENV = 'FORM_SEGURANCA_METRICAS_PORTA'
+METRICS_HOST_ENV = 'FORM_SEGURANCA_METRICAS_HOST'
+DEFAULT_METRICS_HOST = '127.0.0.1'
+
+# Limites dos histogramas de duração (segundos)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PREFIX = 'form_seguranca_'
+
+_registry = []
+_server = None
+_server_lock = threading.Lock()
+
+
+class _Series:
+    """Uma série (métrica + valores dos rótulos) com uma parcela de valores por thread"""
+
+    def __init__(self, size):
+        self._size = size
+        self._local = threading.local()
+        self._shards = []
+        self._base = [0.0] * size
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'values', None)
+        if shard is None:
+            shard = [0.0] * self._size
+            self._local.values = shard
+            with self._lock:
+                self._fold_finished()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _fold_finished(self):
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                for i, value in enumerate(shard):
+                    self._base[i] += value
+        self._shards = alive
+
+    def values(self):
+        with self._lock:
+            self._fold_finished()
+            totals = list(self._base)
+            for _, shard in self._shards:
+                for i, value in enumerate(shard):
+                    totals[i] += value
+        return totals
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._children_lock = threading.Lock()
+        _registry.append(self)
+
+    def labels(self, *values):
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._children_lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _label_text(self, values, extra=()):
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+        return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        children = self._children if self.labelnames else {(): self._unlabeled()}
+        for values, child in sorted(children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _CounterChild(_Series):
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount=1):
+        self._shard()[0] += amount
+
+
+class Counter(_Metric):
+    """Contador crescente (total desde o início do processo)"""
+
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def _unlabeled(self):
+        return self.labels()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def _render_child(self, values, child):
+        return [f"{self.name}_total{self._label_text(values)} {_format(child.values()[0])}"]
+
+
+class _HistogramChild(_Series):
+    def __init__(self, buckets):
+        # Uma posição por limite, mais +Inf, a soma e a contagem
+        super().__init__(len(buckets) + 3)
+        self.buckets = buckets
+
+    def observe(self, value):
+        shard = self._shard()
+        shard[bisect.bisect_left(self.buckets, value)] += 1
+        shard[-2] += value
+        shard[-1] += 1
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("child", "started")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.child.observe(time.perf_counter() - self.started)
+        return False
+
+
+class Histogram(_Metric):
+    """Histograma de durações com limites fixos (buckets cumulativos no formato do Prometheus)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _unlabeled(self):
+        return self.labels()
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def _render_child(self, values, child):
+        counts = child.values()
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else _format(bound)
+            lines.append(f"{self.name}_bucket{self._label_text(values, [('le', le)])} {_format(cumulative)}")
+        lines.append(f"{self.name}_sum{self._label_text(values)} {_format(counts[-2])}")
+        lines.append(f"{self.name}_count{self._label_text(values)} {_format(counts[-1])}")
+        return lines
+
+
+def _format(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+# Função para gerar o texto de todas as métricas (formato de exposição do Prometheus)
+def render_metrics():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = render_metrics().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Sem uma linha no stdout a cada coleta
+        pass
+
+
+# Função para iniciar o servidor de métricas uma única vez por processo (chamada a cada rerun)
+def start_metrics_server(port=None, host=None):
+    """Retorna o servidor em execução, ou None sem porta configurada ou se a porta estiver ocupada"""
+    global _server
+    if _server is not None:
+        return _server
+    port = port or os.environ.get(METRICS_PORT_ENV)
+    if not port:
+        return None
+
+    with _server_lock:
+        if _server is None:
+            try:
+                server = ThreadingHTTPServer((host or os.environ.get(METRICS_HOST_ENV, DEFAULT_METRICS_HOST), int(port)), _MetricsHandler)
+            except (OSError, ValueError) as e:
+                print(f"Erro ao iniciar o servidor de métricas: {e}")
+                return None
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+            _server = server
+    return _server
+
+
+# Métricas do app
+REGISTRATIONS = Counter('cadastros', "Cadastros concluídos")
+ASSESSMENTS = Counter('avaliacoes', "Testes de vulnerabilidade calculados")
+REPORTS = Counter('relatorios', "Relatórios PDF entregues, por origem (gerado, degradado, cache_memoria, cache_disco)", ['origem'])
+CACHE_REQUESTS = Counter('cache_consultas', "Consultas aos caches do app", ['cache'])
+CACHE_MISSES = Counter('cache_falhas', "Consultas aos caches do app sem o item em cache", ['cache'])
+STORAGE_FAILURES = Counter('falhas_armazenamento', "Falhas de acesso ao Firebase (ou ao banco local), por operação", ['operacao'])
+RERUN_SECONDS = Histogram('rerun_segundos', "Duração dos reruns do script")
+PDF_BUILD_SECONDS = Histogram('pdf_geracao_segundos', "Duração da geração dos relatórios PDF (sem cache), por tipo", ['relatorio'])
+RASTERIZE_SECONDS = Histogram('rasterizacao_segundos', "Duração da conversão das figuras em PNG (sem cache)")
+REPORT_DEGRADATIONS = Counter(
+    'relatorios_figuras_substituidas',
+    "Figuras dos relatórios substituídas por falta de tempo ou falha na rasterização, por motivo e alternativa",
+    ['motivo', 'alternativa']
+)
+API_REQUESTS = Counter('api_requisicoes', "Requisições da API HTTP (api.py), por rota e status", ['rota', 'status'])
+API_SECONDS = Histogram('api_segundos', "Duração das requisições da API HTTP, por rota", ['rota'])
@@ -0,0 +1,282 @@
+# Versões dos gráficos desenhadas com o ReportLab a partir dos dados das figuras Plotly
+#
+# Usadas nos relatórios PDF quando a rasterização da figura (Kaleido) passa do prazo ou falha:
+# barras, pizza, linhas e radar viram gráficos vetoriais nativos do PDF; o que não tiver
+# equivalente (ou não tiver dados) vira uma tabela com os valores da figura.
+import re
+from datetime import date, datetime
+
+from reportlab.graphics.charts.barcharts import HorizontalBarChart, VerticalBarChart
+from reportlab.graphics.charts.legends import Legend
+from reportlab.graphics.charts.linecharts import HorizontalLineChart
+from reportlab.graphics.charts.piecharts import Pie
+from reportlab.graphics.charts.spider import SpiderChart
+from reportlab.graphics.shapes import Drawing, Rect, String
+from reportlab.lib import colors
+from reportlab.platypus import Table, TableStyle
+
+# Cores das séries (mesma ordem da paleta padrão do Plotly)
+SERIES_COLORS = [
+    colors.HexColor(color) for color in
+    ("#636efa", "#ef553b", "#00cc96", "#ab63fa", "#ffa15a", "#19d3f3", "#ff6692", "#b6e880", "#ff97ff", "#fecb52")
+]
+
+# Linhas máximas da tabela que substitui um gráfico
+MAX_TABLE_ROWS = 30
+
+# Itens da legenda (em uma linha sob o gráfico)
+MAX_LEGEND_ITEMS = 4
+
+TITLE_HEIGHT = 18
+LEGEND_HEIGHT = 14
+
+
+def _plain(text):
+    """Texto sem as tags HTML usadas nos títulos do Plotly"""
+    return re.sub(r'<[^>]+>', ' ', str(text or '')).strip()
+
+
+def _label(value):
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%d/%m/%Y')
+    text = str(value)
+    # Datas ISO das linhas do tempo (px.line serializa as datas como texto)
+    if re.match(r'^\d{4}-\d{2}-\d{2}', text):
+        return f"{text[8:10]}/{text[5:7]}/{text[:4]}"
+    return text
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _values(values):
+    return [] if values is None else list(values)
+
+
+def _title(fig):
+    return _plain(fig.layout.title.text) if fig.layout.title else ''
+
+
+def _drawing(fig, width, height):
+    drawing = Drawing(width, height)
+    title = _title(fig)
+    if title:
+        drawing.add(String(width / 2, height - 12, title[:90], textAnchor='middle', fontName='Helvetica-Bold', fontSize=9))
+    return drawing
+
+
+def _add_legend(drawing, names, x, y):
+    if len(names) < 2:
+        return
+    legend = Legend()
+    legend.x, legend.y = x, y
+    legend.fontSize = 7
+    legend.columnMaximum = 1
+    legend.deltax = 10
+    legend.boxAnchor = 'sw'
+    legend.colorNamePairs = [(SERIES_COLORS[i % len(SERIES_COLORS)], _plain(name)[:25]) for i, name in enumerate(names[:MAX_LEGEND_ITEMS])]
+    drawing.add(legend)
+
+
+def _bar_chart(fig, traces, width, height):
+    horizontal = getattr(traces[0], 'orientation', None) == 'h'
+    categories = []
+    for trace in traces:
+        for category in _values(trace.y if horizontal else trace.x):
+            if category not in categories:
+                categories.append(category)
+    # Uma barra por trace (px.bar colorido pela própria categoria): uma série, com a cor de cada barra
+    one_per_trace = len(traces) > 1 and len(categories) == len(traces) and all(
+        len(_values(trace.y if horizontal else trace.x)) == 1 for trace in traces
+    )
+    data = []
+    for trace in traces:
+        values = dict(zip(_values(trace.y if horizontal else trace.x), _values(trace.x if horizontal else trace.y)))
+        data.append([_number(values.get(category)) for category in categories])
+    if one_per_trace:
+        data = [[sum(row[i] for row in data) for i in range(len(categories))]]
+
+    drawing = _drawing(fig, width, height)
+    chart = HorizontalBarChart() if horizontal else VerticalBarChart()
+    left = 110 if horizontal else 40
+    chart.x, chart.y = left, 30 + LEGEND_HEIGHT
+    chart.width = width - left - 15
+    chart.height = height - chart.y - TITLE_HEIGHT - 10
+    chart.data = data
+    chart.categoryAxis.categoryNames = [_label(category)[:25] for category in categories]
+    chart.categoryAxis.labels.fontSize = 7
+    if not horizontal:
+        chart.categoryAxis.labels.angle = 30 if len(categories) > 5 else 0
+        chart.categoryAxis.labels.boxAnchor = 'ne' if len(categories) > 5 else 'n'
+    chart.valueAxis.labels.fontSize = 7
+    chart.valueAxis.valueMin = min(0, min((min(row) for row in data if row), default=0))
+    if one_per_trace:
+        for i in range(len(categories)):
+            chart.bars[(0, i)].fillColor = SERIES_COLORS[i % len(SERIES_COLORS)]
+    else:
+        for i in range(len(data)):
+            chart.bars[i].fillColor = SERIES_COLORS[i % len(SERIES_COLORS)]
+        _add_legend(drawing, [trace.name or f"Série {i + 1}" for i, trace in enumerate(traces)], left, 2)
+    drawing.add(chart)
+    return drawing
+
+
+def _pie_chart(fig, trace, width, height):
+    labels = [_label(label) for label in _values(trace.labels)]
+    values = [_number(value) for value in _values(trace.values)]
+    if not values or sum(values) <= 0:
+        return None
+
+    drawing = _drawing(fig, width, height)
+    pie = Pie()
+    size = min(width * 0.55, height - TITLE_HEIGHT - 20)
+    pie.width = pie.height = size
+    pie.x, pie.y = 20, (height - TITLE_HEIGHT - size) / 2
+    pie.data = values
+    pie.labels = [f"{value / sum(values) * 100:.0f}%" for value in values]
+    pie.slices.fontSize = 7
+    for i in range(len(values)):
+        pie.slices[i].fillColor = SERIES_COLORS[i % len(SERIES_COLORS)]
+    drawing.add(pie)
+
+    legend = Legend()
+    legend.x, legend.y = pie.x + size + 15, pie.y + size
+    legend.fontSize = 7
+    legend.boxAnchor = 'nw'
+    legend.colorNamePairs = [(SERIES_COLORS[i % len(SERIES_COLORS)], label[:30]) for i, label in enumerate(labels)]
+    drawing.add(legend)
+    return drawing
+
+
+def _line_chart(fig, traces, width, height):
+    categories = [_label(value) for value in _values(traces[0].x)]
+    if not categories:
+        return None
+
+    drawing = _drawing(fig, width, height)
+    chart = HorizontalLineChart()
+    chart.x, chart.y = 40, 30 + LEGEND_HEIGHT
+    chart.width = width - 55
+    chart.height = height - chart.y - TITLE_HEIGHT - 10
+    chart.data = [[_number(value) for value in _values(trace.y)][:len(categories)] for trace in traces]
+    chart.categoryAxis.categoryNames = categories
+    chart.categoryAxis.labels.fontSize = 7
+    chart.valueAxis.labels.fontSize = 7
+    chart.joinedLines = 1
+    for i in range(len(traces)):
+        chart.lines[i].strokeColor = SERIES_COLORS[i % len(SERIES_COLORS)]
+        chart.lines[i].strokeWidth = 1.5
+    drawing.add(chart)
+    _add_legend(drawing, [trace.name or f"Série {i + 1}" for i, trace in enumerate(traces)], 40, 2)
+    return drawing
+
+
+def _radar_chart(fig, traces, width, height):
+    labels = [_label(label) for label in _values(traces[0].theta)]
+    if len(labels) < 3:
+        return None
+
+    drawing = _drawing(fig, width, height)
+    chart = SpiderChart()
+    size = min(width - 20, height - TITLE_HEIGHT - LEGEND_HEIGHT - 30)
+    chart.width = chart.height = size
+    chart.x, chart.y = (width - size) / 2, LEGEND_HEIGHT + 15
+    chart.data = [[_number(value) for value in _values(trace.r)][:len(labels)] for trace in traces]
+    chart.labels = labels
+    chart.strands.fillColor = None
+    for i in range(len(traces)):
+        chart.strands[i].strokeColor = SERIES_COLORS[i % len(SERIES_COLORS)]
+        chart.strands[i].strokeWidth = 1.5
+    chart.strandLabels.fontSize = 7
+    drawing.add(chart)
+    _add_legend(drawing, [trace.name or f"Série {i + 1}" for i, trace in enumerate(traces)], 10, 2)
+    return drawing
+
+
+def _gauge_chart(fig, trace, width, height):
+    axis_range = trace.gauge.axis.range if trace.gauge and trace.gauge.axis else None
+    low = _number(axis_range[0]) if axis_range else 0.0
+    high = _number(axis_range[1]) if axis_range and axis_range[1] is not None else 100.0
+    value = _number(trace.value)
+    fraction = max(0.0, min(1.0, (value - low) / (high - low))) if high > low else 0.0
+
+    drawing = Drawing(width, height)
+    title = _plain(trace.title.text) if trace.title else _title(fig)
+    if title:
+        drawing.add(String(width / 2, height - 20, title[:90], textAnchor='middle', fontName='Helvetica-Bold', fontSize=11))
+    bar_width = width * 0.8
+    x, y = (width - bar_width) / 2, height / 2 - 15
+    color = trace.gauge.bar.color if trace.gauge and trace.gauge.bar and trace.gauge.bar.color else None
+    drawing.add(Rect(x, y, bar_width, 24, fillColor=colors.whitesmoke, strokeColor=colors.gray))
+    drawing.add(Rect(x, y, bar_width * fraction, 24, fillColor=colors.toColor(color, colors.darkblue), strokeColor=None))
+    drawing.add(String(width / 2, y + 40, f"{value:.0f}", textAnchor='middle', fontName='Helvetica-Bold', fontSize=22))
+    drawing.add(String(x, y - 12, f"{low:.0f}", fontSize=8))
+    drawing.add(String(x + bar_width, y - 12, f"{high:.0f}", textAnchor='end', fontSize=8))
+    return drawing
+
+
+# Função para desenhar a figura com os gráficos nativos do ReportLab (None se não houver equivalente)
+def native_chart(fig, width, height):
+    traces = list(fig.data)
+    if not traces:
+        return None
+    kinds = {trace.type for trace in traces}
+    if len(kinds) != 1:
+        return None
+    kind = kinds.pop()
+    try:
+        if kind == 'bar':
+            return _bar_chart(fig, traces, width, height)
+        if kind == 'pie':
+            return _pie_chart(fig, traces[0], width, height)
+        if kind == 'scatter':
+            return _line_chart(fig, traces, width, height)
+        if kind == 'scatterpolar':
+            return _radar_chart(fig, traces, width, height)
+        if kind == 'indicator':
+            return _gauge_chart(fig, traces[0], width, height)
+    except Exception as e:
+        print(f"Erro ao desenhar o gráfico nativo ({kind}): {e}")
+    return None
+
+
+def _format_value(value):
+    if isinstance(value, (int, float)):
+        return f"{value:,.1f}".replace(',', '_').replace('.', ',').replace('_', '.')
+    return _label(value)
+
+
+# Função para resumir os dados da figura em uma tabela (série, item, valor)
+def figure_table(fig, width):
+    rows = []
+    for i, trace in enumerate(fig.data):
+        name = _plain(getattr(trace, 'name', None)) or f"Série {i + 1}"
+        if trace.type == 'pie':
+            pairs = zip(_values(trace.labels), _values(trace.values))
+        elif trace.type == 'scatterpolar':
+            pairs = zip(_values(trace.theta), _values(trace.r))
+        elif trace.type == 'indicator':
+            pairs = [(_plain(trace.title.text) if trace.title else "Valor", trace.value)]
+        elif getattr(trace, 'orientation', None) == 'h':
+            pairs = zip(_values(trace.y), _values(trace.x))
+        else:
+            pairs = zip(_values(getattr(trace, 'x', None)), _values(getattr(trace, 'y', None)))
+        rows.extend([name, _label(item)[:40], _format_value(value)] for item, value in pairs)
+
+    data = [["Série", "Item", "Valor"]] + rows[:MAX_TABLE_ROWS]
+    if not rows:
+        data.append(["—", _title(fig) or "Gráfico indisponível", "—"])
+    table = Table(data, colWidths=[width * 0.35, width * 0.4, width * 0.25])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 7),
+        ('ALIGN', (2, 1), (2, -1), 'RIGHT'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ]))
+    return table
@@ -0,0 +1,112 @@
+# Busca de empresas com perfil de respostas semelhante (distância de Hamming entre máscaras)
+#
+# Como a máscara de respostas tem um bit por pergunta, existem no máximo 2^15 perfis
+# distintos. O índice guarda, para cada perfil possível, quantas avaliações o têm, quantas
+# foram seguidas de uma avaliação melhor da mesma empresa e quais perguntas passaram a ser
+# atendidas. Assim a consulta percorre 32768 perfis de forma vetorizada, qualquer que seja o
+# número de avaliações armazenadas, e nunca expõe avaliações individuais.
+import numpy as np
+
+from assessment import QUESTIONS
+from benchmarks import get_offline_snapshot
+
+PROFILE_BITS = len(QUESTIONS)
+PROFILE_COUNT = 1 << PROFILE_BITS
+
+# Colunas do índice: avaliações com o perfil, avaliações seguidas de melhoria, correções por pergunta
+COUNT_COLUMN = 0
+IMPROVED_COLUMN = 1
+FIXES_OFFSET = 2
+
+# Número de bits ligados de cada perfil possível
+POPCOUNT = np.array([bin(profile).count("1") for profile in range(PROFILE_COUNT)], dtype=np.int64)
+
+
+class PeerIndex:
+    """Contagens por perfil de respostas: array (2^perguntas, 2 + perguntas)"""
+
+    def __init__(self, data):
+        self.data = data
+
+    @classmethod
+    def from_arrays(cls, leads, dates, masks):
+        """Monta o índice a partir de colunas alinhadas (código do lead, data, máscara)"""
+        data = np.zeros((PROFILE_COUNT, FIXES_OFFSET + PROFILE_BITS), dtype=np.uint32)
+        if len(masks) == 0:
+            return cls(data)
+
+        leads = np.asarray(leads)
+        masks = np.asarray(masks, dtype=np.int64)
+        np.add.at(data[:, COUNT_COLUMN], masks, 1)
+
+        # Avaliações consecutivas da mesma empresa: perguntas que passaram a ser atendidas
+        order = np.lexsort((np.asarray(dates), leads))
+        leads, masks = leads[order], masks[order]
+        same_lead = leads[1:] == leads[:-1]
+        before, after = masks[:-1][same_lead], masks[1:][same_lead]
+        fixed = after & ~before
+        improved = fixed != 0
+        before, fixed = before[improved], fixed[improved]
+
+        np.add.at(data[:, IMPROVED_COLUMN], before, 1)
+        for i in range(PROFILE_BITS):
+            np.add.at(data[:, FIXES_OFFSET + i], before, (fixed >> i) & 1)
+        return cls(data)
+
+    def nearest(self, mask, k=50):
+        """Perfis mais próximos até somar k avaliações (empates na distância limite são incluídos)
+
+        Retorna (raio, perfis, distâncias) ou None se o índice estiver vazio.
+        """
+        counts = self.data[:, COUNT_COLUMN]
+        distances = POPCOUNT[np.arange(PROFILE_COUNT) ^ mask]
+
+        # Avaliações por distância; o raio é a menor distância que acumula k avaliações
+        per_distance = np.bincount(distances, weights=counts, minlength=PROFILE_BITS + 1)
+        cumulative = np.cumsum(per_distance)
+        if cumulative[-1] == 0:
+            return None
+        radius = int(min(np.searchsorted(cumulative, k), PROFILE_BITS))
+
+        profiles = np.flatnonzero((distances <= radius) & (counts > 0))
+        order = np.lexsort((-counts[profiles].astype(np.int64), distances[profiles]))
+        profiles = profiles[order]
+        return radius, profiles, distances[profiles]
+
+    def query(self, mask, k=50, top_fixes=3):
+        """Pares anônimos mais próximos e as correções mais comuns entre os que melhoraram"""
+        found = self.nearest(mask, k)
+        if found is None:
+            return None
+        radius, profiles, distances = found
+
+        rows = self.data[profiles]
+        improved = int(rows[:, IMPROVED_COLUMN].sum())
+        fix_counts = rows[:, FIXES_OFFSET:].sum(axis=0)
+
+        # Apenas perguntas que a empresa ainda não atende são sugestões úteis
+        fixes = []
+        for i in np.argsort(-fix_counts.astype(np.int64), kind='stable'):
+            if len(fixes) == top_fixes or fix_counts[i] == 0:
+                break
+            if not mask >> int(i) & 1:
+                fixes.append({"pergunta": QUESTIONS[i]["key"], "percentual": float(100.0 * fix_counts[i] / improved)})
+
+        return {
+            "raio": radius,
+            "pares": [
+                {"mascara": int(profile), "distancia": int(distance), "avaliacoes": int(self.data[profile, COUNT_COLUMN])}
+                for profile, distance in zip(profiles[:k], distances[:k])
+            ],
+            "total_pares": int(rows[:, COUNT_COLUMN].sum()),
+            "melhoraram": improved,
+            "correcoes": fixes,
+        }
+
+
+# Função para obter o índice de perfis do snapshot offline de benchmarks
+def get_peer_index():
+    snapshot = get_offline_snapshot()
+    if snapshot is None or "pares" not in snapshot.arrays:
+        return None
+    return PeerIndex(snapshot.arrays["pares"])
@@ -0,0 +1,315 @@
+# Suíte de desempenho dos caminhos críticos: pontuação, gráficos, imagens e relatórios PDF
+#
+# Uso:
+#   python perf_suite.py --saida perf_base.json                 # mede e grava os resultados
+#   python perf_suite.py --base perf_base.json --limite 0.2     # compara com a base
+#   python perf_suite.py --filtro pdf/ --repeticoes 50
+#
+# Todos os casos usam dados fixos (respostas, ROI, benchmarks e data de geração), então os
+# resultados são comparáveis entre execuções. Para cada caso são medidos o tempo de parede
+# (mediana e mínimo de várias repetições, após um aquecimento), o pico de memória alocada
+# (tracemalloc, em uma execução separada) e o tamanho da saída. Os resultados saem em JSON; com
+# --base, o comando termina com erro se algum caso ficar mais lento ou usar mais memória que a
+# base além do limite. Casos que dependem do Kaleido (imagens dos gráficos) são marcados como
+# indisponíveis quando o Chrome não está instalado e ficam fora da comparação.
+import argparse
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import plotly
+import reportlab
+
+from assessment import (
+    QUESTIONS, answers_mask, assessment_progress, compute_roi_results, compute_vulnerability_results, encode_answers
+)
+from benchmarks import BENCHMARK_KEYS, DEFAULT_BENCHMARKS
+from charts import (
+    complete_report_figures, create_all_sectors_chart, create_category_chart_plotly, create_gauge_chart_plotly,
+    create_pie_chart_plotly, create_progress_chart, create_radar_chart, create_roi_chart_plotly, roi_cost_breakdown
+)
+from reports import clear_image_cache, complete_report_data, create_pdf_report, plotly_fig_to_image, set_image_cache_dir
+
+# Versão do formato do arquivo de resultados
+RESULTS_FORMAT = 1
+
+# Data de geração fixa dos relatórios (o tamanho do PDF não varia entre execuções)
+FIXED_DATE = datetime(2025, 1, 15, 10, 30)
+
+# Diferença mínima de tempo considerada regressão, para ignorar ruído em casos de microssegundos
+DEFAULT_TOLERANCE_MS = 1.0
+
+# Dados fixos da avaliação usados por todos os casos
+FIXTURE_COMPANY = "Empresa Exemplo"
+FIXTURE_SECTOR = "Tecnologia"
+FIXTURE_ANSWERS = {q["key"]: q["options"][i % len(q["options"])] for i, q in enumerate(QUESTIONS)}
+FIXTURE_ROI_INPUTS = {
+    "num_incidents": 12,
+    "cost_per_incident": 8500.0,
+    "hours": 6,
+    "minutes": 30,
+    "hourly_cost": 120.0,
+    "security_investment": 45000.0,
+    "reduced_incidents": "Sim",
+    "new_num_incidents": 4,
+    "new_cost_per_incident": 6000.0,
+    "new_hours": 3,
+    "new_minutes": 0,
+    "lost_customers": "Sim",
+    "num_lost_customers": 3,
+    "average_ticket": 2500.0,
+}
+
+
+# Função para montar as entradas fixas de cada variante de relatório
+def build_fixtures():
+    """Retorna (contexto, {variante: (resultados, vulnerabilidades, recomendações, tipo, figuras)})"""
+    encoded = encode_answers(FIXTURE_ANSWERS)
+    vulnerability_results = compute_vulnerability_results(FIXTURE_ANSWERS)
+    roi_results = compute_roi_results(FIXTURE_ROI_INPUTS)
+
+    company_scores = {
+        "Infraestrutura": vulnerability_results["Pontuação Infraestrutura"],
+        "Políticas": vulnerability_results["Pontuação Políticas"],
+        "Proteção": vulnerability_results["Pontuação Proteção"],
+        "Total": vulnerability_results["Pontuação Geral"],
+    }
+    industry_scores = DEFAULT_BENCHMARKS[FIXTURE_SECTOR]
+    benchmark_results = {"Company": company_scores, "Industry": dict(industry_scores), "IndustryName": FIXTURE_SECTOR}
+    intervals = {FIXTURE_SECTOR: {key: (industry_scores[key] - 3.0, industry_scores[key] + 3.0, industry_scores[key]) for key in BENCHMARK_KEYS}}
+    pass_rates = {q["key"]: float(20 + 4 * i) for i, q in enumerate(QUESTIONS)}
+
+    # Avaliação anterior fixa da mesma empresa, para a seção de progresso
+    previous_record = {
+        "versao_catalogo": 1,
+        "mascara": answers_mask(encoded) ^ 0b101010101,
+        "pontuacoes": [40.0, 50.0, 60.0, 50.0],
+        "data_avaliacao": datetime(2024, 6, 1, 9, 0),
+    }
+    progress = assessment_progress(previous_record, encoded, vulnerability_results)
+    progress["historico"] = {
+        "datas": [previous_record["data_avaliacao"], FIXED_DATE],
+        "pontuacoes": [previous_record["pontuacoes"], list(progress["atual"].values())],
+    }
+
+    benchmark_report_data = {
+        "Pontuação Geral": company_scores["Total"],
+        "Média do Setor": industry_scores["Total"],
+        "Diferença": company_scores["Total"] - industry_scores["Total"],
+        "Pontuação Infraestrutura": company_scores["Infraestrutura"],
+        "Pontuação Políticas": company_scores["Políticas"],
+        "Pontuação Proteção": company_scores["Proteção"],
+        "Nível de Risco": "Acima da Média" if company_scores["Total"] >= industry_scores["Total"] else "Abaixo da Média",
+    }
+    vulnerability_report_data = {
+        key: value for key, value in vulnerability_results.items() if key not in ["Vulnerabilidades", "Recomendações"]
+    }
+    complete_results, complete_vulnerabilities, complete_recommendations = complete_report_data(
+        vulnerability_results, roi_results, benchmark_results,
+        encoded_answers=encoded, pass_rates=pass_rates, progress=progress
+    )
+    figures = complete_report_figures(
+        vulnerability_results, roi_results, benchmark_results, progress, DEFAULT_BENCHMARKS, intervals
+    )
+
+    context = {
+        "encoded": encoded,
+        "vulnerability_results": vulnerability_results,
+        "roi_results": roi_results,
+        "company_scores": company_scores,
+        "intervals": intervals,
+        "progress": progress,
+        "figures": figures,
+    }
+    reports = {
+        "vazio": ({}, [], [], None, {}),
+        "vulnerabilidade": (
+            vulnerability_report_data, vulnerability_results["Vulnerabilidades"],
+            vulnerability_results["Recomendações"], None, {key: figures[key] for key in ("gauge", "category")}
+        ),
+        "roi": (
+            roi_results, [], ["Mantenha o investimento em segurança."], None,
+            {key: figures[key] for key in ("roi", "pie_before", "pie_after")}
+        ),
+        "benchmark": (
+            benchmark_report_data, [], ["Continue mantendo altos padrões de segurança."], None,
+            {key: figures[key] for key in ("radar", "all_sectors")}
+        ),
+        "completo": (complete_results, complete_vulnerabilities, complete_recommendations, "complete", figures),
+    }
+    return context, reports
+
+
+# Função para montar a lista de casos: [(nome, função sem argumentos)]
+def build_cases():
+    context, reports = build_fixtures()
+    figures = context["figures"]
+    roi_results = context["roi_results"]
+    cost_breakdown_before, _ = roi_cost_breakdown(roi_results)
+
+    cases = [
+        ("pontuacao/vulnerabilidade", lambda: compute_vulnerability_results(FIXTURE_ANSWERS)),
+        ("pontuacao/codificacao", lambda: answers_mask(encode_answers(FIXTURE_ANSWERS))),
+        ("pontuacao/roi", lambda: compute_roi_results(FIXTURE_ROI_INPUTS)),
+        ("graficos/velocimetro", lambda: create_gauge_chart_plotly(context["vulnerability_results"]["Pontuação Geral"])),
+        ("graficos/categorias", lambda: create_category_chart_plotly({
+            key: context["company_scores"][key] for key in ("Infraestrutura", "Políticas", "Proteção")
+        })),
+        ("graficos/radar", lambda: create_radar_chart(
+            context["company_scores"], DEFAULT_BENCHMARKS, FIXTURE_SECTOR, context["intervals"][FIXTURE_SECTOR]
+        )),
+        ("graficos/roi", lambda: create_roi_chart_plotly(
+            roi_results["Investimento"], roi_results["Custo Total Antes"], roi_results["Custo Total Depois"]
+        )),
+        ("graficos/pizza", lambda: create_pie_chart_plotly(cost_breakdown_before, "Custos Antes do Investimento")),
+        ("graficos/setores", lambda: create_all_sectors_chart(context["company_scores"]["Total"], DEFAULT_BENCHMARKS, FIXTURE_SECTOR)),
+        ("graficos/progresso", lambda: create_progress_chart(
+            context["progress"]["historico"]["datas"], context["progress"]["historico"]["pontuacoes"]
+        )),
+    ]
+
+    # Imagens sem cache: cada repetição rasteriza a figura de novo
+    for key in ("gauge", "radar"):
+        cases.append((f"imagem/{key}", lambda key=key: (clear_image_cache(), plotly_fig_to_image(figures[key]))[1]))
+
+    for name, (results, vulnerabilities, recommendations, report_type, report_figures) in reports.items():
+        for with_figures in (False, True):
+            def run(results=results, vulnerabilities=vulnerabilities, recommendations=recommendations,
+                    report_type=report_type, report_figures=report_figures if with_figures else None):
+                if report_figures:
+                    clear_image_cache()
+                return create_pdf_report(
+                    results, vulnerabilities, recommendations, FIXTURE_COMPANY, report_type,
+                    figures=report_figures, generated_at=FIXED_DATE
+                )
+            cases.append((f"pdf/{name}/{'com' if with_figures else 'sem'}_graficos", run))
+    return cases
+
+
+# Função para o tamanho da saída de um caso (bytes do PDF/imagem ou do JSON da figura)
+def output_size(output):
+    if isinstance(output, bytes):
+        return len(output)
+    if isinstance(output, io.BytesIO):
+        return output.getbuffer().nbytes
+    if hasattr(output, "to_json"):
+        return len(output.to_json())
+    return None
+
+
+# Função para medir um caso: tempo (mediana e mínimo), pico de memória e tamanho da saída
+def measure(fn, repeats):
+    output = fn()  # aquecimento (imports, caches de fontes, etc.)
+
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "mediana_ms": statistics.median(times),
+        "min_ms": min(times),
+        "pico_memoria_kb": peak / 1024,
+        "tamanho_bytes": output_size(output),
+        "repeticoes": repeats,
+    }
+
+
+# Função para executar a suíte
+def run_suite(repeats=20, name_filter=None, log=sys.stderr):
+    # Sem cache de imagens em disco: as medições devem incluir a rasterização
+    set_image_cache_dir(None)
+    results = {}
+    for name, fn in build_cases():
+        if name_filter and name_filter not in name:
+            continue
+        try:
+            results[name] = measure(fn, repeats)
+        except Exception as e:
+            message = next((line.strip() for line in str(e).splitlines() if line.strip()), "")
+            results[name] = {"indisponivel": f"{type(e).__name__}: {message}"}
+            print(f"{name:<42} indisponível ({results[name]['indisponivel'][:60]})", file=log)
+            continue
+        result = results[name]
+        size = "" if result["tamanho_bytes"] is None else f"{result['tamanho_bytes']:>10} B"
+        print(
+            f"{name:<42} {result['mediana_ms']:>9.2f} ms (mín {result['min_ms']:.2f}) "
+            f"{result['pico_memoria_kb']:>9.1f} KB {size}",
+            file=log
+        )
+
+    return {
+        "formato": RESULTS_FORMAT,
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "ambiente": {
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "plotly": plotly.__version__,
+            "reportlab": reportlab.Version,
+        },
+        "casos": results,
+    }
+
+
+# Função para comparar os resultados com a base
+def compare(current, baseline, threshold, tolerance_ms=DEFAULT_TOLERANCE_MS):
+    """Retorna a lista de regressões: (caso, métrica, valor da base, valor atual)"""
+    regressions = []
+    for name, result in current["casos"].items():
+        base = baseline["casos"].get(name)
+        if not base or "indisponivel" in base or "indisponivel" in result:
+            continue
+        if (result["mediana_ms"] > base["mediana_ms"] * (1 + threshold)
+                and result["mediana_ms"] - base["mediana_ms"] > tolerance_ms):
+            regressions.append((name, "mediana_ms", base["mediana_ms"], result["mediana_ms"]))
+        if result["pico_memoria_kb"] > base["pico_memoria_kb"] * (1 + threshold):
+            regressions.append((name, "pico_memoria_kb", base["pico_memoria_kb"], result["pico_memoria_kb"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede o desempenho da pontuação, dos gráficos e dos relatórios PDF.")
+    parser.add_argument('--saida', help="arquivo JSON dos resultados (padrão: saída padrão)")
+    parser.add_argument('--base', help="arquivo JSON de uma execução anterior para comparação")
+    parser.add_argument('--limite', type=float, default=0.2, help="piora relativa tolerada em relação à base (padrão: 0.2)")
+    parser.add_argument('--tolerancia-ms', type=float, default=DEFAULT_TOLERANCE_MS,
+                        help=f"diferença mínima de tempo considerada regressão (padrão: {DEFAULT_TOLERANCE_MS} ms)")
+    parser.add_argument('--repeticoes', type=int, default=20, help="repetições por caso (padrão: 20)")
+    parser.add_argument('--filtro', help="executa apenas os casos cujo nome contém este texto")
+    args = parser.parse_args(argv)
+
+    results = run_suite(repeats=args.repeticoes, name_filter=args.filtro)
+
+    output = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.base:
+        with open(args.base, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.limite, args.tolerancia_ms)
+        for name, metric, before, after in regressions:
+            print(f"REGRESSÃO {name} {metric}: {before:.2f} -> {after:.2f} ({after / before - 1:+.0%})", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"Sem regressões acima de {args.limite:.0%} em relação a {args.base}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
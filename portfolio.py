@@ -0,0 +1,73 @@
+# Modo portfólio: comparação de várias avaliações salvas (por exemplo, clientes de uma consultoria)
+#
+# Os registros são convertidos em um único DataFrame (uma linha por avaliação, colunas de
+# pontuação e de ROI) e todos os gráficos, rankings e totais são derivados dele por operações
+# vetorizadas, sem recalcular cada avaliação individualmente.
+import re
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from assessment import CATEGORIES, ROI_OUTPUT_FIELDS
+
+SCORE_COLUMNS = CATEGORIES + ["Total"]
+
+# Totais de ROI somados entre as avaliações do portfólio
+ROI_SUM_FIELDS = ["Investimento", "Economia", "Perda de Clientes", "Impacto Total", "Custo Total Antes", "Custo Total Depois"]
+
+
+# Função para extrair os códigos de avaliação de links (?sessao=...) ou códigos digitados
+def parse_assessment_ids(text):
+    ids = []
+    for item in re.split(r"[\s,;]+", text or ""):
+        if not item:
+            continue
+        if "sessao=" in item:
+            item = parse_qs(urlparse(item).query).get("sessao", [""])[0]
+        if item and item not in ids:
+            ids.append(item)
+    return ids
+
+
+# Função para montar o DataFrame do portfólio a partir de {id: registro}
+def portfolio_frame(records):
+    """Uma linha por avaliação com pontuações, saídas de ROI, posição no ranking e rótulo único"""
+    df = pd.DataFrame.from_records(
+        [
+            {
+                "id": assessment_id,
+                "Empresa": record.get("empresa", ""),
+                "Setor": record.get("setor", ""),
+                "Data": record.get("data_avaliacao"),
+                "pontuacoes": record.get("pontuacoes") or [np.nan] * len(SCORE_COLUMNS),
+                "roi": record.get("roi_saidas") or [np.nan] * len(ROI_OUTPUT_FIELDS),
+            }
+            for assessment_id, record in records.items()
+        ],
+        columns=["id", "Empresa", "Setor", "Data", "pontuacoes", "roi"]
+    )
+
+    # Expandir as listas compactas em colunas de uma vez
+    scores = pd.DataFrame(df.pop("pontuacoes").tolist(), columns=SCORE_COLUMNS, index=df.index, dtype=float)
+    roi = pd.DataFrame(df.pop("roi").tolist(), columns=ROI_OUTPUT_FIELDS, index=df.index, dtype=float)
+    df = pd.concat([df, scores, roi], axis=1)
+
+    # Rótulo único: empresas repetidas recebem a data da avaliação
+    dates = pd.to_datetime(df["Data"], errors="coerce").dt.strftime("%d/%m/%Y").fillna(df["id"])
+    repeated = df["Empresa"].duplicated(keep=False)
+    df["Rótulo"] = df["Empresa"].where(~repeated, df["Empresa"] + " (" + dates + ")")
+
+    df["Posição"] = df["Total"].rank(ascending=False, method="min").astype("Int64")
+    return df.sort_values("Total", ascending=False, na_position="last").reset_index(drop=True)
+
+
+# Função para consolidar o ROI do portfólio
+def portfolio_roi(df):
+    """Soma dos valores de ROI das avaliações com ROI calculado e ROI consolidado do portfólio"""
+    with_roi = df.dropna(subset=["Investimento"])
+    totals = {field: float(with_roi[field].sum()) for field in ROI_SUM_FIELDS}
+    investment = totals["Investimento"]
+    totals["ROI"] = (totals["Economia"] - investment) / investment * 100 if investment > 0 else 0.0
+    totals["Avaliações com ROI"] = int(len(with_roi))
+    return totals
@@ -0,0 +1,176 @@
+# Perfilamento sob demanda de sessões específicas do app
+#
+# O operador pede, pelo painel de administração (ou por ?admin=<token>&perfil=<K>), que os
+# próximos K reruns de uma sessão (código da avaliação) sejam perfilados. Cada rerun perfilado
+# gera um arquivo no diretório FORM_SEGURANCA_PERFIS (padrão: ~/.cache/form_seguranca/perfis):
+#
+# - amostragem (padrão): uma thread lê a pilha da thread do rerun a cada poucos milissegundos e
+#   grava as pilhas no formato "collapsed" (.folded), aberto pelo flamegraph.pl, speedscope ou
+#   Perfetto. O script não é instrumentado, então o custo é baixo mesmo em produção.
+# - cprofile: perfil determinístico (cProfile) gravado em .pstats; mais detalhado e mais lento.
+#
+# Os pedidos ficam na memória do processo; com várias réplicas, o pedido vale para a réplica
+# que atende a sessão.
+import cProfile
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+# Diretório dos arquivos de perfil (o padrão fica no diretório de cache do usuário, fora do diretório de trabalho)
+PROFILE_DIR_ENV = 'FORM_SEGURANCA_PERFIS'
+DEFAULT_PROFILE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'form_seguranca', 'perfis'
+)
+
+# Intervalo entre as amostras da pilha (segundos)
+SAMPLE_INTERVAL = 0.005
+
+# Limite de reruns perfilados por pedido
+MAX_PROFILED_RERUNS = 50
+
+MODES = ("amostragem", "cprofile")
+
+_requests = {}
+_active = {}
+_recent_files = []
+_lock = threading.Lock()
+
+
+class StackSampler:
+    """Amostragem periódica da pilha de uma thread; conta as pilhas no formato collapsed"""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class _RerunProfile:
+    def __init__(self, session_key, label, mode):
+        self.session_key = session_key
+        self.label = label
+        self.mode = mode
+        self.started_at = datetime.now()
+        self.started = time.perf_counter()
+        if mode == "cprofile":
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        else:
+            self.profiler = StackSampler(threading.get_ident())
+            self.profiler.start()
+
+    def finish(self, status):
+        """Encerra o perfil e grava o arquivo; retorna o caminho"""
+        seconds = time.perf_counter() - self.started
+        directory = os.environ.get(PROFILE_DIR_ENV, DEFAULT_PROFILE_DIR)
+        os.makedirs(directory, exist_ok=True)
+        name = re.sub(r'\W+', '_', self.session_key or 'sessao')
+        stamp = self.started_at.strftime('%Y%m%d_%H%M%S_%f')
+
+        if self.mode == "cprofile":
+            self.profiler.disable()
+            path = os.path.join(directory, f"{name}_{stamp}.pstats")
+            self.profiler.dump_stats(path)
+        else:
+            self.profiler.stop()
+            path = os.path.join(directory, f"{name}_{stamp}.folded")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(self.profiler.collapsed())
+
+        with _lock:
+            _recent_files.append({
+                "arquivo": path,
+                "sessao": self.session_key,
+                "rotulo": self.label,
+                "modo": self.mode,
+                "inicio": self.started_at.isoformat(timespec="milliseconds"),
+                "duracao_ms": seconds * 1000,
+                "status": status,
+            })
+            del _recent_files[:-MAX_PROFILED_RERUNS]
+        return path
+
+
+# Função para pedir o perfilamento dos próximos reruns de uma sessão
+def request_profile(session_key, reruns, mode="amostragem"):
+    if mode not in MODES:
+        raise ValueError(f"Modo de perfil desconhecido: {mode}")
+    reruns = max(0, min(int(reruns), MAX_PROFILED_RERUNS))
+    with _lock:
+        if reruns:
+            _requests[session_key] = [reruns, mode]
+        else:
+            _requests.pop(session_key, None)
+
+
+# Função para consultar quantos reruns da sessão ainda serão perfilados
+def pending_reruns(session_key):
+    with _lock:
+        request = _requests.get(session_key)
+    return request[0] if request else 0
+
+
+# Função para iniciar o perfil do rerun, se houver pedido para a sessão
+def start_rerun_profile(session_key, label=""):
+    """Chamada no início de cada rerun; sem pedido para a sessão, custa uma consulta a um dicionário"""
+    # Rerun anterior da sessão interrompido (st.rerun) antes de encerrar o perfil
+    if _active:
+        previous = _active.pop(session_key, None)
+        if previous is not None:
+            previous.finish("interrompido")
+
+    if not _requests:
+        return
+    with _lock:
+        request = _requests.get(session_key)
+        if request is None:
+            return
+        request[0] -= 1
+        if request[0] <= 0:
+            del _requests[session_key]
+        mode = request[1]
+    _active[session_key] = _RerunProfile(session_key, label, mode)
+
+
+# Função para encerrar o perfil do rerun atual da sessão; retorna o caminho do arquivo (ou None)
+def finish_rerun_profile(session_key):
+    profile = _active.pop(session_key, None) if _active else None
+    if profile is None:
+        return None
+    return profile.finish("concluído")
+
+
+# Função para listar os últimos perfis gravados (mais recentes primeiro)
+def recent_profiles():
+    with _lock:
+        return list(reversed(_recent_files))
@@ -0,0 +1,175 @@
+# Job noturno de recálculo dos benchmarks
+#
+# Uso:
+#   python rebuild_benchmarks.py
+#   python rebuild_benchmarks.py --saida /dados/cubo_benchmarks --amostras-bootstrap 2000
+#
+# Percorre a coleção 'avaliacoes' com paginação por cursor (Firestore ou banco local definido
+# em FORM_SEGURANCA_DB), guardando apenas colunas numéricas compactas, e grava uma nova versão
+# do snapshot offline lido pelo app (caminho em FORM_SEGURANCA_CUBO, padrão 'cubo_benchmarks'):
+#   - cubo: agregados setor × porte × região × ano
+#   - pares: índice de perfis de respostas usado na busca de empresas semelhantes
+#   - intervalos: médias por setor com intervalos de confiança de 95% (bootstrap)
+# O bootstrap é vetorizado e distribuído entre todos os núcleos. Pode ser agendado (por exemplo,
+# diariamente via cron); os workers do app passam a usar a nova versão ao detectar o manifesto novo.
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from assessment import CATALOG_VERSION, REGIONS, SIZE_BANDS
+from benchmarks import (
+    BENCHMARK_CUBE_ENV, BENCHMARK_KEYS, DEFAULT_CUBE_PATH, SECTORS, BenchmarkCube, write_offline_snapshot
+)
+from peers import PeerIndex
+from storage import ASSESSMENTS_COLLECTION, LOCAL_DB_ENV, ORDER_FIELDS, get_backend
+
+# Índices base 1 de cada dimensão (0 = não informado)
+SECTOR_INDEX = {value: i + 1 for i, value in enumerate(SECTORS)}
+SIZE_INDEX = {value: i + 1 for i, value in enumerate(SIZE_BANDS)}
+REGION_INDEX = {value: i + 1 for i, value in enumerate(REGIONS)}
+
+# Limite de índices sorteados por lote do bootstrap (controla o uso de memória por processo)
+BOOTSTRAP_BATCH_CELLS = 5_000_000
+
+# Pontuações por setor compartilhadas com os processos do bootstrap (definidas no inicializador)
+_sector_scores = None
+
+
+# Função para ler as avaliações em colunas compactas
+def collect_assessments(backend, page_size=1000):
+    """Retorna um dicionário de colunas NumPy alinhadas, apenas das avaliações com pontuação
+
+    As máscaras de avaliações de outra versão do catálogo ficam como -1.
+    """
+    sectors, sizes, regions, years, scores = [], [], [], [], []
+    leads, dates, masks = [], [], []
+    lead_codes = {}
+
+    pages = backend.iter_pages(
+        ASSESSMENTS_COLLECTION,
+        ORDER_FIELDS[ASSESSMENTS_COLLECTION],
+        page_size=page_size
+    )
+    for page in pages:
+        for _, data in page:
+            if not data.get('pontuacoes'):
+                continue
+            assessed_at = data.get('data_avaliacao')
+            sectors.append(SECTOR_INDEX.get(data.get('setor'), 0))
+            sizes.append(SIZE_INDEX.get(data.get('porte'), 0))
+            regions.append(REGION_INDEX.get(data.get('regiao'), 0))
+            years.append(assessed_at.year if assessed_at else 0)
+            scores.append(data['pontuacoes'])
+            leads.append(lead_codes.setdefault(data.get('lead_id'), len(lead_codes)))
+            dates.append(assessed_at.timestamp() if assessed_at else 0.0)
+            current_catalog = data.get('versao_catalogo') == CATALOG_VERSION and data.get('mascara') is not None
+            masks.append(data['mascara'] if current_catalog else -1)
+
+    return {
+        'setores': np.array(sectors, dtype=np.int64),
+        'portes': np.array(sizes, dtype=np.int64),
+        'regioes': np.array(regions, dtype=np.int64),
+        'anos': np.array(years, dtype=np.int64),
+        'pontuacoes': np.array(scores, dtype=np.float64).reshape(-1, 4),
+        'leads': np.array(leads, dtype=np.int64),
+        'datas': np.array(dates, dtype=np.float64),
+        'mascaras': np.array(masks, dtype=np.int64),
+    }
+
+
+# Funções do bootstrap (executadas nos processos do pool)
+def _init_bootstrap(sector_scores):
+    global _sector_scores
+    _sector_scores = sector_scores
+
+
+def _bootstrap_means(sector, resamples, seed):
+    """Médias de `resamples` reamostragens das pontuações do setor (matriz resamples×chaves)"""
+    scores = _sector_scores[sector]
+    n = len(scores)
+    rng = np.random.default_rng(seed)
+    batch = max(1, BOOTSTRAP_BATCH_CELLS // n)
+
+    means = []
+    for start in range(0, resamples, batch):
+        size = min(batch, resamples - start)
+        indices = rng.integers(0, n, size=(size, n))
+        # Uma chave por vez, para que a matriz reamostrada não multiplique o uso de memória
+        means.append(np.stack([scores[:, k][indices].mean(axis=1) for k in range(scores.shape[1])], axis=1))
+    return sector, np.concatenate(means)
+
+
+# Função para calcular as médias por setor com intervalos de confiança de 95%
+def bootstrap_intervals(sectors, scores, resamples=2000, workers=None, seed=0):
+    """Retorna um array (setores, chaves, 4): avaliações, média, limite inferior e superior"""
+    intervals = np.zeros((len(SECTORS), len(BENCHMARK_KEYS), 4))
+    sector_scores = {
+        s: scores[sectors == s + 1] for s in range(len(SECTORS)) if np.any(sectors == s + 1)
+    }
+
+    # Cada setor é dividido em tarefas com sementes independentes, para ocupar todos os núcleos
+    workers = workers or os.cpu_count() or 1
+    tasks_per_sector = max(1, workers // max(len(sector_scores), 1))
+    seeds = np.random.SeedSequence(seed).spawn(len(sector_scores) * tasks_per_sector)
+    tasks = []
+    for i, sector in enumerate(sector_scores):
+        for j in range(tasks_per_sector):
+            share = resamples // tasks_per_sector + (1 if j < resamples % tasks_per_sector else 0)
+            tasks.append((sector, share, seeds[i * tasks_per_sector + j]))
+
+    means = {sector: [] for sector in sector_scores}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_bootstrap, initargs=(sector_scores,)) as pool:
+        futures = [pool.submit(_bootstrap_means, *task) for task in tasks]
+        for future in futures:
+            sector, sector_means = future.result()
+            means[sector].append(sector_means)
+
+    for sector, values in sector_scores.items():
+        resampled = np.concatenate(means[sector])
+        intervals[sector, :, 0] = len(values)
+        intervals[sector, :, 1] = values.mean(axis=0)
+        intervals[sector, :, 2] = np.percentile(resampled, 2.5, axis=0)
+        intervals[sector, :, 3] = np.percentile(resampled, 97.5, axis=0)
+    return intervals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recalcula os benchmarks a partir das avaliações salvas.")
+    parser.add_argument('--saida', default=os.environ.get(BENCHMARK_CUBE_ENV, DEFAULT_CUBE_PATH),
+                        help="caminho do snapshot, sem extensão (padrão: FORM_SEGURANCA_CUBO ou 'cubo_benchmarks')")
+    parser.add_argument('--tamanho-pagina', type=int, default=1000, help="documentos por página (padrão: 1000)")
+    parser.add_argument('--amostras-bootstrap', type=int, default=2000, help="reamostragens do bootstrap (padrão: 2000)")
+    parser.add_argument('--processos', type=int, default=None, help="processos do bootstrap (padrão: todos os núcleos)")
+    args = parser.parse_args(argv)
+
+    backend = get_backend()
+    if backend is None:
+        sys.exit(f"Nenhum armazenamento configurado (Firebase nos secrets ou {LOCAL_DB_ENV}).")
+
+    columns = collect_assessments(backend, page_size=args.tamanho_pagina)
+    print(f"{len(columns['setores'])} avaliações lidas", file=sys.stderr)
+
+    cube = BenchmarkCube.from_arrays(
+        columns['setores'], columns['portes'], columns['regioes'], columns['anos'], columns['pontuacoes']
+    )
+
+    valid = columns['mascaras'] >= 0
+    peer_index = PeerIndex.from_arrays(columns['leads'][valid], columns['datas'][valid], columns['mascaras'][valid])
+
+    intervals = bootstrap_intervals(
+        columns['setores'], columns['pontuacoes'], resamples=args.amostras_bootstrap, workers=args.processos
+    )
+
+    version = write_offline_snapshot(
+        args.saida,
+        {"cubo": cube.data, "pares": peer_index.data, "intervalos": intervals},
+        {"anos": cube.labels["ano"], "avaliacoes": len(columns['setores'])}
+    )
+    print(f"Snapshot {version} gravado em {args.saida}.json: {len(columns['setores'])} avaliações, anos {cube.labels['ano']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,338 @@
+# Fila de geração de relatórios em segundo plano
+#
+# O relatório completo (figuras rasterizadas + montagem do PDF) leva segundos quando não está em
+# cache. Em vez de gerar o PDF dentro do rerun, o app submete uma tarefa a um pool local de
+# threads e acompanha o progresso pelo código da tarefa (figuras rasterizadas, seções montadas);
+# quando a tarefa termina, o link de download substitui a barra de progresso.
+#
+# Tarefas com as mesmas entradas (mesma impressão digital do ReportCache) são reaproveitadas:
+# vários reruns ou sessões pedindo o mesmo relatório acompanham uma única geração.
+#
+# Tarefas especulativas (relatório gerado antes de o usuário pedir) têm prioridade baixa: só saem
+# da fila depois dos pedidos normais e ocupam no máximo workers - 1 threads (ao menos uma), então
+# sempre sobra uma thread para os pedidos normais. Cada sessão tem no máximo uma tarefa
+# especulativa: quando as entradas da sessão mudam, a tarefa anterior é cancelada (se nenhuma outra
+# sessão estiver esperando por ela), na fila ou no meio da geração.
+#
+# Os PDFs das tarefas concluídas contam na memória das sessões donas delas (ver session_memory.py):
+# uma sessão acima do limite libera as suas tarefas, e a tarefa sem donos é descartada.
+import heapq
+import itertools
+import os
+import threading
+import time
+import uuid
+
+from metrics import Counter
+from reports import report_cache, report_fingerprint, set_report_progress
+
+# Número de relatórios gerados ao mesmo tempo
+REPORT_WORKERS_ENV = 'FORM_SEGURANCA_RELATORIOS_SIMULTANEOS'
+DEFAULT_REPORT_WORKERS = 2
+
+# Tarefas concluídas ficam disponíveis por este tempo (segundos)
+FINISHED_JOB_TTL = 600
+
+# Estados das tarefas
+QUEUED = "na fila"
+RUNNING = "gerando"
+DONE = "pronto"
+FAILED = "erro"
+CANCELLED = "cancelado"
+
+# Prioridades (menor sai primeiro da fila)
+PRIORITY_NORMAL = 0
+PRIORITY_SPECULATIVE = 1
+
+REPORT_JOBS = Counter(
+    'relatorios_tarefas',
+    "Tarefas da fila de relatórios, por evento (criada, especulativa, reaproveitada, promovida, concluida, erro, cancelada)",
+    ['evento']
+)
+
+
+class JobCancelled(Exception):
+    """Levantada na thread da tarefa, no próximo aviso de progresso, quando a tarefa é cancelada"""
+
+
+class ReportJob:
+    """Uma geração de relatório: estado, progresso e resultado"""
+
+    def __init__(self, key, priority, call):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.priority = priority
+        self.owners = set()
+        self.status = QUEUED
+        self.stage = ""
+        self.done = 0
+        self.total = 0
+        self.pdf_data = None
+        self.error = None
+        self.created = time.monotonic()
+        self.finished = None
+        self.cancelled = False
+        self._call = call
+        self._ran_speculative = False
+        self._event = threading.Event()
+
+    @property
+    def ready(self):
+        return self._event.is_set()
+
+    @property
+    def speculative(self):
+        return self.priority == PRIORITY_SPECULATIVE
+
+    def wait(self, timeout=None):
+        """Espera a tarefa terminar; retorna True se terminou"""
+        return self._event.wait(timeout)
+
+    def update(self, stage, done, total):
+        if self.cancelled:
+            raise JobCancelled(self.id)
+        self.stage, self.done, self.total = stage, done, total
+
+    def fraction(self):
+        """Fração concluída (0 a 1): metade para as figuras, metade para as seções"""
+        if self.ready:
+            return 1.0
+        part = self.done / self.total if self.total else 0.0
+        if self.stage == "figuras":
+            return 0.5 * part
+        if self.stage == "seções":
+            return 0.5 + 0.5 * part
+        return 0.0
+
+    def describe(self):
+        if self.status == RUNNING and self.stage:
+            return f"{self.status}: {self.stage} {self.done}/{self.total}"
+        return self.status
+
+    def _finish(self, status, pdf_data=None, error=None):
+        self.status = status
+        self.pdf_data = pdf_data
+        self.error = error
+        self.finished = time.monotonic()
+        self._call = None
+        self._event.set()
+
+
+class ReportJobQueue:
+    """Pool local de threads que gera relatórios via report_cache, com tarefas deduplicadas e prioridades"""
+
+    def __init__(self, workers=None):
+        if workers is None:
+            try:
+                workers = int(os.environ.get(REPORT_WORKERS_ENV, DEFAULT_REPORT_WORKERS))
+            except ValueError:
+                workers = DEFAULT_REPORT_WORKERS
+        self.workers = max(1, workers)
+        self.speculative_workers = max(1, self.workers - 1)
+        self._jobs = {}
+        self._by_key = {}
+        self._speculative_by_owner = {}
+        self._heap = []
+        self._order = itertools.count()
+        self._running_speculative = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._threads = []
+
+    def submit(self, builder, *args, figures=None, speculative=False, owner=None, key=None):
+        """Tarefa que gera builder(*args, figures=...); reaproveita a tarefa com as mesmas entradas
+
+        speculative: prioridade baixa; a tarefa especulativa anterior do mesmo owner (sessão) é
+        cancelada se as entradas mudaram. Um pedido normal de uma tarefa especulativa a promove.
+        key: impressão digital já calculada (report_fingerprint), se o chamador a tiver.
+        """
+        key = key or report_fingerprint(builder.__name__, args, figures)
+        priority = PRIORITY_SPECULATIVE if speculative else PRIORITY_NORMAL
+        with self._lock:
+            self._prune()
+            self._start_workers()
+            if owner is not None:
+                self._release_speculative(owner, key)
+
+            job = self._by_key.get(key)
+            # Tarefas com erro ou canceladas não são reaproveitadas: um novo pedido tenta de novo
+            if job is not None and job.status not in (FAILED, CANCELLED):
+                REPORT_JOBS.labels("reaproveitada").inc()
+                if priority < job.priority:
+                    self._promote(job)
+            else:
+                job = ReportJob(key, priority, (builder, args, figures))
+                self._jobs[job.id] = job
+                self._by_key[key] = job
+                REPORT_JOBS.labels("especulativa" if speculative else "criada").inc()
+                self._push(job)
+
+            if owner is not None:
+                job.owners.add(owner)
+                if job.speculative:
+                    self._speculative_by_owner[owner] = job
+        return job
+
+    def promote(self, job):
+        """Passa uma tarefa especulativa à prioridade normal (o usuário está esperando por ela)"""
+        with self._lock:
+            if job.speculative and not job.ready:
+                self._promote(job)
+
+    def cancel(self, job):
+        """Cancela a tarefa: sai da fila, ou é interrompida no próximo aviso de progresso"""
+        with self._lock:
+            self._cancel(job)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def owned(self, owner):
+        """Tarefas concluídas do owner (sessão) com o tamanho do PDF: [(tarefa, bytes)], das maiores para as menores"""
+        with self._lock:
+            jobs = [(job, len(job.pdf_data)) for job in self._jobs.values() if owner in job.owners and job.pdf_data is not None]
+        return sorted(jobs, key=lambda item: item[1], reverse=True)
+
+    def release(self, job, owner):
+        """Desvincula a tarefa do owner; uma tarefa concluída sem outros donos é descartada (com o PDF)"""
+        with self._lock:
+            job.owners.discard(owner)
+            if not job.owners and job.ready:
+                self._discard(job)
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+        for job in jobs:
+            counts[job.status] += 1
+        counts["especulativas"] = sum(1 for job in jobs if job.speculative and not job.ready)
+        return counts
+
+    def clear_finished(self):
+        """Descarta as tarefas concluídas (e os PDFs guardados nelas)"""
+        with self._lock:
+            self._prune(max_age=0)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            self._closed = True
+            self._available.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _start_workers(self):
+        # Threads criadas no primeiro pedido: importar o módulo não inicia threads
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._worker, name=f"report-job-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _push(self, job):
+        # Entradas antigas (tarefa promovida ou cancelada) são ignoradas ao sair da fila
+        heapq.heappush(self._heap, (job.priority, next(self._order), job))
+        self._available.notify()
+
+    def _next_job(self):
+        """Próxima tarefa da fila (com a trava); None se só restarem especulativas acima do limite delas"""
+        deferred = []
+        job = None
+        while self._heap:
+            priority, order, candidate = heapq.heappop(self._heap)
+            if candidate.status != QUEUED or priority != candidate.priority:
+                continue
+            if candidate.speculative and self._running_speculative >= self.speculative_workers:
+                deferred.append((priority, order, candidate))
+                continue
+            job = candidate
+            break
+        for entry in deferred:
+            heapq.heappush(self._heap, entry)
+        return job
+
+    def _worker(self):
+        while True:
+            with self._lock:
+                job = self._next_job()
+                while job is None:
+                    if self._closed:
+                        return
+                    self._available.wait()
+                    job = self._next_job()
+                job.status = RUNNING
+                job._ran_speculative = job.speculative
+                if job._ran_speculative:
+                    self._running_speculative += 1
+            try:
+                self._run(job)
+            finally:
+                with self._lock:
+                    if job._ran_speculative:
+                        self._running_speculative -= 1
+                    # Uma vaga especulativa liberada pode destravar outra tarefa
+                    self._available.notify_all()
+
+    def _run(self, job):
+        builder, args, figures = job._call
+        set_report_progress(job.update)
+        try:
+            pdf_data = report_cache.get_or_build(builder, *args, figures=figures)
+        except JobCancelled:
+            REPORT_JOBS.labels("cancelada").inc()
+            job._finish(CANCELLED)
+        except Exception as e:
+            print(f"Erro ao gerar relatório em segundo plano: {e}")
+            REPORT_JOBS.labels("erro").inc()
+            job._finish(FAILED, error=str(e))
+        else:
+            REPORT_JOBS.labels("concluida").inc()
+            job._finish(DONE, pdf_data)
+        finally:
+            set_report_progress(None)
+
+    def _promote(self, job):
+        job.priority = PRIORITY_NORMAL
+        REPORT_JOBS.labels("promovida").inc()
+        if job.status == QUEUED:
+            self._push(job)
+
+    def _release_speculative(self, owner, key):
+        previous = self._speculative_by_owner.get(owner)
+        if previous is None or previous.key == key:
+            return
+        del self._speculative_by_owner[owner]
+        previous.owners.discard(owner)
+        # Outras sessões ainda esperando pela tarefa, ou tarefa promovida: a geração continua
+        if not previous.owners and previous.speculative:
+            self._cancel(previous)
+
+    def _cancel(self, job):
+        if job.ready or job.cancelled:
+            return
+        job.cancelled = True
+        if job.status == QUEUED:
+            REPORT_JOBS.labels("cancelada").inc()
+            job._finish(CANCELLED)
+        if self._by_key.get(job.key) is job:
+            del self._by_key[job.key]
+
+    def _discard(self, job):
+        self._jobs.pop(job.id, None)
+        if self._by_key.get(job.key) is job:
+            del self._by_key[job.key]
+
+    def _prune(self, max_age=FINISHED_JOB_TTL):
+        now = time.monotonic()
+        for job in list(self._jobs.values()):
+            if job.finished is not None and now - job.finished >= max_age:
+                self._discard(job)
+        for owner, job in list(self._speculative_by_owner.items()):
+            if job.ready:
+                del self._speculative_by_owner[owner]
+
+
+# Fila compartilhada pelas sessões do processo
+report_jobs = ReportJobQueue()
@@ -0,0 +1,1912 @@
+# Geração dos relatórios PDF, sem dependência da sessão do Streamlit
+#
+# Usado pelo app (com cache por sessão) e pelo job de geração em lote (batch_reports.py).
+import hashlib
+import io
+import json
+import locale
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import date, datetime
+
+import pandas as pd
+import plotly.io as pio
+from PIL import Image as PILImage
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from assessment import QUESTIONS, answers_mask
+from metrics import CACHE_MISSES, CACHE_REQUESTS, PDF_BUILD_SECONDS, RASTERIZE_SECONDS, REPORT_DEGRADATIONS, REPORTS
+from pdf_charts import figure_table, native_chart
+from tracing import traced
+
+# Configurar a localização para formatação adequada de números em português
+# Tratamento para evitar erros em diferentes ambientes (como Streamlit Cloud)
+try:
+    locale.setlocale(locale.LC_ALL, 'pt_BR.UTF-8')
+except locale.Error:
+    try:
+        # Tentar alternativas comuns
+        locale.setlocale(locale.LC_ALL, 'pt_BR')
+    except locale.Error:
+        try:
+            # Fallback para português de Portugal se Brasil não estiver disponível
+            locale.setlocale(locale.LC_ALL, 'pt_PT.UTF-8')
+        except locale.Error:
+            try:
+                locale.setlocale(locale.LC_ALL, 'pt_PT')
+            except locale.Error:
+                # Se nenhum locale português estiver disponível, usar o padrão do sistema
+                locale.setlocale(locale.LC_ALL, '')
+
+# Função para formatar valores monetários sem depender totalmente do locale
+def format_currency(value):
+    try:
+        # Tentar usar o locale configurado
+        return locale.currency(value, grouping=True, symbol=True)
+    except (locale.Error, ValueError):
+        # Formatação manual caso o locale falhe
+        if value >= 0:
+            text = f"R$ {value:,.2f}"
+            # Ajustar para padrão brasileiro (ponto como separador de milhares, vírgula para decimais)
+            if ',' in text:
+                text = text.replace(',', 'X').replace('.', ',').replace('X', '.')
+            return text
+        else:
+            # Para valores negativos
+            text = f"R$ -{abs(value):,.2f}"
+            if ',' in text:
+                text = text.replace(',', 'X').replace('.', ',').replace('X', '.')
+            return text
+
+# Função para formatar horas
+def format_hours(hours):
+    if hours == int(hours):
+        return f"{int(hours)} hora{'s' if hours != 1 else ''}"
+    else:
+        hours_int = int(hours)
+        minutes = int((hours - hours_int) * 60)
+        if hours_int == 0:
+            return f"{minutes} minuto{'s' if minutes != 1 else ''}"
+        else:
+            return f"{hours_int}h{minutes:02d}min"
+
+# Função para formatar percentuais
+def format_percent(value):
+    return f"{value:.1f}%"
+
+# Cache das imagens renderizadas: em memória (por processo) e, opcionalmente, em um diretório
+# compartilhado entre processos. A chave é o JSON da figura e o tamanho da imagem, então gráficos
+# idênticos (mesma pontuação, mesmo setor) são rasterizados uma única vez.
+IMAGE_CACHE_SIZE = 256
+_image_cache_dir = None
+_png_cache = OrderedDict()
+_png_cache_lock = threading.Lock()
+
+
+# Função para definir o diretório do cache de imagens em disco (None desativa)
+def set_image_cache_dir(path):
+    global _image_cache_dir
+    if path:
+        os.makedirs(path, exist_ok=True)
+    _image_cache_dir = path
+
+
+def _image_cache_path(fig_json, width, height, scale):
+    key = hashlib.sha256(f"{width}x{height}x{scale}:{fig_json}".encode()).hexdigest()
+    return os.path.join(_image_cache_dir, f"{key}.png")
+
+
+def _remember_png(key, png):
+    with _png_cache_lock:
+        _png_cache[key] = png
+        _png_cache.move_to_end(key)
+        while len(_png_cache) > IMAGE_CACHE_SIZE:
+            _png_cache.popitem(last=False)
+
+
+def _cached_png(fig_json, width, height, scale):
+    """PNG já renderizado (memória ou disco), sem rasterizar; None se não estiver em cache"""
+    key = (fig_json, width, height, scale)
+    with _png_cache_lock:
+        png = _png_cache.get(key)
+        if png is not None:
+            _png_cache.move_to_end(key)
+            return png
+    if _image_cache_dir:
+        try:
+            with open(_image_cache_path(fig_json, width, height, scale), 'rb') as f:
+                png = f.read()
+        except OSError:
+            return None
+        _remember_png(key, png)
+    return png
+
+
+def _render_png(fig_json, width, height, scale):
+    png = _cached_png(fig_json, width, height, scale)
+    if png is not None:
+        return png
+    CACHE_MISSES.labels("imagens").inc()
+    
+    with RASTERIZE_SECONDS.time():
+        img_bytes = pio.from_json(fig_json).to_image(format="png", width=width, height=height, scale=scale)
+        img = PILImage.open(io.BytesIO(img_bytes))
+        
+        # Convertendo para o formato que o ReportLab pode usar
+        img_bytes_for_reportlab = io.BytesIO()
+        img.save(img_bytes_for_reportlab, format='PNG')
+        png = img_bytes_for_reportlab.getvalue()
+    
+    _remember_png((fig_json, width, height, scale), png)
+    if _image_cache_dir:
+        cache_path = _image_cache_path(fig_json, width, height, scale)
+        # Gravação atômica: outro processo pode estar lendo o mesmo arquivo
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(png)
+        os.replace(tmp_path, cache_path)
+    return png
+
+# Função para esvaziar o cache de imagens em memória (o cache em disco não é alterado)
+def clear_image_cache():
+    with _png_cache_lock:
+        _png_cache.clear()
+
+# Função para converter figura Plotly em imagem para o PDF
+@traced()
+def plotly_fig_to_image(fig, width=700, height=400, scale=1):
+    """Converte uma figura Plotly em imagem para usar no PDF (com o mesmo prazo das figuras do relatório)."""
+    CACHE_REQUESTS.labels("imagens").inc()
+    png, reason = _rasterize_with_deadline(_figure_spec(fig), width, height, scale)
+    _figure_done()
+    if png is None:
+        raise RuntimeError(f"Figura não rasterizada ({reason})")
+    return io.BytesIO(png)
+
+
+# Orçamento de tempo de cada relatório (segundos) e prazo de cada rasterização dentro dele. Se o
+# Kaleido demorar ou travar, a figura é substituída, na ordem, por uma imagem em cache da mesma
+# figura (em outro tamanho), por um gráfico desenhado com o ReportLab ou por uma tabela com os
+# dados (ver pdf_charts.py); relatórios com substituições não entram no cache de relatórios.
+REPORT_BUDGET_ENV = 'FORM_SEGURANCA_RELATORIO_ORCAMENTO'
+FIGURE_DEADLINE_ENV = 'FORM_SEGURANCA_FIGURA_PRAZO'
+DEFAULT_REPORT_BUDGET = 30.0
+DEFAULT_FIGURE_DEADLINE = 10.0
+
+# Rasterizações simultâneas (threads dedicadas, para que a espera tenha prazo)
+RASTERIZE_WORKERS = 2
+
+# Depois de uma rasterização que passou do prazo, as figuras vão direto para a alternativa por
+# este tempo (segundos): com o Kaleido travado, os relatórios seguintes não esperam prazo a prazo.
+# A thread presa na chamada ao Kaleido não pode ser interrompida; o pool dela é substituído por um
+# novo, para que as rasterizações seguintes não fiquem na fila atrás dela
+RASTERIZE_COOLDOWN = 30
+
+_budget = threading.local()
+# Pool, pedidos em andamento e pausa, protegidos pela trava (reentrante: o callback de um pedido já
+# concluído roda na thread que o submeteu)
+_rasterize_pool = None
+_rasterize_inflight = {}
+_rasterize_lock = threading.RLock()
+_rasterize_paused_until = 0.0
+
+
+def _seconds_from_env(env, default):
+    try:
+        return float(os.environ.get(env, default))
+    except ValueError:
+        return default
+
+
+def _start_budget():
+    budget = _seconds_from_env(REPORT_BUDGET_ENV, DEFAULT_REPORT_BUDGET)
+    _budget.deadline = time.monotonic() + budget if budget > 0 else None
+    _budget.degraded = 0
+
+
+# Função para consultar quantas figuras do último relatório gerado na thread atual foram substituídas
+def report_degraded():
+    return getattr(_budget, 'degraded', 0)
+
+
+def _forget_rasterize(key, future):
+    with _rasterize_lock:
+        if _rasterize_inflight.get(key) is future:
+            del _rasterize_inflight[key]
+
+
+def _rasterize_future(fig_json, width, height, scale):
+    # Pedidos iguais em andamento (vários relatórios com a mesma figura) esperam a mesma rasterização
+    global _rasterize_pool
+    key = (fig_json, width, height, scale)
+    with _rasterize_lock:
+        future = _rasterize_inflight.get(key)
+        if future is None:
+            if _rasterize_pool is None:
+                _rasterize_pool = ThreadPoolExecutor(max_workers=RASTERIZE_WORKERS, thread_name_prefix="rasterize")
+            future = _rasterize_pool.submit(_render_png, *key)
+            future.pool = _rasterize_pool
+            _rasterize_inflight[key] = future
+            future.add_done_callback(lambda done: _forget_rasterize(key, done))
+    return future
+
+
+def _rasterize_timed_out(key, future):
+    """Pausa as rasterizações e substitui o pool da rasterização presa"""
+    global _rasterize_pool, _rasterize_paused_until
+    with _rasterize_lock:
+        _rasterize_paused_until = time.monotonic() + RASTERIZE_COOLDOWN
+        # Pedidos novos da mesma figura não esperam pela rasterização presa
+        if _rasterize_inflight.get(key) is future:
+            del _rasterize_inflight[key]
+        if _rasterize_pool is not None and future.pool is _rasterize_pool:
+            # Sem esperar: o que já estava na fila do pool antigo roda nas threads livres dele
+            _rasterize_pool.shutdown(wait=False)
+            _rasterize_pool = None
+
+
+def _rasterize_with_deadline(fig_json, width, height, scale):
+    """(png, None) ou (None, motivo) com motivo em: orcamento, prazo, indisponivel, erro"""
+    png = _cached_png(fig_json, width, height, scale)
+    if png is not None:
+        return png, None
+
+    now = time.monotonic()
+    with _rasterize_lock:
+        paused = now < _rasterize_paused_until
+    if paused:
+        return None, "indisponivel"
+    deadline = getattr(_budget, 'deadline', None)
+    remaining = deadline - now if deadline is not None else float('inf')
+    if remaining <= 0:
+        return None, "orcamento"
+    figure_deadline = _seconds_from_env(FIGURE_DEADLINE_ENV, DEFAULT_FIGURE_DEADLINE)
+    if figure_deadline <= 0:
+        figure_deadline = float('inf')
+    timeout = min(figure_deadline, remaining)
+
+    future = _rasterize_future(fig_json, width, height, scale)
+    try:
+        return future.result(None if timeout == float('inf') else timeout), None
+    except FutureTimeoutError:
+        if timeout < remaining:
+            _rasterize_timed_out((fig_json, width, height, scale), future)
+            return None, "prazo"
+        return None, "orcamento"
+    except Exception as e:
+        print(f"Erro ao rasterizar figura: {e}")
+        return None, "erro"
+
+
+def _cached_png_any_size(fig_json):
+    with _png_cache_lock:
+        for (spec, _, _, _), png in reversed(_png_cache.items()):
+            if spec == fig_json:
+                return png
+    return None
+
+
+# Função para inserir uma figura Plotly no PDF respeitando o orçamento de tempo do relatório
+@traced()
+def figure_flowable(fig, width, height, image_width=700, image_height=400, scale=1):
+    """Imagem da figura com width x height pontos; se a rasterização (image_width x image_height
+    pixels) não couber no prazo ou falhar, uma alternativa do mesmo tamanho"""
+    CACHE_REQUESTS.labels("imagens").inc()
+    fig_json = _figure_spec(fig)
+    png, reason = _rasterize_with_deadline(fig_json, image_width, image_height, scale)
+    if png is not None:
+        flowable = Image(io.BytesIO(png), width=width, height=height)
+    else:
+        png = _cached_png_any_size(fig_json)
+        if png is not None:
+            alternative, flowable = "cache", Image(io.BytesIO(png), width=width, height=height)
+        else:
+            flowable = native_chart(fig, width, height)
+            alternative = "nativo"
+            if flowable is None:
+                alternative, flowable = "tabela", figure_table(fig, width)
+        REPORT_DEGRADATIONS.labels(reason, alternative).inc()
+        _budget.degraded = report_degraded() + 1
+    _figure_done()
+    return flowable
+
+
+# Progresso da geração do relatório na thread atual (acompanhado pela fila de relatórios, ver
+# report_jobs.py); sem callback registrado, cada notificação custa uma consulta a um atributo
+_progress = threading.local()
+
+
+# Função para registrar o callback de progresso da thread atual: callback(etapa, feitos, total)
+def set_report_progress(callback):
+    _progress.callback = callback
+    _progress.figures_done = 0
+    _progress.figures_total = 0
+
+
+def _report_progress(stage, done, total):
+    callback = getattr(_progress, 'callback', None)
+    if callback is not None:
+        callback(stage, done, total)
+
+
+def _start_figures(total):
+    _progress.figures_done = 0
+    _progress.figures_total = total
+    _report_progress("figuras", 0, total)
+
+
+def _figure_done():
+    if getattr(_progress, 'callback', None) is not None:
+        _progress.figures_done += 1
+        _report_progress("figuras", _progress.figures_done, max(_progress.figures_done, _progress.figures_total))
+
+
+def _build_with_progress(doc, elements, section_style):
+    """doc.build notificando as seções (títulos no estilo section_style) já montadas"""
+    if getattr(_progress, 'callback', None) is None:
+        doc.build(elements)
+        return
+    total = sum(1 for element in elements if isinstance(element, Paragraph) and element.style is section_style)
+    built = [0]
+
+    def after_flowable(flowable):
+        if isinstance(flowable, Paragraph) and flowable.style is section_style:
+            built[0] += 1
+            _report_progress("seções", built[0], total)
+
+    doc.afterFlowable = after_flowable
+    _report_progress("seções", 0, total)
+    doc.build(elements)
+
+# Data de geração exibida nos relatórios
+REPORT_DATE_FORMAT = '%d/%m/%Y %H:%M'
+
+# Data fictícia dos PDFs em cache, substituída pela data atual ao servir (ver ReportCache)
+REPORT_PLACEHOLDER_DATE = datetime(1111, 11, 11, 11, 11)
+
+
+def _page_compression(generated_at):
+    # PDFs em cache ficam com o conteúdo das páginas sem compressão, para que a data possa ser trocada nos bytes
+    return 0 if generated_at == REPORT_PLACEHOLDER_DATE else None
+
+# Função para criar PDF completo com os resultados
+@traced()
+def create_pdf_report(results, vulnerabilities, recommendations, company_name="Sua Empresa", report_type=None, figures=None,
+                      generated_at=None):
+    generated_at = generated_at or datetime.now()
+    
+    # Inicializar buffer e documento
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer, 
+        pagesize=A4,
+        rightMargin=36,
+        leftMargin=36,
+        topMargin=36,
+        bottomMargin=36,
+        pageCompression=_page_compression(generated_at)
+    )
+    
+    # Inicializar estilos e elementos
+    styles = getSampleStyleSheet()
+    elements = []
+    _start_budget()
+    _start_figures(len(figures) if figures else 0)
+    
+    # Definir estilos personalizados
+    title_style = ParagraphStyle(
+        'TitleStyle',
+        parent=styles['Heading1'],
+        fontSize=20,
+        alignment=1,
+        spaceAfter=16,
+        textColor=colors.darkblue
+    )
+    
+    subtitle_style = ParagraphStyle(
+        'SubtitleStyle',
+        parent=styles['Heading2'],
+        fontSize=16,
+        spaceBefore=16,
+        spaceAfter=12,
+        textColor=colors.darkblue
+    )
+    
+    section_style = ParagraphStyle(
+        'SectionStyle',
+        parent=styles['Heading3'],
+        fontSize=14,
+        spaceBefore=12,
+        spaceAfter=8,
+        textColor=colors.darkblue
+    )
+    
+    normal_style = ParagraphStyle(
+        'NormalStyle',
+        parent=styles['Normal'],
+        fontSize=10,
+        spaceAfter=10
+    )
+    
+    date_style = ParagraphStyle(
+        'DateStyle',
+        parent=styles['Normal'],
+        fontSize=10,
+        alignment=1,
+        textColor=colors.gray
+    )
+    
+    # Verificar se há dados suficientes para gerar o relatório completo
+    if not results or len(results) == 0:
+        # Relatório básico quando não há dados suficientes
+        elements.append(Paragraph("RELATÓRIO DE SEGURANÇA DE DADOS", title_style))
+        elements.append(Paragraph(f"{company_name}", subtitle_style))
+        elements.append(Paragraph(f"Gerado em: {generated_at.strftime(REPORT_DATE_FORMAT)}", date_style))
+        elements.append(Spacer(1, 0.5*inch))
+        elements.append(Paragraph("Não há dados suficientes para gerar um relatório detalhado.", normal_style))
+        
+        # Construir o documento básico e retornar
+        doc.build(elements)
+        pdf_data = buffer.getvalue()
+        buffer.close()
+        return pdf_data
+    
+    # Cabeçalho do relatório para relatórios com dados
+    if report_type == "complete":
+        elements.append(Paragraph(f"RELATÓRIO COMPLETO DE SEGURANÇA DE DADOS", title_style))
+    else:
+        elements.append(Paragraph(f"RELATÓRIO DE SEGURANÇA DE DADOS", title_style))
+        elements.append(Paragraph(f"{company_name}", subtitle_style))
+        elements.append(Paragraph(f"Gerado em: {generated_at.strftime(REPORT_DATE_FORMAT)}", date_style))
+        elements.append(Spacer(1, 0.5*inch))
+    
+    # Relatório Completo - incluindo todas as análises
+    if report_type == "complete":
+        # Seção de Resumo Executivo
+        elements.append(Paragraph("RESUMO EXECUTIVO", subtitle_style))
+        
+        # Sumário com principais pontos
+        summary_text = f"""Este relatório apresenta uma análise completa de segurança de dados para {company_name}, 
+        incluindo avaliação de vulnerabilidades, análise de retorno sobre investimento (ROI) e benchmarking de segurança 
+        comparado ao setor. O objetivo é fornecer uma visão abrangente do estado atual de segurança da informação 
+        e orientações para melhoria."""
+        
+        elements.append(Paragraph(summary_text, normal_style))
+        elements.append(Spacer(1, 0.2*inch))
+        
+        # Tabela de resumo executivo com principais métricas
+        table_data = [["Métrica", "Valor", "Status"]]
+        
+        # Adicionar métricas principais de cada análise
+        if 'Pontuação Geral' in results:
+            risk_level = results.get('Nível de Risco', '')
+            risk_color = colors.red if risk_level == "Crítico" else colors.orange if risk_level == "Moderado" else colors.green
+            
+            table_data.append([
+                Paragraph("<b>Pontuação Geral de Segurança</b>", normal_style),
+                Paragraph(f"<b>{format_percent(results['Pontuação Geral'])}</b>", normal_style),
+                Paragraph(f"<font color={risk_color}><b>{risk_level}</b></font>", normal_style)
+            ])
+            
+        if 'ROI' in results:
+            roi_value = results['ROI']
+            roi_color = colors.green if roi_value > 0 else colors.red
+            
+            table_data.append([
+                "ROI em Segurança", 
+                Paragraph(f"<font color={roi_color}><b>{format_percent(roi_value)}</b></font>", normal_style),
+                ""
+            ])
+            
+        if 'Média do Setor' in results:
+            diff_value = results.get('Diferença com Setor', 0)
+            diff_color = colors.green if diff_value >= 0 else colors.red
+            diff_status = "Acima da Média" if diff_value >= 0 else "Abaixo da Média"
+            
+            table_data.append([
+                "Comparação com Setor", 
+                Paragraph(f"<font color={diff_color}><b>{diff_value:+.1f}%</b></font>", normal_style),
+                diff_status
+            ])
+            
+        if 'Total de Vulnerabilidades' in results:
+            vuln_count = results['Total de Vulnerabilidades']
+            vuln_color = colors.red if vuln_count > 5 else colors.orange if vuln_count > 2 else colors.green
+            
+            table_data.append([
+                "Vulnerabilidades Identificadas", 
+                Paragraph(f"<font color={vuln_color}><b>{vuln_count}</b></font>", normal_style),
+                "Crítico" if vuln_count > 5 else "Moderado" if vuln_count > 2 else "Baixo"
+            ])
+            
+        table = Table(table_data, colWidths=[2.4*inch, 1.8*inch, 1.8*inch])
+        
+        # Estilo da tabela
+        table_style = [
+            # Cabeçalho
+            ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+            ('TOPPADDING', (0, 0), (-1, 0), 8),
+            
+            # Corpo da tabela
+            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+            ('TEXTCOLOR', (0, 1), (0, -1), colors.black),
+            ('ALIGN', (0, 1), (0, -1), 'LEFT'),
+            ('FONTNAME', (0, 1), (0, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
+            ('TOPPADDING', (0, 1), (-1, -1), 6),
+            
+            # Valores (coluna do meio) alinhados à direita
+            ('ALIGN', (1, 1), (1, -1), 'RIGHT'),
+            ('FONTNAME', (1, 1), (1, -1), 'Helvetica'),
+            
+            # Classificação (última coluna) centralizada
+            ('ALIGN', (2, 1), (2, -1), 'CENTER'),
+            
+            # Linhas alternadas com cores suaves
+            ('BACKGROUND', (0, 1), (-1, 1), colors.lightgrey),
+            ('BACKGROUND', (0, 3), (-1, 3), colors.lightgrey),
+            
+            # Bordas refinadas
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('BOX', (0, 0), (-1, -1), 1, colors.black),
+            ('LINEABOVE', (0, 1), (-1, 1), 1, colors.black),
+        ]
+        
+        table.setStyle(TableStyle(table_style))
+        elements.append(table)
+        elements.append(Spacer(1, 0.4*inch))
+        
+        # SEÇÃO 1: TESTE DE VULNERABILIDADE
+        if 'Pontuação Geral' in results and 'Pontuação Infraestrutura' in results:
+            elements.append(Paragraph("PARTE 1: AVALIAÇÃO DE VULNERABILIDADE", subtitle_style))
+            
+            # Adicionar gráfico do velocímetro se disponível
+            if figures and 'gauge' in figures:
+                elements.append(Paragraph("Nível de Segurança", section_style))
+                
+                # Converter figura para imagem
+                img = figure_flowable(figures['gauge'], 450, 250)
+                elements.append(img)
+                elements.append(Spacer(1, 0.2*inch))
+            
+            # Tabela de vulnerabilidade
+            vuln_data = [["Métrica", "Valor", "Classificação"]]
+            
+            # Pontuação geral com destaque
+            risk_level = results.get('Nível de Risco', '')
+            risk_color = colors.red if risk_level == "Crítico" else colors.orange if risk_level == "Moderado" else colors.green
+            
+            vuln_data.append([
+                Paragraph("<b>Pontuação Geral</b>", normal_style),
+                Paragraph(f"<b>{format_percent(results['Pontuação Geral'])}</b>", normal_style),
+                Paragraph(f"<font color={risk_color}><b>{risk_level}</b></font>", normal_style)
+            ])
+            
+            # Outras métricas
+            if 'Pontuação Infraestrutura' in results:
+                vuln_data.append([
+                    "Infraestrutura", 
+                    format_percent(results['Pontuação Infraestrutura']),
+                    ""
+                ])
+            
+            if 'Pontuação Políticas' in results:
+                vuln_data.append([
+                    "Políticas", 
+                    format_percent(results['Pontuação Políticas']),
+                    ""
+                ])
+                
+            if 'Pontuação Proteção' in results:
+                vuln_data.append([
+                    "Proteção", 
+                    format_percent(results['Pontuação Proteção']),
+                    ""
+                ])
+                
+            if 'Total de Vulnerabilidades' in results:
+                vuln_data.append([
+                    "Vulnerabilidades Detectadas", 
+                    str(results['Total de Vulnerabilidades']),
+                    ""
+                ])
+                
+            # Criar tabela de vulnerabilidade
+            vuln_table = Table(vuln_data, colWidths=[2.4*inch, 1.8*inch, 1.8*inch])
+            vuln_table.setStyle(TableStyle(table_style))
+            elements.append(vuln_table)
+            elements.append(Spacer(1, 0.3*inch))
+            
+            # Adicionar gráfico de categorias se disponível
+            if figures and 'category' in figures:
+                elements.append(Paragraph("Pontuação por Categoria", section_style))
+                
+                # Converter figura para imagem
+                img = figure_flowable(figures['category'], 450, 250)
+                elements.append(img)
+                elements.append(Spacer(1, 0.2*inch))
+            
+            # Explicação sobre a pontuação
+            if 'Pontuação Geral' in results:
+                score = results['Pontuação Geral']
+                if score <= 40:
+                    vuln_explanation = """
+                    <b>RISCO CRÍTICO:</b> A segurança da empresa está extremamente vulnerável. 
+                    Há alto risco de sofrer ataques cibernéticos que podem resultar em perda de dados, 
+                    fraudes e violações de compliance. É necessário implementar medidas de segurança urgentemente.
+                    """
+                elif score <= 70:
+                    vuln_explanation = """
+                    <b>RISCO MODERADO:</b> A empresa possui algumas medidas de segurança, mas há brechas significativas. 
+                    Um ataque pode comprometer as operações e informações sensíveis. É recomendado fortalecer 
+                    os controles de segurança existentes.
+                    """
+                else:
+                    vuln_explanation = """
+                    <b>SEGURANÇA ACEITÁVEL:</b> A empresa tem uma boa estrutura de segurança, mas ainda pode melhorar. 
+                    O ideal é refinar processos e testar a resiliência contra ameaças cada vez mais sofisticadas.
+                    """
+                
+                elements.append(Paragraph(vuln_explanation, normal_style))
+            
+            # Adicionar vulnerabilidades se existirem
+            if vulnerabilities:
+                elements.append(Spacer(1, 0.2*inch))
+                elements.append(Paragraph("VULNERABILIDADES IDENTIFICADAS", section_style))
+                
+                # Adicionar cada vulnerabilidade com número
+                for i, vuln in enumerate(vulnerabilities, 1):
+                    vuln_text = Paragraph(
+                        f"<strong>{i}.</strong> {vuln}",
+                        ParagraphStyle(
+                            'VulnStyle',
+                            parent=styles['Normal'],
+                            fontSize=10,
+                            textColor=colors.darkred,
+                            leftIndent=15,
+                            spaceBefore=6,
+                            spaceAfter=6
+                        )
+                    )
+                    elements.append(vuln_text)
+            
+            elements.append(Spacer(1, 0.3*inch))
+        
+        # SEÇÃO 2: ANÁLISE DE ROI
+        if 'Investimento' in results and 'Economia' in results:
+            elements.append(Paragraph("PARTE 2: ANÁLISE DE RETORNO SOBRE INVESTIMENTO (ROI)", subtitle_style))
+            
+            # Adicionar gráfico de ROI se disponível
+            if figures and 'roi' in figures:
+                elements.append(Paragraph("Análise de ROI", section_style))
+                
+                # Converter figura para imagem
+                img = figure_flowable(figures['roi'], 500, 280, image_width=700, image_height=350)
+                elements.append(img)
+                elements.append(Spacer(1, 0.2*inch))
+            
+            # Tabela de resumo para ROI
+            roi_data = [["Métrica", "Valor", ""]]
+            
+            if 'Investimento' in results:
+                roi_data.append([
+                    "Investimento em Segurança", 
+                    format_currency(results['Investimento']),
+                    ""
+                ])
+                
+            if 'Economia' in results:
+                roi_data.append([
+                    "Economia Projetada", 
+                    format_currency(results['Economia']),
+                    ""
+                ])
+                
+            if 'ROI' in results:
+                # Formatar o ROI com cor baseada no valor
+                roi_value = results['ROI']
+                roi_color = colors.green if roi_value > 0 else colors.red
+                
+                roi_data.append([
+                    "Retorno sobre Investimento (ROI)", 
+                    Paragraph(f"<font color={roi_color}><b>{format_percent(roi_value)}</b></font>", normal_style),
+                    ""
+                ])
+                
+            if 'Perda de Clientes' in results:
+                roi_data.append([
+                    "Perda de Receita (Clientes)", 
+                    format_currency(results['Perda de Clientes']),
+                    ""
+                ])
+                
+            if 'Impacto Total' in results:
+                roi_data.append([
+                    "Impacto Financeiro Total", 
+                    format_currency(results['Impacto Total']),
+                    ""
+                ])
+                
+            # Adicionar detalhes sobre custos antes e depois
+            if 'Custo Total Antes' in results and 'Custo Total Depois' in results:
+                roi_data.append([
+                    "Custo Total Antes do Investimento", 
+                    format_currency(results['Custo Total Antes']),
+                    ""
+                ])
+                
+                roi_data.append([
+                    "Custo Total Após o Investimento", 
+                    format_currency(results['Custo Total Depois']),
+                    ""
+                ])
+                
+            # Criar tabela de ROI
+            roi_table = Table(roi_data, colWidths=[2.7*inch, 2.0*inch, 1.3*inch])
+            roi_table_style = table_style.copy()
+            roi_table_style.extend([
+                ('BACKGROUND', (0, 2), (-1, 2), colors.lightgrey),
+                ('BACKGROUND', (0, 4), (-1, 4), colors.lightgrey),
+                ('BACKGROUND', (0, 6), (-1, 6), colors.lightgrey),
+            ])
+            roi_table.setStyle(TableStyle(roi_table_style))
+            elements.append(roi_table)
+            
+            # Explicação sobre o ROI
+            if 'ROI' in results:
+                roi_value = results['ROI']
+                elements.append(Spacer(1, 0.2*inch))
+                
+                if roi_value > 100:
+                    roi_explanation = """
+                    <b>ROI EXCEPCIONAL:</b> O investimento em segurança está gerando um retorno excepcional. 
+                    Os custos evitados superam significativamente o valor investido, demonstrando alta eficácia das medidas implementadas.
+                    """
+                elif roi_value > 0:
+                    roi_explanation = """
+                    <b>ROI POSITIVO:</b> O investimento em segurança está gerando retorno positivo. 
+                    As medidas implementadas estão reduzindo efetivamente os custos com incidentes de segurança.
+                    """
+                else:
+                    roi_explanation = """
+                    <b>ROI NEGATIVO:</b> O investimento em segurança ainda não está gerando retorno positivo. 
+                    Recomenda-se avaliar a eficácia das medidas implementadas e considerar ajustes na estratégia de segurança.
+                    """
+                
+                elements.append(Paragraph(roi_explanation, normal_style))
+                
+            elements.append(Spacer(1, 0.3*inch))
+            
+            # Detalhes sobre incidentes
+            elements.append(Paragraph("Análise de Incidentes", section_style))
+            
+            incidents_data = [["Métrica", "Antes do Investimento", "Após o Investimento"]]
+            
+            if 'Num Incidentes Antes' in results and 'Num Incidentes Depois' in results:
+                incidents_data.append([
+                    "Número de Incidentes", 
+                    str(results['Num Incidentes Antes']),
+                    str(results['Num Incidentes Depois'])
+                ])
+                
+            if 'Custo por Incidente Antes' in results and 'Custo por Incidente Depois' in results:
+                incidents_data.append([
+                    "Custo por Incidente", 
+                    format_currency(results['Custo por Incidente Antes']),
+                    format_currency(results['Custo por Incidente Depois'])
+                ])
+                
+            if 'Horas por Incidente Antes' in results and 'Horas por Incidente Depois' in results:
+                incidents_data.append([
+                    "Tempo de Resolução", 
+                    format_hours(results['Horas por Incidente Antes']),
+                    format_hours(results['Horas por Incidente Depois'])
+                ])
+                
+            incidents_table = Table(incidents_data, colWidths=[2.0*inch, 2.0*inch, 2.0*inch])
+            incidents_table_style = [
+                # Cabeçalho
+                ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+                ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), 10),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
+                ('TOPPADDING', (0, 0), (-1, 0), 6),
+                
+                # Corpo da tabela
+                ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+                ('TEXTCOLOR', (0, 1), (0, -1), colors.black),
+                ('ALIGN', (0, 1), (0, -1), 'LEFT'),
+                ('FONTNAME', (0, 1), (0, -1), 'Helvetica'),
+                ('FONTSIZE', (0, 1), (-1, -1), 9),
+                ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
+                ('TOPPADDING', (0, 1), (-1, -1), 6),
+                
+                # Valores (colunas 1 e 2) alinhados à direita
+                ('ALIGN', (1, 1), (2, -1), 'RIGHT'),
+                
+                # Linhas alternadas
+                ('BACKGROUND', (0, 1), (-1, 1), colors.lightgrey),
+                ('BACKGROUND', (0, 3), (-1, 3), colors.lightgrey),
+                
+                # Bordas
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+                ('BOX', (0, 0), (-1, -1), 1, colors.black),
+            ]
+            incidents_table.setStyle(TableStyle(incidents_table_style))
+            elements.append(incidents_table)
+            
+            # Adicionar gráficos de pizza se disponíveis
+            if figures and 'pie_before' in figures and 'pie_after' in figures:
+                elements.append(Spacer(1, 0.2*inch))
+                elements.append(Paragraph("Comparação de Custos Antes e Depois", section_style))
+                
+                # Criar tabela para acomodar os dois gráficos lado a lado
+                before_img = figure_flowable(figures['pie_before'], 250, 200, image_width=350, image_height=300)
+                after_img = figure_flowable(figures['pie_after'], 250, 200, image_width=350, image_height=300)
+                
+                data = [[before_img, after_img]]
+                t = Table(data, colWidths=[250, 250])
+                t.setStyle(TableStyle([
+                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+                ]))
+                elements.append(t)
+                
+            elements.append(Spacer(1, 0.3*inch))
+        
+        # SEÇÃO 3: BENCHMARKING
+        if 'Média do Setor' in results and 'Diferença com Setor' in results:
+            elements.append(Paragraph("PARTE 3: ANÁLISE COMPARATIVA DE BENCHMARKING", subtitle_style))
+            
+            # Adicionar gráfico de radar se disponível
+            if figures and 'radar' in figures:
+                elements.append(Paragraph("Comparação por Categoria com o Setor", section_style))
+                
+                # Converter figura para imagem
+                img = figure_flowable(figures['radar'], 450, 300, image_width=600, image_height=400)
+                elements.append(img)
+                elements.append(Spacer(1, 0.2*inch))
+            
+            # Adicionar gráfico de comparação com todos os setores se disponível
+            if figures and 'all_sectors' in figures:
+                elements.append(Paragraph("Comparação com Todos os Setores", section_style))
+                
+                # Converter figura para imagem
+                img = figure_flowable(figures['all_sectors'], 500, 280, image_width=700, image_height=400)
+                elements.append(img)
+                elements.append(Spacer(1, 0.2*inch))
+            
+            # Tabela de resumo para benchmarking
+            bench_data = [["Métrica", "Valor", "Status"]]
+            
+            if 'Pontuação Geral' in results:
+                bench_data.append([
+                    "Pontuação da Empresa", 
+                    format_percent(results['Pontuação Geral']),
+                    ""
+                ])
+                
+            if 'Média do Setor' in results:
+                bench_data.append([
+                    "Média do Setor", 
+                    format_percent(results['Média do Setor']),
+                    ""
+                ])
+                
+            if 'Diferença com Setor' in results:
+                # Formatar a diferença com cor baseada no valor
+                diff_value = results['Diferença com Setor']
+                diff_color = colors.green if diff_value >= 0 else colors.red
+                diff_status = "Acima da Média" if diff_value >= 0 else "Abaixo da Média"
+                
+                bench_data.append([
+                    "Diferença", 
+                    Paragraph(f"<font color={diff_color}><b>{diff_value:+.1f}%</b></font>", normal_style),
+                    diff_status
+                ])
+                
+            # Adicionar detalhes por categoria se disponíveis
+            if 'Pontuação Infraestrutura' in results:
+                bench_data.append([
+                    "Infraestrutura", 
+                    format_percent(results['Pontuação Infraestrutura']),
+                    ""
+                ])
+                
+            if 'Pontuação Políticas' in results:
+                bench_data.append([
+                    "Políticas", 
+                    format_percent(results['Pontuação Políticas']),
+                    ""
+                ])
+                
+            if 'Pontuação Proteção' in results:
+                bench_data.append([
+                    "Proteção", 
+                    format_percent(results['Pontuação Proteção']),
+                    ""
+                ])
+                
+            # Criar tabela de benchmarking
+            bench_table = Table(bench_data, colWidths=[2.4*inch, 1.8*inch, 1.8*inch])
+            bench_table_style = table_style.copy()
+            bench_table_style.extend([
+                ('BACKGROUND', (0, 2), (-1, 2), colors.lightgrey),
+                ('BACKGROUND', (0, 4), (-1, 4), colors.lightgrey),
+            ])
+            bench_table.setStyle(TableStyle(bench_table_style))
+            elements.append(bench_table)
+            
+            # Explicação sobre o benchmarking
+            if 'Diferença com Setor' in results:
+                diff_value = results['Diferença com Setor']
+                elements.append(Spacer(1, 0.2*inch))
+                
+                if diff_value >= 10:
+                    benchmark_explanation = """
+                    <b>DESTAQUE NO SETOR:</b> A empresa está significativamente acima da média do setor em segurança da informação.
+                    Esta posição de liderança representa uma vantagem competitiva e demonstra excelência nas práticas de segurança.
+                    """
+                elif diff_value >= 0:
+                    benchmark_explanation = """
+                    <b>ACIMA DA MÉDIA:</b> A empresa está acima da média do setor em segurança da informação.
+                    Esta posição favorável demonstra boas práticas, mas ainda há oportunidades para ampliar a vantagem competitiva.
+                    """
+                elif diff_value >= -10:
+                    benchmark_explanation = """
+                    <b>PRÓXIMO À MÉDIA:</b> A empresa está ligeiramente abaixo da média do setor em segurança da informação.
+                    É recomendável implementar melhorias para, no mínimo, alcançar o padrão do setor.
+                    """
+                else:
+                    benchmark_explanation = """
+                    <b>SIGNIFICATIVAMENTE ABAIXO DA MÉDIA:</b> A empresa está consideravelmente abaixo da média do setor em segurança da informação.
+                    Esta posição representa uma vulnerabilidade competitiva e exige atenção imediata para implementar melhorias.
+                    """
+                
+                elements.append(Paragraph(benchmark_explanation, normal_style))
+            
+            # Comparação por pergunta com as empresas do setor
+            if 'Comparação por Pergunta' in results:
+                elements.append(Spacer(1, 0.2*inch))
+                elements.append(Paragraph("Comparação por Pergunta com o Setor", section_style))
+                
+                question_data = [["Pergunta", "Sua Empresa", "Setor que Atende"]]
+                for category, question_text, passed, pass_rate in results['Comparação por Pergunta']:
+                    status_color = colors.green if passed else colors.red
+                    status_text = "Atende" if passed else "Não atende"
+                    question_data.append([
+                        Paragraph(question_text, normal_style),
+                        Paragraph(f"<font color={status_color}><b>{status_text}</b></font>", normal_style),
+                        format_percent(pass_rate)
+                    ])
+                
+                question_table = Table(question_data, colWidths=[3.8*inch, 1.2*inch, 1.2*inch])
+                question_table.setStyle(TableStyle(table_style))
+                elements.append(question_table)
+            
+            elements.append(Spacer(1, 0.3*inch))
+        
+        # SEÇÃO 4: PROGRESSO DESDE A ÚLTIMA AVALIAÇÃO
+        if 'Progresso' in results:
+            progress = results['Progresso']
+            elements.append(Paragraph("PARTE 4: PROGRESSO DESDE A ÚLTIMA AVALIAÇÃO", subtitle_style))
+            
+            if isinstance(progress['data_anterior'], datetime):
+                elements.append(Paragraph(
+                    f"Comparação com a avaliação de {progress['data_anterior'].strftime('%d/%m/%Y')}.", normal_style
+                ))
+                elements.append(Spacer(1, 0.1*inch))
+            
+            # Tabela de variação das pontuações
+            progress_data = [["Categoria", "Anterior", "Atual", "Variação"]]
+            for key, current in progress['atual'].items():
+                change = progress['variacao'][key]
+                change_color = colors.green if change >= 0 else colors.red
+                progress_data.append([
+                    "Pontuação Geral" if key == "Total" else key,
+                    format_percent(progress['anterior'][key]),
+                    format_percent(current),
+                    Paragraph(f"<font color={change_color}><b>{change:+.1f}%</b></font>", normal_style)
+                ])
+            
+            progress_table = Table(progress_data, colWidths=[2.2*inch, 1.3*inch, 1.3*inch, 1.3*inch])
+            progress_table.setStyle(TableStyle(table_style))
+            elements.append(progress_table)
+            elements.append(Spacer(1, 0.2*inch))
+            
+            # Gráfico de evolução, se disponível
+            if figures and 'progress' in figures:
+                img = figure_flowable(figures['progress'], 500, 280, image_width=700, image_height=400)
+                elements.append(img)
+                elements.append(Spacer(1, 0.2*inch))
+            
+            questions_by_key = {question["key"]: question for question in QUESTIONS}
+            if progress['corrigidas']:
+                elements.append(Paragraph("Vulnerabilidades Corrigidas", section_style))
+                for i, key in enumerate(progress['corrigidas'], 1):
+                    elements.append(Paragraph(f"<strong>{i}.</strong> {questions_by_key[key]['vulnerability']}", normal_style))
+                elements.append(Spacer(1, 0.1*inch))
+            
+            if progress['novas_lacunas']:
+                elements.append(Paragraph("Novas Lacunas", section_style))
+                for i, key in enumerate(progress['novas_lacunas'], 1):
+                    elements.append(Paragraph(f"<strong>{i}.</strong> {questions_by_key[key]['vulnerability']}", normal_style))
+            
+            elements.append(Spacer(1, 0.3*inch))
+        
+        # SEÇÃO 5: RECOMENDAÇÕES CONSOLIDADAS
+        if recommendations:
+            elements.append(Paragraph("RECOMENDAÇÕES CONSOLIDADAS", subtitle_style))
+            
+            # Agrupar recomendações por categorias para melhor organização
+            infra_recs = []
+            policy_recs = []
+            protect_recs = []
+            other_recs = []
+            
+            for rec in recommendations:
+                if any(term in rec.lower() for term in ["firewall", "autenticação", "mfa", "backup", "criptografia", "servidor"]):
+                    infra_recs.append(rec)
+                elif any(term in rec.lower() for term in ["política", "treinamento", "conscientização", "plano", "norma"]):
+                    policy_recs.append(rec)
+                elif any(term in rec.lower() for term in ["senha", "ataque", "invasão", "ameaça", "vazamento", "proteção"]):
+                    protect_recs.append(rec)
+                else:
+                    other_recs.append(rec)
+            
+            # Adicionar recomendações por categoria
+            if infra_recs:
+                elements.append(Paragraph("Infraestrutura e Tecnologia", section_style))
+                for i, rec in enumerate(infra_recs, 1):
+                    rec_text = Paragraph(
+                        f"<strong>{i}.</strong> {rec}",
+                        ParagraphStyle(
+                            'RecStyle',
+                            parent=styles['Normal'],
+                            fontSize=10,
+                            textColor=colors.darkgreen,
+                            leftIndent=15,
+                            spaceBefore=6,
+                            spaceAfter=6
+                        )
+                    )
+                    elements.append(rec_text)
+            
+            if policy_recs:
+                elements.append(Paragraph("Políticas e Procedimentos", section_style))
+                for i, rec in enumerate(policy_recs, 1):
+                    rec_text = Paragraph(
+                        f"<strong>{i}.</strong> {rec}",
+                        ParagraphStyle(
+                            'RecStyle',
+                            parent=styles['Normal'],
+                            fontSize=10,
+                            textColor=colors.darkgreen,
+                            leftIndent=15,
+                            spaceBefore=6,
+                            spaceAfter=6
+                        )
+                    )
+                    elements.append(rec_text)
+            
+            if protect_recs:
+                elements.append(Paragraph("Proteção Contra Ameaças", section_style))
+                for i, rec in enumerate(protect_recs, 1):
+                    rec_text = Paragraph(
+                        f"<strong>{i}.</strong> {rec}",
+                        ParagraphStyle(
+                            'RecStyle',
+                            parent=styles['Normal'],
+                            fontSize=10,
+                            textColor=colors.darkgreen,
+                            leftIndent=15,
+                            spaceBefore=6,
+                            spaceAfter=6
+                        )
+                    )
+                    elements.append(rec_text)
+            
+            if other_recs:
+                elements.append(Paragraph("Recomendações Gerais", section_style))
+                for i, rec in enumerate(other_recs, 1):
+                    rec_text = Paragraph(
+                        f"<strong>{i}.</strong> {rec}",
+                        ParagraphStyle(
+                            'RecStyle',
+                            parent=styles['Normal'],
+                            fontSize=10,
+                            textColor=colors.darkgreen,
+                            leftIndent=15,
+                            spaceBefore=6,
+                            spaceAfter=6
+                        )
+                    )
+                    elements.append(rec_text)
+            
+        # SEÇÃO 5: PRÓXIMOS PASSOS E CONCLUSÃO
+        elements.append(Spacer(1, 0.3*inch))
+        elements.append(Paragraph("PRÓXIMOS PASSOS RECOMENDADOS", subtitle_style))
+        
+        next_steps = [
+            "Priorize as vulnerabilidades críticas identificadas e crie um plano de ação com prazos definidos.",
+            "Implemente as recomendações de segurança de acordo com o ROI projetado, começando pelas medidas de maior impacto.",
+            "Realize uma nova avaliação de segurança em 3-6 meses para medir o progresso e identificar novas áreas de melhoria.",
+            "Considere a realização de treinamentos de conscientização em segurança para todos os funcionários.",
+            "Desenvolva ou atualize o plano de resposta a incidentes de segurança da informação."
+        ]
+        
+        for i, step in enumerate(next_steps, 1):
+            step_text = Paragraph(
+                f"<strong>{i}.</strong> {step}",
+                ParagraphStyle(
+                    'StepStyle',
+                    parent=styles['Normal'],
+                    fontSize=10,
+                    textColor=colors.black,
+                    leftIndent=15,
+                    spaceBefore=6,
+                    spaceAfter=6
+                )
+            )
+            elements.append(step_text)
+        
+        # Conclusão
+        elements.append(Spacer(1, 0.3*inch))
+        elements.append(Paragraph("CONCLUSÃO", subtitle_style))
+        
+        conclusion_text = f"""Este relatório apresenta uma análise completa da postura de segurança da {company_name}. 
+        Com base nas avaliações realizadas, identificamos as principais áreas de vulnerabilidade, analisamos o retorno 
+        sobre investimento em segurança e comparamos o desempenho da empresa com a média do setor.
+        
+        A implementação das recomendações apresentadas neste relatório ajudará a fortalecer significativamente a postura de 
+        segurança da empresa, reduzir riscos de violações de dados e garantir conformidade com regulamentações de segurança 
+        da informação.
+        
+        Recomendamos a realização de novas avaliações periódicas para medir o progresso e manter as práticas de segurança 
+        atualizadas frente às ameaças em constante evolução."""
+        
+        elements.append(Paragraph(conclusion_text, normal_style))
+    
+    else:
+        # Tratamento para relatórios individuais (código original)
+        # Determinar que tipo de relatório estamos gerando com base nas chaves presentes
+        report_type = ""
+        if 'Pontuação Geral' in results and 'Pontuação Infraestrutura' in results:
+            report_type = "vulnerability"
+        elif 'Investimento' in results and 'Economia' in results:
+            report_type = "roi"
+        elif 'Média do Setor' in results and 'Diferença' in results:
+            report_type = "benchmark"
+        
+        # Resumo de resultados com formatação baseada no tipo de relatório
+        if report_type == "vulnerability":
+            elements.append(Paragraph("RESUMO DA AVALIAÇÃO DE VULNERABILIDADE", subtitle_style))
+            
+            # Tabela de resumo para relatório de vulnerabilidade
+            table_data = [["Métrica", "Valor", "Classificação"]]
+            
+            # Pontuação geral com destaque
+            risk_level = results.get('Nível de Risco', '')
+            risk_color = colors.red if risk_level == "Crítico" else colors.orange if risk_level == "Moderado" else colors.green
+            
+            table_data.append([
+                Paragraph("<b>Pontuação Geral</b>", normal_style),
+                Paragraph(f"<b>{format_percent(results['Pontuação Geral'])}</b>", normal_style),
+                Paragraph(f"<font color={risk_color}><b>{risk_level}</b></font>", normal_style)
+            ])
+            
+            # Outras métricas
+            if 'Pontuação Infraestrutura' in results:
+                table_data.append([
+                    "Infraestrutura", 
+                    format_percent(results['Pontuação Infraestrutura']),
+                    ""
+                ])
+            
+            if 'Pontuação Políticas' in results:
+                table_data.append([
+                    "Políticas", 
+                    format_percent(results['Pontuação Políticas']),
+                    ""
+                ])
+                
+            if 'Pontuação Proteção' in results:
+                table_data.append([
+                    "Proteção", 
+                    format_percent(results['Pontuação Proteção']),
+                    ""
+                ])
+                
+            if 'Total de Vulnerabilidades' in results:
+                table_data.append([
+                    "Vulnerabilidades Detectadas", 
+                    str(results['Total de Vulnerabilidades']),
+                    ""
+                ])
+                
+        elif report_type == "roi":
+            elements.append(Paragraph("ANÁLISE DE RETORNO SOBRE INVESTIMENTO (ROI)", subtitle_style))
+            
+            # Tabela de resumo para relatório de ROI
+            table_data = [["Métrica", "Valor", ""]]
+            
+            if 'Investimento' in results:
+                table_data.append([
+                    "Investimento em Segurança", 
+                    format_currency(results['Investimento']),
+                    ""
+                ])
+                
+            if 'Economia' in results:
+                table_data.append([
+                    "Economia Projetada", 
+                    format_currency(results['Economia']),
+                    ""
+                ])
+                
+            if 'ROI' in results:
+                # Formatar o ROI com cor baseada no valor
+                roi_value = results['ROI']
+                roi_color = colors.green if roi_value > 0 else colors.red
+                
+                table_data.append([
+                    "Retorno sobre Investimento (ROI)", 
+                    Paragraph(f"<font color={roi_color}><b>{format_percent(roi_value)}</b></font>", normal_style),
+                    ""
+                ])
+                
+            if 'Perda de Clientes' in results:
+                table_data.append([
+                    "Perda de Receita (Clientes)", 
+                    format_currency(results['Perda de Clientes']),
+                    ""
+                ])
+                
+            if 'Impacto Total' in results:
+                table_data.append([
+                    "Impacto Financeiro Total", 
+                    format_currency(results['Impacto Total']),
+                    ""
+                ])
+                
+        elif report_type == "benchmark":
+            elements.append(Paragraph("ANÁLISE COMPARATIVA DE BENCHMARKING", subtitle_style))
+            
+            # Tabela de resumo para relatório de benchmarking
+            table_data = [["Métrica", "Valor", "Status"]]
+            
+            if 'Pontuação Geral' in results:
+                table_data.append([
+                    "Pontuação da Empresa", 
+                    format_percent(results['Pontuação Geral']),
+                    ""
+                ])
+                
+            if 'Média do Setor' in results:
+                table_data.append([
+                    "Média do Setor", 
+                    format_percent(results['Média do Setor']),
+                    ""
+                ])
+                
+            if 'Diferença' in results:
+                # Formatar a diferença com cor baseada no valor
+                diff_value = results['Diferença']
+                diff_color = colors.green if diff_value >= 0 else colors.red
+                diff_status = results.get('Nível de Risco', '')
+                
+                table_data.append([
+                    "Diferença", 
+                    Paragraph(f"<font color={diff_color}><b>{diff_value:+.1f}%</b></font>", normal_style),
+                    diff_status
+                ])
+                
+            if 'Pontuação Infraestrutura' in results:
+                table_data.append([
+                    "Infraestrutura", 
+                    format_percent(results['Pontuação Infraestrutura']),
+                    ""
+                ])
+                
+            if 'Pontuação Políticas' in results:
+                table_data.append([
+                    "Políticas", 
+                    format_percent(results['Pontuação Políticas']),
+                    ""
+                ])
+                
+            if 'Pontuação Proteção' in results:
+                table_data.append([
+                    "Proteção", 
+                    format_percent(results['Pontuação Proteção']),
+                    ""
+                ])
+        else:
+            # Relatório genérico se não for identificado um tipo específico
+            elements.append(Paragraph("RESUMO DE RESULTADOS", subtitle_style))
+            
+            # Tabela de dados genérica
+            table_data = [["Métrica", "Valor", ""]]
+            for key, value in results.items():
+                # Determinar o formato adequado com base no nome da chave e no tipo do valor
+                if isinstance(value, (int, float)) and 'percent' in key.lower() or key.lower() in ['roi', 'pontuação']:
+                    formatted_value = format_percent(value)
+                elif isinstance(value, (int, float)) and any(term in key.lower() for term in ['custo', 'valor', 'preço', 'investimento']):
+                    formatted_value = format_currency(value)
+                else:
+                    formatted_value = str(value)
+                    
+                table_data.append([key, formatted_value, ""])
+        
+        # Criar tabela com estilo melhorado
+        # Ajustar larguras de coluna com base no tipo de relatório
+        if report_type == "roi":
+            # Para ROI, dar mais espaço para os valores monetários
+            col_widths = [2.7*inch, 2.0*inch, 1.3*inch]
+        else:
+            col_widths = [2.4*inch, 1.8*inch, 1.8*inch]
+            
+        table = Table(table_data, colWidths=col_widths)
+        
+        # Estilo da tabela mais sofisticado
+        table_style = [
+            # Cabeçalho
+            ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+            ('TOPPADDING', (0, 0), (-1, 0), 8),
+            
+            # Corpo da tabela
+            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+            ('TEXTCOLOR', (0, 1), (0, -1), colors.black),
+            ('ALIGN', (0, 1), (0, -1), 'LEFT'),
+            ('FONTNAME', (0, 1), (0, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
+            ('TOPPADDING', (0, 1), (-1, -1), 6),
+            
+            # Valores (coluna do meio) alinhados à direita
+            ('ALIGN', (1, 1), (1, -1), 'RIGHT'),
+            ('FONTNAME', (1, 1), (1, -1), 'Helvetica'),
+            
+            # Classificação (última coluna) centralizada
+            ('ALIGN', (2, 1), (2, -1), 'CENTER'),
+            
+            # Linhas alternadas com cores suaves
+            ('BACKGROUND', (0, 1), (-1, 1), colors.lightgrey),
+            ('BACKGROUND', (0, 3), (-1, 3), colors.lightgrey),
+            ('BACKGROUND', (0, 5), (-1, 5), colors.lightgrey),
+            
+            # Bordas refinadas
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('BOX', (0, 0), (-1, -1), 1, colors.black),
+            ('LINEABOVE', (0, 1), (-1, 1), 1, colors.black),
+        ]
+        
+        table.setStyle(TableStyle(table_style))
+        elements.append(table)
+        elements.append(Spacer(1, 0.3*inch))
+        
+        # Adicionar vulnerabilidades
+        if vulnerabilities:
+            elements.append(Spacer(1, 0.2*inch))
+            elements.append(Paragraph("VULNERABILIDADES IDENTIFICADAS", subtitle_style))
+            
+            # Criar lista numerada de vulnerabilidades para melhor legibilidade
+            for i, vuln in enumerate(vulnerabilities, 1):
+                # Usar parágrafos em vez de tabela para melhor formatação de texto
+                vuln_text = Paragraph(
+                    f"<strong>{i}.</strong> {vuln}",
+                    ParagraphStyle(
+                        'VulnStyle',
+                        parent=styles['Normal'],
+                        fontSize=10,
+                        textColor=colors.darkred,
+                        leftIndent=15,
+                        spaceBefore=6,
+                        spaceAfter=6
+                    )
+                )
+                elements.append(vuln_text)
+            
+            elements.append(Spacer(1, 0.2*inch))
+        
+        # Adicionar recomendações
+        if recommendations:
+            elements.append(Spacer(1, 0.2*inch))
+            elements.append(Paragraph("RECOMENDAÇÕES DE MELHORIA", subtitle_style))
+            
+            # Criar lista de recomendações com ícones
+            for i, rec in enumerate(recommendations, 1):
+                # Usar parágrafos para melhor formatação
+                rec_text = Paragraph(
+                    f"<strong>{i}.</strong> {rec}",
+                    ParagraphStyle(
+                        'RecStyle',
+                        parent=styles['Normal'],
+                        fontSize=10,
+                        textColor=colors.darkgreen,
+                        leftIndent=15,
+                        spaceBefore=6,
+                        spaceAfter=6
+                    )
+                )
+                elements.append(rec_text)
+    
+    # Adicionar observações finais
+    elements.append(Spacer(1, 0.5*inch))
+    elements.append(Paragraph(
+        "OBSERVAÇÕES FINAIS",
+        subtitle_style
+    ))
+    
+    if report_type == "complete":
+        obs_text = """Este relatório completo apresenta uma visão abrangente da segurança de dados da sua empresa, 
+        incluindo avaliação de vulnerabilidades, análise de ROI em segurança e benchmarking comparativo com o setor. 
+        As recomendações apresentadas devem ser implementadas de acordo com a prioridade, começando pelas vulnerabilidades 
+        mais críticas. Recomenda-se repetir esta avaliação periodicamente para medir o progresso e ajustar a estratégia 
+        de segurança conforme necessário."""
+    elif report_type == "vulnerability":
+        obs_text = """Este relatório apresenta uma avaliação do nível de segurança de dados da sua empresa com base nas respostas fornecidas. 
+        As recomendações devem ser implementadas de acordo com a prioridade das vulnerabilidades identificadas. 
+        Recomenda-se realizar uma nova avaliação após a implementação das melhorias."""
+    elif report_type == "roi":
+        obs_text = """Este relatório apresenta uma análise do retorno sobre investimento em segurança da informação. 
+        Os valores são baseados nos dados fornecidos e representam projeções que podem variar de acordo com o cenário real.
+        Recomenda-se revisar periodicamente os investimentos em segurança para maximizar o ROI."""
+    elif report_type == "benchmark":
+        obs_text = """Este relatório apresenta uma comparação do nível de segurança da sua empresa com a média do setor.
+        Os benchmarks utilizados são baseados em dados coletados de empresas do mesmo segmento.
+        Recomenda-se utilizar esta análise como referência para definir metas de melhoria."""
+    else:
+        obs_text = """Este relatório apresenta uma análise baseada nos dados fornecidos.
+        Recomenda-se utilizar estas informações como base para tomada de decisões relacionadas à segurança da informação."""
+    
+    elements.append(Paragraph(
+        obs_text,
+        ParagraphStyle(
+            'ObsStyle',
+            parent=styles['Normal'],
+            fontSize=9,
+            leading=12,
+            spaceBefore=6,
+            spaceAfter=6
+        )
+    ))
+    
+    # Adicionar rodapé
+    elements.append(Spacer(1, 0.5*inch))
+    elements.append(Paragraph(
+        f"© {generated_at.year} Beirama - Segurança da Informação. Todos os direitos reservados.",
+        ParagraphStyle(
+            'FooterStyle',
+            parent=styles['Normal'],
+            fontSize=8,
+            textColor=colors.grey,
+            alignment=1
+        )
+    ))
+    
+    # Finalizar o PDF
+    _build_with_progress(doc, elements, subtitle_style)
+    pdf_data = buffer.getvalue()
+    buffer.close()
+    
+    return pdf_data
+
+# Função para criar o PDF consolidado do modo portfólio
+@traced()
+def create_portfolio_pdf_report(portfolio_df, roi_totals, figures=None, generated_at=None):
+    generated_at = generated_at or datetime.now()
+    
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer, 
+        pagesize=A4,
+        rightMargin=36,
+        leftMargin=36,
+        topMargin=36,
+        bottomMargin=36,
+        pageCompression=_page_compression(generated_at)
+    )
+    
+    styles = getSampleStyleSheet()
+    elements = []
+    _start_budget()
+    
+    title_style = ParagraphStyle(
+        'TitleStyle',
+        parent=styles['Heading1'],
+        fontSize=20,
+        alignment=1,
+        spaceAfter=16,
+        textColor=colors.darkblue
+    )
+    
+    subtitle_style = ParagraphStyle(
+        'SubtitleStyle',
+        parent=styles['Heading2'],
+        fontSize=16,
+        spaceBefore=16,
+        spaceAfter=12,
+        textColor=colors.darkblue
+    )
+    
+    normal_style = ParagraphStyle(
+        'NormalStyle',
+        parent=styles['Normal'],
+        fontSize=10,
+        spaceAfter=10
+    )
+    
+    date_style = ParagraphStyle(
+        'DateStyle',
+        parent=styles['Normal'],
+        fontSize=10,
+        alignment=1,
+        textColor=colors.gray
+    )
+    
+    table_style = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('FONTSIZE', (0, 1), (-1, -1), 9),
+        ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('BOX', (0, 0), (-1, -1), 1, colors.black),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+    ]
+    
+    elements.append(Paragraph("RELATÓRIO CONSOLIDADO DE PORTFÓLIO", title_style))
+    elements.append(Paragraph(f"{len(portfolio_df)} avaliações", subtitle_style))
+    elements.append(Paragraph(f"Gerado em: {generated_at.strftime(REPORT_DATE_FORMAT)}", date_style))
+    elements.append(Spacer(1, 0.4*inch))
+    
+    # Ranking das empresas pela pontuação geral
+    elements.append(Paragraph("RANKING DE SEGURANÇA", subtitle_style))
+    ranking_data = [["Posição", "Empresa", "Setor", "Infraestrutura", "Políticas", "Proteção", "Geral"]]
+    for row in portfolio_df.itertuples(index=False):
+        ranking_data.append([
+            "-" if pd.isna(row.Posição) else f"{row.Posição}º",
+            Paragraph(row.Rótulo, normal_style),
+            row.Setor,
+            *("-" if pd.isna(value) else format_percent(value) for value in (row.Infraestrutura, row.Políticas, row.Proteção, row.Total))
+        ])
+    ranking_table = Table(ranking_data, colWidths=[0.6*inch, 1.9*inch, 1.0*inch, 1.0*inch, 0.8*inch, 0.8*inch, 0.7*inch], repeatRows=1)
+    ranking_table.setStyle(TableStyle(table_style))
+    elements.append(ranking_table)
+    elements.append(Spacer(1, 0.3*inch))
+    
+    # Gráficos do portfólio, se disponíveis
+    for key, width, height in (('ranking', 500, 300), ('radar', 450, 300)):
+        if figures and key in figures:
+            elements.append(figure_flowable(figures[key], width, height, image_width=700, image_height=450))
+            elements.append(Spacer(1, 0.2*inch))
+    
+    # ROI consolidado
+    if roi_totals["Avaliações com ROI"] > 0:
+        elements.append(Paragraph("ROI CONSOLIDADO", subtitle_style))
+        roi_data = [["Métrica", "Valor"]]
+        for field in ["Investimento", "Economia", "Perda de Clientes", "Impacto Total", "Custo Total Antes", "Custo Total Depois"]:
+            roi_data.append([field, format_currency(roi_totals[field])])
+        roi_data.append(["ROI do Portfólio", format_percent(roi_totals["ROI"])])
+        roi_table = Table(roi_data, colWidths=[3*inch, 2.5*inch])
+        roi_table.setStyle(TableStyle(table_style))
+        elements.append(roi_table)
+        elements.append(Paragraph(
+            f"Valores somados de {roi_totals['Avaliações com ROI']} avaliações com a calculadora de ROI preenchida.",
+            normal_style
+        ))
+    
+    elements.append(Spacer(1, 0.5*inch))
+    elements.append(Paragraph(
+        f"© {generated_at.year} Beirama - Segurança da Informação. Todos os direitos reservados.",
+        ParagraphStyle(
+            'FooterStyle',
+            parent=styles['Normal'],
+            fontSize=8,
+            textColor=colors.grey,
+            alignment=1
+        )
+    ))
+    
+    doc.build(elements)
+    pdf_data = buffer.getvalue()
+    buffer.close()
+    
+    return pdf_data
+
+# Função para montar a comparação por pergunta entre a empresa e o setor
+def question_comparison_rows(encoded_answers, pass_rates):
+    # Retorna [categoria, pergunta, empresa atende?, % do setor que atende] para cada pergunta
+    mask = answers_mask(encoded_answers)
+    return [
+        [question["category"], question["text"], bool(mask >> i & 1), pass_rates[question["key"]]]
+        for i, question in enumerate(QUESTIONS)
+    ]
+
+# Função para reunir os resultados das análises no formato do relatório completo
+def complete_report_data(vulnerability_results=None, roi_results=None, benchmark_results=None,
+                         encoded_answers=None, pass_rates=None, progress=None):
+    """Retorna (resultados, vulnerabilidades, recomendações) para create_pdf_report(report_type="complete")"""
+    all_results = {}
+    all_vulnerabilities = []
+    all_recommendations = []
+    
+    if vulnerability_results:
+        # Adicionar dados de vulnerabilidade
+        for key, value in vulnerability_results.items():
+            if key not in ["Vulnerabilidades", "Recomendações"]:
+                all_results[key] = value
+        
+        # Adicionar vulnerabilidades e recomendações
+        all_vulnerabilities.extend(vulnerability_results.get("Vulnerabilidades", []))
+        all_recommendations.extend(vulnerability_results.get("Recomendações", []))
+    
+    if roi_results:
+        # Adicionar dados de ROI
+        for key, value in roi_results.items():
+            if key not in ["hourly_cost"]:  # Excluir dados auxiliares
+                all_results[key] = value
+    
+    if benchmark_results:
+        # Adicionar dados de benchmarking
+        all_results["Média do Setor"] = benchmark_results["Industry"]["Total"]
+        all_results["Diferença com Setor"] = benchmark_results["Company"]["Total"] - benchmark_results["Industry"]["Total"]
+        
+        # Comparação por pergunta (quando o setor tem avaliações suficientes)
+        if pass_rates and encoded_answers:
+            all_results["Comparação por Pergunta"] = question_comparison_rows(encoded_answers, pass_rates)
+    
+    # Progresso em relação à avaliação anterior, se houver
+    if progress:
+        all_results["Progresso"] = progress
+    
+    return all_results, all_vulnerabilities, all_recommendations
+
+
+# Cache de relatórios PDF
+#
+# Os relatórios são funções puras das entradas, exceto pela data de geração. O cache guarda o PDF
+# gerado com a data fictícia REPORT_PLACEHOLDER_DATE, indexado por uma impressão digital estável das
+# entradas (resultados, textos, empresa, tipo do relatório e JSON das figuras), em memória (LRU
+# limitado em bytes) e em disco. Ao servir, a data fictícia é trocada pela atual diretamente nos
+# bytes: a data tem sempre o mesmo número de caracteres e todos os dígitos têm a mesma largura na
+# Helvetica, então o layout e as posições da tabela xref do PDF continuam válidos.
+
+# Variável de ambiente com o diretório do cache em disco (vazia desativa o disco); o padrão fica no
+# diretório de cache do usuário, fora do diretório de trabalho
+REPORT_CACHE_ENV = 'FORM_SEGURANCA_CACHE_RELATORIOS'
+DEFAULT_REPORT_CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'form_seguranca', 'relatorios'
+)
+
+# Limites de tamanho do cache em memória (por processo) e em disco
+REPORT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+REPORT_DISK_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# O código deste módulo entra na impressão digital: mudanças no layout invalidam o cache em disco
+with open(__file__, 'rb') as _source:
+    REPORT_TEMPLATE_HASH = hashlib.sha256(_source.read()).hexdigest()
+
+_PLACEHOLDER_DATE_TEXT = REPORT_PLACEHOLDER_DATE.strftime(REPORT_DATE_FORMAT).encode()
+_PLACEHOLDER_YEAR_TEXT = f"{REPORT_PLACEHOLDER_DATE.year} Beirama".encode()
+
+
+def _fingerprint_default(value):
+    if isinstance(value, pd.DataFrame):
+        return value.to_json(orient='split', date_format='iso')
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+# JSON das figuras por identidade do objeto: as figuras em cache do app são os mesmos objetos
+# entre reruns, então a serialização (alguns ms por figura) acontece uma vez por figura
+_figure_specs = {}
+
+
+def _figure_spec(figure):
+    entry = _figure_specs.get(id(figure))
+    if entry is not None and entry[0]() is figure:
+        return entry[1]
+    spec = figure.to_json()
+    key = id(figure)
+    _figure_specs[key] = (weakref.ref(figure, lambda _: _figure_specs.pop(key, None)), spec)
+    return spec
+
+
+# Função para calcular a impressão digital das entradas de um relatório
+def report_fingerprint(builder_name, args, figures=None):
+    figure_specs = {key: _figure_spec(figure) for key, figure in (figures or {}).items()}
+    payload = json.dumps(
+        [REPORT_TEMPLATE_HASH, builder_name, args, figure_specs],
+        sort_keys=True,
+        ensure_ascii=False,
+        default=_fingerprint_default
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# Função para inserir a data de geração em um PDF gerado com a data fictícia
+def stamp_report(pdf_data, generated_at):
+    return pdf_data.replace(
+        _PLACEHOLDER_DATE_TEXT, generated_at.strftime(REPORT_DATE_FORMAT).encode()
+    ).replace(
+        _PLACEHOLDER_YEAR_TEXT, f"{generated_at.year} Beirama".encode()
+    )
+
+
+class ReportCache:
+    """PDFs por impressão digital: LRU em memória limitado em bytes e cópia em disco, com métricas"""
+
+    def __init__(self, max_bytes=REPORT_CACHE_MAX_BYTES, directory=None, disk_max_bytes=REPORT_DISK_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._disk_bytes = None
+        self._lock = threading.Lock()
+        self._metrics = {
+            "acertos_memoria": 0,
+            "acertos_disco": 0,
+            "falhas": 0,
+            "remocoes_memoria": 0,
+            "remocoes_disco": 0,
+            "segundos_gerando": 0.0,
+        }
+
+    def get_or_build(self, builder, *args, figures=None, generated_at=None):
+        """PDF de builder(*args, figures=...) com a data de geração atual, gerando apenas se não estiver em cache"""
+        key = report_fingerprint(builder.__name__, args, figures)
+        CACHE_REQUESTS.labels("relatorios").inc()
+        origin = "cache_memoria"
+        pdf_data = self._get_memory(key)
+        if pdf_data is None:
+            origin = "cache_disco"
+            pdf_data = self._get_disk(key)
+            if pdf_data is None:
+                origin = "gerado"
+                CACHE_MISSES.labels("relatorios").inc()
+                started = time.perf_counter()
+                pdf_data = builder(*args, figures=figures, generated_at=REPORT_PLACEHOLDER_DATE)
+                seconds = time.perf_counter() - started
+                PDF_BUILD_SECONDS.labels(builder.__name__).observe(seconds)
+                with self._lock:
+                    self._metrics["falhas"] += 1
+                    self._metrics["segundos_gerando"] += seconds
+                # Relatório com figuras substituídas (orçamento de tempo): entregue, mas não guardado,
+                # para que o próximo pedido tente gerar as figuras de novo
+                if report_degraded():
+                    REPORTS.labels("degradado").inc()
+                    return stamp_report(pdf_data, generated_at or datetime.now())
+                self._put_disk(key, pdf_data)
+            self._put_memory(key, pdf_data)
+        REPORTS.labels(origin).inc()
+        return stamp_report(pdf_data, generated_at or datetime.now())
+
+    def stats(self):
+        """Métricas de uso: acertos, falhas, remoções, ocupação e taxa de acerto"""
+        with self._lock:
+            stats = dict(self._metrics)
+            stats["entradas"] = len(self._entries)
+            stats["bytes"] = self._bytes
+            stats["limite_bytes"] = self.max_bytes
+            stats["bytes_disco"] = self._disk_bytes
+        requests = stats["acertos_memoria"] + stats["acertos_disco"] + stats["falhas"]
+        stats["taxa_acerto"] = (stats["acertos_memoria"] + stats["acertos_disco"]) / requests if requests else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _get_memory(self, key):
+        with self._lock:
+            pdf_data = self._entries.get(key)
+            if pdf_data is not None:
+                self._entries.move_to_end(key)
+                self._metrics["acertos_memoria"] += 1
+            return pdf_data
+
+    def _put_memory(self, key, pdf_data):
+        # Relatórios maiores que o limite inteiro não são guardados em memória
+        if len(pdf_data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = pdf_data
+            self._bytes += len(pdf_data)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self._metrics["remocoes_memoria"] += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def _get_disk(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                pdf_data = f.read()
+            # Atualizar a data de acesso: a limpeza do disco remove primeiro os menos usados
+            os.utime(self._disk_path(key))
+        except OSError:
+            return None
+        with self._lock:
+            self._metrics["acertos_disco"] += 1
+        return pdf_data
+
+    def _put_disk(self, key, pdf_data):
+        if not self.directory:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Gravação atômica: outro processo pode estar lendo o mesmo arquivo
+            tmp_path = f"{self._disk_path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(pdf_data)
+            os.replace(tmp_path, self._disk_path(key))
+        except OSError as e:
+            print(f"Erro ao gravar relatório no cache em disco: {e}")
+            return
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(entry.stat().st_size for entry in os.scandir(self.directory) if entry.name.endswith('.pdf'))
+            else:
+                self._disk_bytes += len(pdf_data)
+            if self._disk_bytes > self.disk_max_bytes:
+                self._prune_disk()
+
+    def _prune_disk(self):
+        # Remove os arquivos acessados há mais tempo até ficar abaixo de 90% do limite
+        entries = sorted(
+            (entry.stat().st_mtime, entry.stat().st_size, entry.path)
+            for entry in os.scandir(self.directory)
+            if entry.name.endswith('.pdf')
+        )
+        self._disk_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._disk_bytes <= 0.9 * self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._disk_bytes -= size
+            self._metrics["remocoes_disco"] += 1
+
+
+# Cache compartilhado pelas sessões do app
+report_cache = ReportCache(directory=os.environ.get(REPORT_CACHE_ENV, DEFAULT_REPORT_CACHE_DIR) or None)
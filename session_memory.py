@@ -0,0 +1,178 @@
+# Contabilidade de memória das sessões e do processo
+#
+# Ao fim de cada rerun o estado da sessão (resultados, entradas e valores dos widgets) é medido
+# chave a chave, e os PDFs das tarefas de relatório concluídas da sessão (ver report_jobs.py) são
+# somados a ele. Acima do limite por sessão, essas tarefas são liberadas, das maiores para as
+# menores (a tarefa sem outras sessões donas é descartada e o PDF volta a ser servido pelo cache
+# de relatórios); resultados e respostas nunca são removidos. O tamanho de cada sessão ativa entra
+# no total do processo, exibido no painel de administração junto com a memória residente (RSS) e
+# os caches compartilhados.
+# Acima do limite do processo, os caches compartilhados de artefatos pesados (PDFs, PNGs e
+# figuras) são esvaziados, no máximo uma vez por intervalo.
+import io
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from plotly.basedatatypes import BaseFigure
+
+from report_jobs import report_jobs
+from reports import _figure_spec, clear_image_cache, report_cache
+
+# Variáveis de ambiente com os limites em MB (0 desativa o limite)
+SESSION_LIMIT_ENV = 'FORM_SEGURANCA_MEMORIA_SESSAO_MB'
+PROCESS_LIMIT_ENV = 'FORM_SEGURANCA_MEMORIA_PROCESSO_MB'
+DEFAULT_SESSION_LIMIT_MB = 32
+DEFAULT_PROCESS_LIMIT_MB = 0
+
+# Sessões sem rerun há mais tempo que isso deixam de contar no total do processo (segundos)
+SESSION_IDLE_SECONDS = 3600
+
+# Intervalo mínimo entre duas limpezas dos caches compartilhados (segundos)
+PROCESS_EVICTION_INTERVAL = 60
+
+_sessions = {}
+_shared_caches = {}
+_lock = threading.Lock()
+_metrics = {"remocoes_sessao": 0, "bytes_removidos_sessao": 0, "limpezas_processo": 0}
+_last_process_eviction = 0.0
+
+
+def _limit_bytes(env, default_mb):
+    try:
+        return int(float(os.environ.get(env, default_mb)) * 1024 * 1024)
+    except ValueError:
+        return int(default_mb * 1024 * 1024)
+
+
+# Função para ler a memória residente do processo (bytes)
+def process_rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # Sem /proc: pico de memória (KB no Linux, bytes no macOS)
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+# Função para estimar o tamanho em memória de um valor e de tudo o que ele contém (bytes)
+def object_size(value, _seen=None):
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, io.BytesIO):
+        return sys.getsizeof(value) + value.getbuffer().nbytes
+    if isinstance(value, BaseFigure):
+        # O JSON da figura (memorizado por objeto) é proporcional aos dados que ela guarda
+        return len(_figure_spec(value))
+
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(object_size(key, _seen) + object_size(item, _seen) for key, item in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(object_size(item, _seen) for item in value)
+    elif hasattr(value, '__dict__') and not isinstance(value, type):
+        size += object_size(vars(value), _seen)
+    return size
+
+
+# Função para registrar um cache compartilhado esvaziado quando o processo passa do limite
+# (registrar de novo o mesmo nome substitui o anterior, já que o script do app roda a cada rerun)
+def register_shared_cache(name, clear):
+    _shared_caches[name] = clear
+
+
+# Função para medir o estado de uma sessão: {chave: bytes}, das maiores para as menores
+def session_usage(state):
+    usage = {key: object_size(value) for key, value in state.to_dict().items()}
+    return dict(sorted(usage.items(), key=lambda item: item[1], reverse=True))
+
+
+# Função para medir o estado de uma sessão e aplicar os limites ao fim do rerun
+def account_session(session_id, state):
+    """Retorna o tamanho da sessão (estado + PDFs das tarefas de relatório dela) após as remoções (bytes)"""
+    jobs = report_jobs.owned(session_id)
+    limit = _limit_bytes(SESSION_LIMIT_ENV, DEFAULT_SESSION_LIMIT_MB)
+    total = sum(session_usage(state).values()) + sum(size for _, size in jobs)
+
+    if limit and total > limit:
+        for job, size in jobs:
+            if total <= limit:
+                break
+            report_jobs.release(job, session_id)
+            total -= size
+            with _lock:
+                _metrics["remocoes_sessao"] += 1
+                _metrics["bytes_removidos_sessao"] += size
+        if total > limit:
+            print(f"Sessão {session_id} acima do limite de memória ({total / 1e6:.1f} MB) sem artefatos a remover")
+
+    now = time.monotonic()
+    with _lock:
+        _sessions[session_id] = (total, now)
+        for stale in [sid for sid, (_, seen) in _sessions.items() if now - seen > SESSION_IDLE_SECONDS]:
+            del _sessions[stale]
+
+    enforce_process_limit()
+    return total
+
+
+# Função para esvaziar os caches compartilhados quando o processo passa do limite
+def enforce_process_limit():
+    global _last_process_eviction
+    limit = _limit_bytes(PROCESS_LIMIT_ENV, DEFAULT_PROCESS_LIMIT_MB)
+    if not limit or process_rss() <= limit:
+        return False
+
+    with _lock:
+        now = time.monotonic()
+        # A memória liberada nem sempre volta ao sistema de imediato; evitar limpezas seguidas
+        if now - _last_process_eviction < PROCESS_EVICTION_INTERVAL:
+            return False
+        _last_process_eviction = now
+        _metrics["limpezas_processo"] += 1
+
+    for name, clear in list(_shared_caches.items()):
+        try:
+            clear()
+        except Exception as e:
+            print(f"Erro ao esvaziar o cache {name}: {e}")
+    return True
+
+
+# Função para resumir a memória do processo e das sessões ativas
+def memory_stats():
+    with _lock:
+        sizes = [size for size, _ in _sessions.values()]
+        stats = dict(_metrics)
+    report_stats = report_cache.stats()
+    stats.update({
+        "rss_mb": process_rss() / 1e6,
+        "limite_processo_mb": _limit_bytes(PROCESS_LIMIT_ENV, DEFAULT_PROCESS_LIMIT_MB) / 1e6,
+        "limite_sessao_mb": _limit_bytes(SESSION_LIMIT_ENV, DEFAULT_SESSION_LIMIT_MB) / 1e6,
+        "sessoes_ativas": len(sizes),
+        "estado_sessoes_mb": sum(sizes) / 1e6,
+        "maior_sessao_mb": max(sizes, default=0) / 1e6,
+        "cache_relatorios_mb": report_stats["bytes"] / 1e6,
+        "caches_compartilhados": list(_shared_caches),
+    })
+    return stats
+
+
+# Caches de artefatos pesados do próprio módulo de relatórios (as figuras são registradas pelo app)
+register_shared_cache("relatórios PDF", report_cache.clear)
+register_shared_cache("imagens PNG", clear_image_cache)
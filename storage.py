@@ -0,0 +1,598 @@
+# Persistência dos dados de usuários e avaliações
+# Usa o Firestore quando o Firebase está configurado nos secrets do Streamlit e,
+# opcionalmente, um banco SQLite local (variável FORM_SEGURANCA_DB) como alternativa.
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import firebase_admin
+from firebase_admin import credentials
+from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists
+import streamlit as st
+
+from assessment import lead_key
+from metrics import CACHE_MISSES, CACHE_REQUESTS, STORAGE_FAILURES
+from tracing import traced
+
+# Coleções utilizadas
+USERS_COLLECTION = 'usuarios'
+ASSESSMENTS_COLLECTION = 'avaliacoes'
+AGGREGATES_COLLECTION = 'agregados'
+
+# Caminho do banco local (opcional) usado quando o Firebase não está disponível
+LOCAL_DB_ENV = 'FORM_SEGURANCA_DB'
+
+# Campo de data usado para ordenar e paginar cada coleção
+ORDER_FIELDS = {
+    USERS_COLLECTION: 'data_cadastro',
+    ASSESSMENTS_COLLECTION: 'data_avaliacao',
+}
+PAGINATION_FIELDS = sorted(set(ORDER_FIELDS.values()))
+
+# Histórico de avaliações por empresa: consulta por lead_id ordenada por data, das mais recentes
+# para as mais antigas (no Firestore, requer o índice composto avaliacoes: lead_id ASC, data_avaliacao DESC)
+HISTORY_FIELD = 'lead_id'
+
+# Gravações assíncronas: poucas threads bastam, pois o trabalho é dominado por I/O de rede
+_writer = ThreadPoolExecutor(max_workers=2, thread_name_prefix="storage-writer")
+
+_backend = None
+_backend_lock = threading.Lock()
+# Nenhum armazenamento configurado (sem secrets do Firebase e sem banco local): não tentar de novo
+_backend_unconfigured = False
+
+# Cache em memória (LRU) das avaliações gravadas e lidas neste processo: retomar uma
+# sessão recém-salva não precisa de leitura no Firestore
+ASSESSMENT_CACHE_SIZE = 1024
+_assessment_cache = OrderedDict()
+_assessment_cache_lock = threading.Lock()
+
+# Índice local (LRU) dos leads já gravados: chave do lead -> hash dos dados de contato.
+# Um cadastro repetido com os mesmos dados não gera nenhuma leitura ou gravação.
+LEAD_INDEX_SIZE = 10000
+_lead_index = OrderedDict()
+_lead_index_lock = threading.Lock()
+
+
+class TTLCache:
+    """Conjunto de chaves com expiração e tamanho máximo (chaves mais antigas saem primeiro)"""
+
+    def __init__(self, ttl, maxsize):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._expires = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add_if_absent(self, key):
+        """Adiciona a chave e retorna True; retorna False se ela já existir e não tiver expirado"""
+        now = time.monotonic()
+        with self._lock:
+            # Como o TTL é fixo, a ordem de inserção é a ordem de expiração
+            while self._expires and next(iter(self._expires.values())) <= now:
+                self._expires.popitem(last=False)
+
+            if key in self._expires:
+                return False
+
+            self._expires[key] = now + self.ttl
+            if len(self._expires) > self.maxsize:
+                self._expires.popitem(last=False)
+            return True
+
+    def discard(self, key):
+        with self._lock:
+            self._expires.pop(key, None)
+
+
+# Tokens de idempotência das gravações já feitas (ou em andamento): reruns do Streamlit e
+# cliques repetidos com o mesmo conteúdo não geram novas gravações
+SUBMIT_TOKEN_TTL = 600
+_submitted = TTLCache(ttl=SUBMIT_TOKEN_TTL, maxsize=50000)
+
+
+# Função para gerar o token de idempotência de uma submissão (sessão + hash do conteúdo)
+def submit_token(session_id, payload):
+    content = json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(f"{session_id}|{content}".encode('utf-8')).hexdigest()
+
+
+# Função para inicializar o Firebase (será chamada automaticamente quando necessário)
+def _firebase_configured():
+    try:
+        return 'firebase' in st.secrets
+    except FileNotFoundError:
+        # Sem arquivo de secrets: Firebase não configurado (não é uma falha)
+        return False
+
+
+def initialize_firebase():
+    """Inicializa a conexão com o Firebase se ainda não estiver inicializada"""
+    if not firebase_admin._apps:
+        try:
+            # Para Streamlit Cloud: usar secrets no novo formato
+            if _firebase_configured():
+                # Obter todas as configurações necessárias dos secrets
+                firebase_config = {
+                    "type": st.secrets.firebase.type,
+                    "project_id": st.secrets.firebase.project_id,
+                    "private_key_id": st.secrets.firebase.private_key_id,
+                    "private_key": st.secrets.firebase.private_key,
+                    "client_email": st.secrets.firebase.client_email,
+                    "client_id": st.secrets.firebase.client_id,
+                    "auth_uri": st.secrets.firebase.auth_uri,
+                    "token_uri": st.secrets.firebase.token_uri,
+                    "auth_provider_x509_cert_url": st.secrets.firebase.auth_provider_x509_cert_url,
+                    "client_x509_cert_url": st.secrets.firebase.client_x509_cert_url
+                }
+
+                # Alternativa: se a codificação base64 for usada
+                # import base64
+                # if 'firebase_json_base64' in st.secrets:
+                #     json_str = base64.b64decode(st.secrets.firebase_json_base64).decode('utf-8')
+                #     firebase_config = json.loads(json_str)
+
+                cred = credentials.Certificate(firebase_config)
+                firebase_admin.initialize_app(cred)
+                return True
+            # Sem configuração do Firebase nos secrets
+            return False
+        except Exception as e:
+            # Em caso de erro, apenas continue - a aplicação funciona sem o Firebase
+            print(f"Erro ao inicializar Firebase: {e}")
+            STORAGE_FAILURES.labels("inicializacao").inc()
+            return False
+    return True
+
+
+# Funções auxiliares para dicionários aninhados de contadores
+def _map_nested(data, fn):
+    return {key: _map_nested(value, fn) if isinstance(value, dict) else fn(value) for key, value in data.items()}
+
+
+def _add_nested(target, deltas):
+    for key, value in deltas.items():
+        if isinstance(value, dict):
+            target[key] = _add_nested(target.get(key) or {}, value)
+        else:
+            target[key] = target.get(key, 0) + value
+    return target
+
+
+class FirestoreBackend:
+    """Acesso às coleções do Firestore"""
+
+    def __init__(self):
+        self.db = firestore.client()
+
+    def add(self, collection, data):
+        self.db.collection(collection).add(data)
+
+    def create(self, collection, doc_id, data):
+        """Cria o documento apenas se ele ainda não existir; retorna False se já existir"""
+        try:
+            self.db.collection(collection).document(doc_id).create(data)
+            return True
+        except AlreadyExists:
+            return False
+
+    def set(self, collection, doc_id, data, merge=False):
+        self.db.collection(collection).document(doc_id).set(data, merge=merge)
+
+    def increment(self, collection, doc_id, deltas):
+        """Soma atomicamente os valores de um dicionário aninhado (sem leitura prévia)"""
+        self.set(collection, doc_id, _map_nested(deltas, firestore.Increment), merge=True)
+
+    def get(self, collection, doc_id):
+        snapshot = self.db.collection(collection).document(doc_id).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    def get_many(self, collection, doc_ids):
+        """Lê vários documentos em uma única chamada; retorna {doc_id: dados} dos existentes"""
+        refs = [self.db.collection(collection).document(doc_id) for doc_id in doc_ids]
+        return {snapshot.id: snapshot.to_dict() for snapshot in self.db.get_all(refs) if snapshot.exists}
+
+    def iter_pages(self, collection, order_field, since=None, after_id=None, page_size=500):
+        """Percorre a coleção ordenada por order_field com paginação por cursor.
+
+        Gera listas de (doc_id, dados) com no máximo page_size documentos; apenas uma
+        página fica em memória por vez. after_id retoma a leitura após esse documento.
+        """
+        query = self.db.collection(collection).order_by(order_field)
+        if since is not None:
+            query = query.where(order_field, '>=', since)
+
+        cursor = None
+        if after_id is not None:
+            cursor = self.db.collection(collection).document(after_id).get()
+            if not cursor.exists:
+                cursor = None
+
+        while True:
+            page_query = query.start_after(cursor) if cursor is not None else query
+            snapshots = list(page_query.limit(page_size).stream())
+            if not snapshots:
+                return
+            yield [(snapshot.id, snapshot.to_dict()) for snapshot in snapshots]
+            if len(snapshots) < page_size:
+                return
+            cursor = snapshots[-1]
+
+    def query_equal(self, collection, field, value, order_field, limit=None, descending=False):
+        """Documentos com field == value, ordenados por order_field, em uma única consulta"""
+        direction = firestore.Query.DESCENDING if descending else firestore.Query.ASCENDING
+        query = self.db.collection(collection).where(field, '==', value).order_by(order_field, direction=direction)
+        if limit is not None:
+            query = query.limit(limit)
+        return [(snapshot.id, snapshot.to_dict()) for snapshot in query.stream()]
+
+
+# Funções auxiliares para serializar datas no banco local
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(value)}")
+
+
+def _restore_dates(data):
+    # Campos de data seguem o padrão "data_*" (ex.: data_cadastro)
+    for key, value in data.items():
+        if key.startswith('data_') and isinstance(value, str):
+            try:
+                data[key] = datetime.fromisoformat(value)
+            except ValueError:
+                pass
+    return data
+
+
+class LocalBackend:
+    """Armazenamento local em SQLite com a mesma interface do FirestoreBackend"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documentos ("
+            " colecao TEXT NOT NULL,"
+            " doc_id TEXT NOT NULL,"
+            " dados TEXT NOT NULL,"
+            " PRIMARY KEY (colecao, doc_id))"
+        )
+        # Índices por expressão para a paginação ordenada por data
+        for field in PAGINATION_FIELDS:
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_documentos_{field} "
+                f"ON documentos (colecao, json_extract(dados, '$.{field}'), doc_id)"
+            )
+        # Índice para o histórico por empresa (igualdade em lead_id + ordem por data)
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_documentos_{HISTORY_FIELD} "
+            f"ON documentos (colecao, json_extract(dados, '$.{HISTORY_FIELD}'), "
+            f"json_extract(dados, '$.{ORDER_FIELDS[ASSESSMENTS_COLLECTION]}'))"
+        )
+        self._conn.commit()
+
+    def add(self, collection, data):
+        self.set(collection, os.urandom(10).hex(), data)
+
+    def create(self, collection, doc_id, data):
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO documentos (colecao, doc_id, dados) VALUES (?, ?, ?)",
+                (collection, doc_id, json.dumps(data, default=_json_default, ensure_ascii=False))
+            )
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def set(self, collection, doc_id, data, merge=False):
+        with self._lock:
+            if merge:
+                row = self._conn.execute(
+                    "SELECT dados FROM documentos WHERE colecao = ? AND doc_id = ?",
+                    (collection, doc_id)
+                ).fetchone()
+                if row:
+                    data = {**json.loads(row[0]), **data}
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documentos (colecao, doc_id, dados) VALUES (?, ?, ?)",
+                (collection, doc_id, json.dumps(data, default=_json_default, ensure_ascii=False))
+            )
+            self._conn.commit()
+
+    def increment(self, collection, doc_id, deltas):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT dados FROM documentos WHERE colecao = ? AND doc_id = ?",
+                (collection, doc_id)
+            ).fetchone()
+            data = _add_nested(json.loads(row[0]) if row else {}, deltas)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documentos (colecao, doc_id, dados) VALUES (?, ?, ?)",
+                (collection, doc_id, json.dumps(data, ensure_ascii=False))
+            )
+            self._conn.commit()
+
+    def get(self, collection, doc_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT dados FROM documentos WHERE colecao = ? AND doc_id = ?",
+                (collection, doc_id)
+            ).fetchone()
+        return _restore_dates(json.loads(row[0])) if row else None
+
+    def get_many(self, collection, doc_ids):
+        found = {}
+        doc_ids = list(doc_ids)
+        # Lotes abaixo do limite de parâmetros do SQLite
+        for start in range(0, len(doc_ids), 500):
+            chunk = doc_ids[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT doc_id, dados FROM documentos WHERE colecao = ? AND doc_id IN ({placeholders})",
+                    [collection, *chunk]
+                ).fetchall()
+            found.update((doc_id, _restore_dates(json.loads(dados))) for doc_id, dados in rows)
+        return found
+
+    def iter_pages(self, collection, order_field, since=None, after_id=None, page_size=500):
+        """Mesma paginação por cursor do FirestoreBackend, usando keyset (valor, doc_id)"""
+        field = f"json_extract(dados, '$.{order_field}')"
+        cursor = None
+        if after_id is not None:
+            data = self.get(collection, after_id)
+            if data is not None:
+                cursor = (_json_default(data[order_field]), after_id)
+
+        while True:
+            sql = f"SELECT doc_id, dados, {field} FROM documentos WHERE colecao = ?"
+            params = [collection]
+            if since is not None:
+                sql += f" AND {field} >= ?"
+                params.append(since.isoformat())
+            if cursor is not None:
+                sql += f" AND ({field} > ? OR ({field} = ? AND doc_id > ?))"
+                params.extend([cursor[0], cursor[0], cursor[1]])
+            sql += f" ORDER BY {field}, doc_id LIMIT ?"
+            params.append(page_size)
+
+            with self._lock:
+                rows = self._conn.execute(sql, params).fetchall()
+            if not rows:
+                return
+            yield [(doc_id, _restore_dates(json.loads(dados))) for doc_id, dados, _ in rows]
+            if len(rows) < page_size:
+                return
+            cursor = (rows[-1][2], rows[-1][0])
+
+    def query_equal(self, collection, field, value, order_field, limit=None, descending=False):
+        """Mesma consulta do FirestoreBackend; com o índice (colecao, field, order_field), filtro e
+        ordenação são resolvidos pelo próprio índice, sem varrer a coleção"""
+        sql = (
+            f"SELECT doc_id, dados FROM documentos WHERE colecao = ? AND json_extract(dados, '$.{field}') = ? "
+            f"ORDER BY json_extract(dados, '$.{order_field}'){' DESC' if descending else ''}"
+        )
+        params = [collection, value]
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [(doc_id, _restore_dates(json.loads(dados))) for doc_id, dados in rows]
+
+
+# Função para obter o backend de armazenamento disponível (ou None)
+def get_backend():
+    """Retorna o Firestore se configurado, senão o banco local (se definido), senão None"""
+    global _backend, _backend_unconfigured
+    if _backend is not None or _backend_unconfigured:
+        return _backend
+
+    with _backend_lock:
+        if _backend is None and not _backend_unconfigured:
+            if initialize_firebase():
+                _backend = FirestoreBackend()
+            elif os.environ.get(LOCAL_DB_ENV):
+                _backend = LocalBackend(os.environ[LOCAL_DB_ENV])
+            elif not _firebase_configured():
+                # Falhas reais de inicialização são tentadas de novo na próxima chamada
+                _backend_unconfigured = True
+    return _backend
+
+
+# Função para executar uma tarefa de armazenamento na thread de gravação
+def run_in_background(fn, *args):
+    return _writer.submit(fn, *args)
+
+
+# Função para calcular o hash dos dados de um lead (todos os campos gravados no upsert)
+def _lead_fingerprint(user_data):
+    return hash(tuple(sorted((field, str(value)) for field, value in user_data.items())))
+
+
+# Função para registrar um lead no índice local
+def _remember_lead(key, fingerprint):
+    with _lead_index_lock:
+        _lead_index[key] = fingerprint
+        _lead_index.move_to_end(key)
+        while len(_lead_index) > LEAD_INDEX_SIZE:
+            _lead_index.popitem(last=False)
+
+
+# Função para salvar um usuário no Firestore
+@traced()
+def save_user_to_firebase(user_data, token=None):
+    """Salva os dados do usuário no Firestore silenciosamente (upsert por e-mail/empresa).
+
+    Com token (ver submit_token), uma submissão já gravada ou em andamento é ignorada
+    sem nenhum acesso à rede.
+    """
+    if token is not None and not _submitted.add_if_absent(token):
+        return True
+
+    saved = _upsert_user(user_data)
+    if not saved and token is not None:
+        # Permitir nova tentativa da mesma submissão após uma falha
+        _submitted.discard(token)
+    return saved
+
+
+# Função para gravar o lead (criação ou atualização)
+def _upsert_user(user_data):
+    try:
+        key = lead_key(user_data['email'], user_data['empresa'])
+        fingerprint = _lead_fingerprint(user_data)
+
+        # Lead já gravado neste processo com os mesmos dados: nada a fazer
+        with _lead_index_lock:
+            known = key in _lead_index
+            if known and _lead_index[key] == fingerprint:
+                _lead_index.move_to_end(key)
+                return True
+
+        backend = get_backend()
+        if backend is None:
+            return False
+
+        now = datetime.now()
+        data = dict(user_data, ultimo_acesso=now)
+
+        # Lead desconhecido: tenta criar o documento com a data de cadastro (sem leitura prévia).
+        # Se já existir, ou se o lead já estiver no índice, apenas atualiza os dados de contato,
+        # preservando a data do primeiro cadastro.
+        created = False
+        if not known:
+            created = backend.create(USERS_COLLECTION, key, dict(data, data_cadastro=now))
+        if not created:
+            backend.set(USERS_COLLECTION, key, data, merge=True)
+
+        _remember_lead(key, fingerprint)
+        return True
+    except Exception as e:
+        # Em caso de erro, apenas continue - o usuário não precisa saber
+        # que houve falha ao salvar no Firebase
+        print(f"Erro ao salvar no Firebase: {e}")
+        STORAGE_FAILURES.labels("cadastro").inc()
+        return False
+
+
+# Função executada na thread de gravação para salvar uma avaliação
+def _write_assessment(assessment_id, record):
+    try:
+        backend = get_backend()
+        if backend is not None:
+            backend.set(ASSESSMENTS_COLLECTION, assessment_id, record)
+            return True
+    except Exception as e:
+        print(f"Erro ao salvar avaliação no Firebase: {e}")
+        STORAGE_FAILURES.labels("gravacao_avaliacao").inc()
+
+    # Falha na gravação: retirar do cache para que uma nova tentativa não seja ignorada
+    with _assessment_cache_lock:
+        if _assessment_cache.get(assessment_id) is record:
+            del _assessment_cache[assessment_id]
+    return False
+
+
+# Função para salvar uma avaliação de forma assíncrona (não bloqueia o rerun do Streamlit)
+def save_assessment_async(assessment_id, record):
+    """Agenda a gravação do registro compacto da avaliação e retorna o Future correspondente.
+
+    Um registro idêntico ao último gravado para a mesma avaliação não é regravado (retorna None).
+    """
+    record = dict(record)
+    record.setdefault('data_avaliacao', datetime.now())
+
+    with _assessment_cache_lock:
+        if _assessment_cache.get(assessment_id) == record:
+            return None
+
+    _cache_assessment(assessment_id, record)
+    return _writer.submit(_write_assessment, assessment_id, record)
+
+
+# Função para guardar uma avaliação no cache em memória
+def _cache_assessment(assessment_id, record):
+    with _assessment_cache_lock:
+        _assessment_cache[assessment_id] = record
+        _assessment_cache.move_to_end(assessment_id)
+        while len(_assessment_cache) > ASSESSMENT_CACHE_SIZE:
+            _assessment_cache.popitem(last=False)
+
+
+# Função para carregar uma avaliação pelo token de sessão
+def load_assessment(assessment_id):
+    """Retorna o registro compacto da avaliação (cache em memória ou armazenamento) ou None"""
+    CACHE_REQUESTS.labels("avaliacoes").inc()
+    with _assessment_cache_lock:
+        record = _assessment_cache.get(assessment_id)
+        if record is not None:
+            _assessment_cache.move_to_end(assessment_id)
+            return record
+    CACHE_MISSES.labels("avaliacoes").inc()
+
+    try:
+        backend = get_backend()
+        if backend is None:
+            return None
+        record = backend.get(ASSESSMENTS_COLLECTION, assessment_id)
+    except Exception as e:
+        print(f"Erro ao carregar avaliação do Firebase: {e}")
+        STORAGE_FAILURES.labels("leitura_avaliacao").inc()
+        return None
+
+    if record is not None:
+        _cache_assessment(assessment_id, record)
+    return record
+
+
+# Função para carregar várias avaliações de uma vez (modo portfólio)
+def load_assessments(assessment_ids):
+    """Retorna {id: registro} das avaliações encontradas, usando o cache e uma leitura em lote"""
+    found = {}
+    missing = []
+    with _assessment_cache_lock:
+        for assessment_id in assessment_ids:
+            record = _assessment_cache.get(assessment_id)
+            if record is not None:
+                found[assessment_id] = record
+            else:
+                missing.append(assessment_id)
+
+    if missing:
+        try:
+            backend = get_backend()
+            if backend is not None:
+                for assessment_id, record in backend.get_many(ASSESSMENTS_COLLECTION, missing).items():
+                    _cache_assessment(assessment_id, record)
+                    found[assessment_id] = record
+        except Exception as e:
+            print(f"Erro ao carregar avaliações do Firebase: {e}")
+            STORAGE_FAILURES.labels("leitura_avaliacoes").inc()
+    return found
+
+
+# Função para carregar o histórico de avaliações de uma empresa (uma consulta indexada)
+def load_assessment_history(lead_id, limit=100):
+    """Retorna [(id, registro)] das limit avaliações mais recentes do lead em ordem cronológica ([] se indisponível)"""
+    try:
+        backend = get_backend()
+        if backend is None:
+            return []
+        # As mais recentes primeiro, para que o limite descarte as mais antigas
+        newest = backend.query_equal(
+            ASSESSMENTS_COLLECTION, HISTORY_FIELD, lead_id, ORDER_FIELDS[ASSESSMENTS_COLLECTION],
+            limit=limit, descending=True
+        )
+        return newest[::-1]
+    except Exception as e:
+        print(f"Erro ao carregar histórico do Firebase: {e}")
+        STORAGE_FAILURES.labels("historico").inc()
+        return []
@@ -0,0 +1,112 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+from api import MAX_BODY_BYTES, ApiError, make_server, parse_answers, parse_roi_inputs, report_job
+from assessment import QUESTIONS
+
+
+def assert_bad_request(parse, raw):
+    with pytest.raises(ApiError) as error:
+        parse(raw)
+    assert error.value.status == 400
+
+
+def test_encoded_answers_round_trip():
+    encoded = "0" * len(QUESTIONS)
+    assert parse_answers(encoded) == {q["key"]: q["options"][0] for q in QUESTIONS}
+
+
+@pytest.mark.parametrize("first", ["²", "٣", "a", "9"])
+def test_encoded_answers_reject_invalid_digits(first):
+    assert_bad_request(parse_answers, first + "0" * (len(QUESTIONS) - 1))
+
+
+def test_answers_reject_unknown_option():
+    answers = {q["key"]: q["options"][0] for q in QUESTIONS}
+    answers[QUESTIONS[0]["key"]] = "Talvez"
+    assert_bad_request(parse_answers, answers)
+
+
+def test_roi_inputs_use_form_defaults():
+    inputs = parse_roi_inputs({"num_incidents": 3, "cost_per_incident": "1500.5"})
+
+    assert inputs["num_incidents"] == 3
+    assert inputs["cost_per_incident"] == 1500.5
+    assert inputs["hours"] == 0
+    assert inputs["reduced_incidents"] == "Não"
+
+
+@pytest.mark.parametrize("raw", [
+    {"num_incidents": True},
+    {"cost_per_incident": False},
+    {"cost_per_incident": float("inf")},
+    {"cost_per_incident": float("nan")},
+    {"cost_per_incident": 10 ** 400},
+    {"num_incidents": "2.5"},
+    {"num_incidents": -1},
+    {"reduced_incidents": ""},
+    {"reduced_incidents": False},
+    {"lost_customers": "sim"},
+    {"campo_desconhecido": 1},
+])
+def test_roi_inputs_reject_invalid_values(raw):
+    assert_bad_request(parse_roi_inputs, raw)
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = make_server("127.0.0.1", 0, api_key="segredo")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def request(server, method, path, body=None, key="segredo"):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=10)
+    headers = {"Authorization": f"Bearer {key}"} if key else {}
+    if isinstance(body, dict):
+        body = json.dumps(body)
+    connection.request(method, path, body=body, headers=headers)
+    response = connection.getresponse()
+    data = response.read()
+    connection.close()
+    return response.status, json.loads(data) if response.getheader("Content-Type") == "application/json" else data
+
+
+def test_health_check_does_not_need_the_key(server):
+    assert request(server, "GET", "/saude", key=None) == (200, {"status": "ok", "relatorios_na_fila": 0})
+
+
+def test_routes_require_the_key(server):
+    assert request(server, "GET", "/perguntas", key=None)[0] == 401
+    assert request(server, "GET", "/perguntas", key="outra")[0] == 401
+    assert request(server, "GET", "/perguntas")[0] == 200
+
+
+def test_score_route(server):
+    status, body = request(server, "POST", "/pontuacao", {"respostas": "0" * len(QUESTIONS)})
+
+    assert status == 200
+    assert body["respostas_codificadas"] == "0" * len(QUESTIONS)
+    assert "Pontuação Geral" in body
+
+
+@pytest.mark.parametrize("path, body, status", [
+    ("/pontuacao", "{", 400),
+    ("/pontuacao", "[]", 400),
+    ("/pontuacao", {"respostas": "²" * len(QUESTIONS)}, 400),
+    ("/pontuacao", "x" * (MAX_BODY_BYTES + 1), 413),
+    ("/desconhecida", {}, 404),
+    ("/relatorio", {"respostas": "0" * len(QUESTIONS)}, 503),
+])
+def test_invalid_requests_get_client_errors(server, path, body, status):
+    assert request(server, "POST", path, body)[0] == status
+
+
+def test_report_requires_an_analysis():
+    assert_bad_request(report_job, {"empresa": "Empresa"})
+    assert_bad_request(report_job, {"setor": "Saúde", "entradas_roi": {}})
@@ -0,0 +1,71 @@
+import pytest
+
+from assessment import (
+    QUESTIONS, benchmark_results_from_record, build_assessment_record, compute_roi_results,
+    compute_vulnerability_results, decode_answers, encode_answers, roi_results_from_record,
+    vulnerability_results_from_record
+)
+
+USER = {"nome_completo": "Ana", "email": "Ana@Empresa.com", "empresa": "Empresa", "industry": "Saúde"}
+
+ROI_INPUTS = {
+    "num_incidents": 4, "cost_per_incident": 2500.0, "hours": 6, "minutes": 30, "hourly_cost": 80.0,
+    "security_investment": 5000.0, "reduced_incidents": "Sim", "new_num_incidents": 1,
+    "new_cost_per_incident": 1000.0, "new_hours": 2, "new_minutes": 15, "lost_customers": "Sim",
+    "num_lost_customers": 3, "average_ticket": 450.0,
+}
+
+
+def mixed_answers():
+    return {q["key"]: q["options"][i % len(q["options"])] for i, q in enumerate(QUESTIONS)}
+
+
+def test_answers_encode_one_digit_per_question():
+    answers = mixed_answers()
+    encoded = encode_answers(answers)
+
+    assert len(encoded) == len(QUESTIONS)
+    assert decode_answers(encoded) == answers
+
+
+def test_record_restores_vulnerability_results():
+    answers = mixed_answers()
+    results = compute_vulnerability_results(answers)
+
+    record = build_assessment_record(USER, encode_answers(answers), results)
+    restored = vulnerability_results_from_record(record)
+
+    assert restored["Vulnerabilidades"] == results["Vulnerabilidades"]
+    assert restored["Recomendações"] == results["Recomendações"]
+    assert restored["Nível de Risco"] == results["Nível de Risco"]
+    assert restored["Pontuação Geral"] == pytest.approx(results["Pontuação Geral"], abs=0.01)
+
+
+def test_record_restores_roi_results():
+    results = compute_roi_results(ROI_INPUTS)
+
+    record = build_assessment_record(USER, roi_inputs=ROI_INPUTS, roi_results=results)
+
+    assert roi_results_from_record(record) == pytest.approx(results)
+
+
+def test_record_restores_benchmark_results():
+    answers = mixed_answers()
+    results = compute_vulnerability_results(answers)
+    industry = {"Infraestrutura": 78, "Políticas": 85, "Proteção": 82, "Total": 82}
+
+    record = build_assessment_record(USER, encode_answers(answers), results, benchmark_results={"Industry": industry})
+
+    restored = benchmark_results_from_record(record)
+    assert restored["Industry"] == industry
+    assert restored["IndustryName"] == "Saúde"
+    assert restored["Company"]["Total"] == round(results["Pontuação Geral"], 2)
+
+
+def test_record_without_analyses_restores_nothing():
+    record = build_assessment_record(USER)
+
+    assert record["setor"] == "Saúde"
+    assert vulnerability_results_from_record(record) is None
+    assert roi_results_from_record(record) is None
+    assert benchmark_results_from_record(record) is None
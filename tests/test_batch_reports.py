@@ -0,0 +1,72 @@
+from datetime import datetime
+
+import pytest
+
+from assessment import (
+    CATALOG_VERSION, QUESTIONS, build_assessment_record, compute_vulnerability_results, decode_answers
+)
+from batch_reports import collect_histories, generate_reports, record_results, report_filename
+
+USER = {"nome_completo": "Ana", "email": "ana@empresa.com", "empresa": "Empresa & Filhos", "industry": "Saúde"}
+
+
+def assessment(option, assessed_at, **fields):
+    encoded = str(option) * len(QUESTIONS)
+    record = build_assessment_record(USER, encoded, compute_vulnerability_results(decode_answers(encoded)))
+    record["data_avaliacao"] = assessed_at
+    return dict(record, **fields)
+
+
+@pytest.fixture
+def records():
+    return {
+        "av3": assessment(0, datetime(2025, 3, 1)),
+        "av1": assessment(1, datetime(2025, 1, 1)),
+        "av2": assessment(0, datetime(2025, 2, 1)),
+        "sem_pontuacao": dict(build_assessment_record(USER), data_avaliacao=datetime(2025, 4, 1)),
+    }
+
+
+def test_histories_group_scored_records_by_date(records):
+    histories = collect_histories(records, all_loaded=True)
+
+    assert list(histories) == [records["av1"]["lead_id"]]
+    assert [record["data_avaliacao"].month for record in histories[records["av1"]["lead_id"]]] == [1, 2, 3]
+
+
+def test_progress_uses_only_earlier_assessments(records):
+    history = collect_histories(records, all_loaded=True)[records["av1"]["lead_id"]]
+
+    assert record_results(records["av1"], history)[4] is None
+    progress = record_results(records["av2"], history)[4]
+    assert len(progress["historico"]["datas"]) == 2
+
+
+def test_answers_of_another_catalog_are_not_reused(records):
+    old = dict(records["av1"], versao_catalogo=CATALOG_VERSION - 1)
+
+    vulnerability_results, roi_results, _, encoded_answers, progress = record_results(old, [])
+
+    assert vulnerability_results is None and encoded_answers is None and progress is None
+    assert roi_results is None
+
+
+def test_report_filename_is_safe():
+    assert report_filename("av1", {"empresa": "Empresa & Filhos / SP"}) == "relatorio_completo_Empresa_Filhos_SP_av1.pdf"
+    assert report_filename("av1", {}) == "relatorio_completo_empresa_av1.pdf"
+
+
+def test_reports_are_written_and_failures_reported(records, tmp_path):
+    records["quebrada"] = dict(records["av1"], lead_id="outra", pontuacoes=[1])
+    context = {
+        'saida': str(tmp_path / "relatorios"), 'graficos': False, 'cache_imagens': None,
+        'benchmarks': {}, 'intervalos': {}, 'taxas': {},
+    }
+
+    summary = generate_reports(records, collect_histories(records, all_loaded=True), context, workers=2)
+
+    assert summary["relatorios"] == 4
+    assert [assessment_id for assessment_id, _ in summary["falhas"]] == ["quebrada"]
+    written = sorted(path.name for path in (tmp_path / "relatorios").iterdir())
+    assert written == [report_filename(assessment_id, records[assessment_id]) for assessment_id in sorted(records) if assessment_id != "quebrada"]
+    assert all(path.read_bytes().startswith(b"%PDF") for path in (tmp_path / "relatorios").iterdir())
@@ -0,0 +1,252 @@
+import os
+
+import numpy as np
+import pytest
+
+import benchmarks
+import storage
+from assessment import (
+    NOT_INFORMED, QUESTIONS, REGIONS, SIZE_BANDS, compute_vulnerability_results, decode_answers
+)
+from benchmarks import (
+    BENCHMARK_KEYS, DEFAULT_BENCHMARKS, MIN_SAMPLES, SECTORS, SECTORS_DOC, SNAPSHOT_KEEP_VERSIONS, BenchmarkCube,
+    BenchmarkService, BenchmarkSnapshot, ScoreIndex, assessment_deltas, histogram_quantile, write_offline_snapshot
+)
+from reports import question_comparison_rows
+from storage import AGGREGATES_COLLECTION, LocalBackend
+
+
+def scores(total):
+    return {"Infraestrutura": total, "Políticas": total, "Proteção": total, "Total": total}
+
+
+@pytest.fixture
+def backend(monkeypatch, tmp_path):
+    local = LocalBackend(str(tmp_path / "form.db"))
+    monkeypatch.setattr(storage, "_backend", local)
+    return local
+
+
+@pytest.fixture
+def queued(monkeypatch):
+    """Gravações em segundo plano guardadas para o teste executar quando quiser"""
+    tasks = []
+    monkeypatch.setattr(benchmarks, "run_in_background", lambda fn, *args: tasks.append((fn, args)))
+    return tasks
+
+
+def run_all(tasks):
+    while tasks:
+        fn, args = tasks.pop(0)
+        fn(*args)
+
+
+def test_record_replaces_the_previous_assessment_of_the_session(backend, queued):
+    service = BenchmarkService()
+    service.record("Saúde", scores(40), 0b1)
+    service.record("Saúde", scores(60), 0b11, previous_scores=scores(40), previous_mask=0b1)
+    run_all(queued)
+
+    stored = backend.get(AGGREGATES_COLLECTION, SECTORS_DOC)["Saúde"]
+    assert stored["n"] == 1
+    assert stored["Total"]["s"] == 60
+    assert stored["q"] == {"n": 1, "0": 1, "1": 1}
+
+
+def test_snapshot_replaces_defaults_after_min_samples(backend, queued):
+    service = BenchmarkService()
+    for i in range(MIN_SAMPLES - 1):
+        service.record("Varejo", scores(50), None)
+    assert service.snapshot().table["Varejo"] == DEFAULT_BENCHMARKS["Varejo"]
+
+    service.record("Varejo", scores(50), None)
+    service._reload()
+    assert service.snapshot().table["Varejo"]["Total"] == 50
+
+
+def test_reload_keeps_increments_not_yet_persisted(backend, queued):
+    backend.increment(AGGREGATES_COLLECTION, SECTORS_DOC, assessment_deltas("Saúde", scores(40), None))
+    service = BenchmarkService()
+    service.record("Saúde", scores(60), None)
+
+    service._reload()
+    assert service._aggregates["Saúde"]["n"] == 2
+
+    # Depois de gravado, o incremento está no documento e não é somado de novo
+    run_all(queued)
+    service._reload()
+    assert service._aggregates["Saúde"]["n"] == 2
+    assert service._aggregates["Saúde"]["Total"]["s"] == 100
+
+
+def test_snapshot_statistics_come_from_the_aggregates():
+    aggregates = {}
+    for total in [40] * 10 + [60] * 10:
+        benchmarks._merge_deltas(aggregates, assessment_deltas("Saúde", scores(total), None))
+
+    stats = BenchmarkSnapshot(aggregates).stats["Saúde"]["Total"]
+
+    assert stats["media"] == pytest.approx(50)
+    assert stats["desvio"] == pytest.approx(10)
+    assert (stats["p25"], stats["p50"], stats["p75"]) == (40, 40, 60)
+
+
+def test_histogram_keeps_fractional_scores():
+    # Pontuações gerais são múltiplos de 5/3
+    assert histogram_quantile({"100": 1}, 0.5) == pytest.approx(100 / 3)
+    assert histogram_quantile({}, 0.5) is None
+
+
+def snapshot_of(sector, totals, masks=None):
+    aggregates = {}
+    for total, mask in zip(totals, masks or [None] * len(totals)):
+        benchmarks._merge_deltas(aggregates, assessment_deltas(sector, scores(total), mask))
+    return BenchmarkSnapshot(aggregates)
+
+
+def test_percentile_counts_companies_strictly_below():
+    snapshot = snapshot_of("Saúde", [40] * 10 + [60] * 10)
+
+    assert snapshot.percentile_ranks("Saúde", scores(40))["Total"] == 0
+    assert snapshot.percentile_ranks("Saúde", scores(60))["Total"] == 50
+    assert snapshot.percentile_ranks("Saúde", scores(50))["Total"] == 50
+    assert snapshot.percentile_ranks("Saúde", scores(100))["Total"] == 100
+
+
+def test_percentile_requires_min_samples():
+    snapshot = snapshot_of("Saúde", [40] * (MIN_SAMPLES - 1))
+
+    assert snapshot.percentile_ranks("Saúde", scores(60)) == {}
+    assert snapshot.percentile_ranks("Varejo", scores(60)) == {}
+
+
+def test_score_index_separates_fractional_scores():
+    # Faixas do histograma em terços de ponto: 100 = 33,3 e 200 = 66,7
+    index = ScoreIndex({"100": 1, "200": 1})
+
+    assert index.percentile(100 / 3) == 0
+    assert index.percentile(200 / 3) == 50
+
+
+def test_question_pass_rates_per_sector():
+    masks = [0b01] * 10 + [0b11] * 10
+    rates = snapshot_of("Saúde", [50] * 20, masks).pass_rates["Saúde"]
+
+    assert rates[QUESTIONS[0]["key"]] == 100
+    assert rates[QUESTIONS[1]["key"]] == 50
+    assert rates[QUESTIONS[2]["key"]] == 0
+
+
+def test_question_pass_rates_ignore_assessments_without_answers():
+    masks = [0b1] * (MIN_SAMPLES - 1) + [None] * 10
+    snapshot = snapshot_of("Saúde", [50] * len(masks), masks)
+
+    assert snapshot.counts["Saúde"] == len(masks)
+    assert "Saúde" not in snapshot.pass_rates
+
+
+def test_question_comparison_rows_mark_the_company_answers():
+    encoded = "".join("0" if i == 0 else str(len(q["options"]) - 1) for i, q in enumerate(QUESTIONS))
+    rates = {q["key"]: 40.0 for q in QUESTIONS}
+
+    rows = question_comparison_rows(encoded, rates)
+
+    assert len(rows) == len(QUESTIONS)
+    # A empresa atende a pergunta quando a resposta não gera a vulnerabilidade dela
+    vulnerabilities = compute_vulnerability_results(decode_answers(encoded))["Vulnerabilidades"]
+    assert [row[2] for row in rows] == [q["vulnerability"] not in vulnerabilities for q in QUESTIONS]
+    assert all(row[3] == 40.0 for row in rows)
+
+
+def cube_rows():
+    """20 avaliações (porte 1, região 1, 2024, nota 50) e 10 (porte 2, região não informada, 2025, nota 80)"""
+    rows = [(1, 1, 1, 2024, 50)] * 20 + [(1, 2, 0, 2025, 80)] * 10
+    sectors, sizes, regions, years, totals = (np.array(column) for column in zip(*rows))
+    return sectors, sizes, regions, years, np.repeat(totals[:, None], len(BENCHMARK_KEYS), axis=1).astype(float)
+
+
+def test_cube_rolls_up_every_axis():
+    cube = BenchmarkCube.from_arrays(*cube_rows())
+    sector = SECTORS[0]
+
+    assert cube.labels["ano"] == [2024, 2025]
+    assert cube.cell()["n"] == 30
+    assert cube.cell(setor=sector)["medias"]["Total"] == pytest.approx(60)
+    assert cube.cell(setor=sector)["desvios"]["Total"] == pytest.approx(200 ** 0.5)
+    assert cube.cell(setor=sector, porte=SIZE_BANDS[0], ano=2024)["n"] == 20
+    assert cube.cell(setor=SECTORS[1])["n"] == 0
+
+
+def test_cube_counts_unreported_values_only_in_the_total():
+    cube = BenchmarkCube.from_arrays(*cube_rows())
+
+    assert cube.cell(regiao=REGIONS[0])["n"] == 20
+    assert cube.cell(regiao=NOT_INFORMED)["n"] == 30
+    assert sum(cell["n"] for cell in cube.slice("regiao").values()) == 20
+    assert {year: cell["n"] for year, cell in cube.slice("ano").items()} == {2024: 20, 2025: 10}
+
+
+def test_cube_query_drops_dimensions_until_enough_samples():
+    cube = BenchmarkCube.from_arrays(*cube_rows())
+    sector = SECTORS[0]
+
+    exact = cube.query(setor=sector, porte=SIZE_BANDS[0], regiao=REGIONS[0])
+    assert exact["filtros"] == {"setor": sector, "porte": SIZE_BANDS[0], "regiao": REGIONS[0]}
+
+    fallback = cube.query(setor=sector, porte=SIZE_BANDS[1], regiao=REGIONS[0])
+    assert fallback["filtros"] == {"setor": sector}
+    assert fallback["n"] == 30
+
+    assert cube.query(min_samples=31, setor=sector) is None
+
+
+@pytest.fixture
+def snapshot_path(monkeypatch, tmp_path):
+    path = str(tmp_path / "cubo")
+    monkeypatch.setenv(benchmarks.BENCHMARK_CUBE_ENV, path)
+    monkeypatch.setattr(benchmarks, "_offline", None)
+    monkeypatch.setattr(benchmarks, "_offline_mtime", None)
+    versions = iter(f"2025010{day}T000000" for day in range(1, 10))
+    monkeypatch.setattr(benchmarks.time, "strftime", lambda fmt: next(versions))
+    return path
+
+
+def intervals_for(sector, n, low, mean, high):
+    intervals = np.zeros((len(SECTORS), len(BENCHMARK_KEYS), 4))
+    intervals[SECTORS.index(sector)] = [n, mean, low, high]
+    return intervals
+
+
+def test_snapshot_reloads_when_a_new_version_is_published(snapshot_path):
+    assert benchmarks.get_offline_snapshot() is None
+
+    write_offline_snapshot(snapshot_path, {"intervalos": intervals_for("Saúde", 30, 40, 50, 60)}, {"anos": []})
+    first = benchmarks.get_offline_snapshot()
+    assert first.version == "20250101T000000"
+    assert benchmarks.get_offline_snapshot() is first
+
+    write_offline_snapshot(snapshot_path, {"intervalos": intervals_for("Saúde", 30, 45, 55, 65)}, {"anos": []})
+    os.utime(f"{snapshot_path}.json", ns=(1, 1))
+    assert benchmarks.get_offline_snapshot().version == "20250102T000000"
+    # A versão anterior continua legível por quem ainda a mapeia
+    assert first.arrays["intervalos"][SECTORS.index("Saúde"), 0, 1] == 50
+
+
+def test_snapshot_keeps_only_the_latest_versions(snapshot_path, tmp_path):
+    for _ in range(SNAPSHOT_KEEP_VERSIONS + 2):
+        write_offline_snapshot(snapshot_path, {"intervalos": np.zeros(1)}, {})
+
+    versions = sorted(name.split(".")[1] for name in os.listdir(tmp_path) if name.endswith(".npy"))
+    assert len(versions) == SNAPSHOT_KEEP_VERSIONS
+    assert versions[-1] == f"2025010{SNAPSHOT_KEEP_VERSIONS + 2}T000000"
+
+
+def test_confidence_intervals_need_min_samples(snapshot_path):
+    write_offline_snapshot(snapshot_path, {"intervalos": intervals_for("Saúde", MIN_SAMPLES, 40, 50, 60)}, {})
+    assert benchmarks.get_confidence_intervals("Saúde")["Total"] == (40, 60, 50)
+    assert benchmarks.get_confidence_intervals("Varejo") == {}
+    assert benchmarks.get_confidence_intervals("Outro") == {}
+
+    write_offline_snapshot(snapshot_path, {"intervalos": intervals_for("Saúde", MIN_SAMPLES - 1, 40, 50, 60)}, {})
+    os.utime(f"{snapshot_path}.json", ns=(1, 1))
+    assert benchmarks.get_confidence_intervals("Saúde") == {}
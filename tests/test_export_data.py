@@ -0,0 +1,85 @@
+import csv
+import json
+from datetime import datetime
+
+import pytest
+
+import export_data
+import storage
+from storage import USERS_COLLECTION, LocalBackend
+
+# Dois leads com a mesma data: a ordem entre eles vem do id do documento
+DATES = {
+    "lead-a": datetime(2025, 1, 1),
+    "lead-b": datetime(2025, 1, 2),
+    "lead-c": datetime(2025, 1, 2),
+    "lead-d": datetime(2025, 1, 3),
+    "lead-e": datetime(2025, 1, 4),
+}
+
+
+@pytest.fixture
+def backend(monkeypatch, tmp_path):
+    local = LocalBackend(str(tmp_path / "form.db"))
+    for doc_id, registered in reversed(DATES.items()):
+        local.set(USERS_COLLECTION, doc_id, {"email": f"{doc_id}@empresa.com", "data_cadastro": registered})
+    monkeypatch.setattr(storage, "_backend", local)
+    return local
+
+
+def page_ids(pages):
+    return [[doc_id for doc_id, _ in page] for page in pages]
+
+
+def test_pages_follow_date_then_id(backend):
+    pages = backend.iter_pages(USERS_COLLECTION, "data_cadastro", page_size=2)
+
+    assert page_ids(pages) == [["lead-a", "lead-b"], ["lead-c", "lead-d"], ["lead-e"]]
+
+
+def test_pages_resume_after_a_document(backend):
+    pages = backend.iter_pages(USERS_COLLECTION, "data_cadastro", after_id="lead-b", page_size=2)
+
+    assert page_ids(pages) == [["lead-c", "lead-d"], ["lead-e"]]
+
+
+def test_pages_since_a_date(backend):
+    pages = backend.iter_pages(USERS_COLLECTION, "data_cadastro", since=datetime(2025, 1, 2), page_size=10)
+
+    assert page_ids(pages) == [["lead-b", "lead-c", "lead-d", "lead-e"]]
+
+
+def read_csv_ids(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return [row["id"] for row in csv.DictReader(f)]
+
+
+def test_export_writes_every_document_once(backend, tmp_path):
+    output = str(tmp_path / "leads.csv")
+
+    total = export_data.export_collection(USERS_COLLECTION, output, page_size=2)
+
+    assert total == 5
+    assert read_csv_ids(output) == list(DATES)
+
+
+def test_interrupted_export_resumes_from_the_checkpoint(backend, tmp_path, monkeypatch):
+    output = str(tmp_path / "leads.csv")
+    checkpoint = str(tmp_path / "leads.checkpoint.json")
+    saved = export_data.save_checkpoint
+
+    def interrupt_after_first_page(path, data):
+        saved(path, data)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(export_data, "save_checkpoint", interrupt_after_first_page)
+    with pytest.raises(KeyboardInterrupt):
+        export_data.export_collection(USERS_COLLECTION, output, checkpoint_path=checkpoint, page_size=2)
+    monkeypatch.setattr(export_data, "save_checkpoint", saved)
+
+    total = export_data.export_collection(USERS_COLLECTION, output, checkpoint_path=checkpoint, page_size=2)
+
+    assert total == 5
+    assert read_csv_ids(output) == list(DATES)
+    with open(checkpoint, encoding='utf-8') as f:
+        assert json.load(f)["ultimo_id"] == "lead-e"
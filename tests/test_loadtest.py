@@ -0,0 +1,28 @@
+import pytest
+
+import reports
+import storage
+from loadtest import STEPS, Session, latency_summary
+from storage import LocalBackend
+
+
+def test_latency_summary_in_milliseconds():
+    summary = latency_summary([0.01] * 98 + [0.5, 1.0])
+
+    assert summary["reruns"] == 100
+    assert summary["p50_ms"] == pytest.approx(10)
+    assert summary["p99_ms"] > 500
+    assert summary["max_ms"] == pytest.approx(1000)
+    assert latency_summary([]) == {"reruns": 0}
+
+
+def test_session_completes_the_whole_journey(monkeypatch, tmp_path):
+    monkeypatch.setattr(storage, "_backend", LocalBackend(str(tmp_path / "form.db")))
+    monkeypatch.setattr(reports.report_cache, "directory", None)
+
+    session = Session(1, seed=0).run()
+
+    assert session.errors == []
+    assert session.report_downloaded
+    # O relatório pode ficar pronto sem nenhum rerun extra de espera
+    assert {step for step, _ in session.reruns} >= set(STEPS) - {"relatorio"}
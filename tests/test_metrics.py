@@ -0,0 +1,89 @@
+import threading
+
+import pytest
+
+import metrics
+import storage
+from metrics import STORAGE_FAILURES, Counter, Histogram, render_metrics
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(metrics, "_registry", [])
+
+
+def run_in_threads(fn, count):
+    threads = [threading.Thread(target=fn) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_counter_sums_the_shards_of_every_thread(registry):
+    counter = Counter("testes", "Teste", ["tipo"])
+
+    run_in_threads(lambda: [counter.labels("a").inc() for _ in range(1000)], 8)
+    counter.labels("a").inc(5)
+
+    assert counter.labels("a").values() == [8005]
+    # As parcelas das threads encerradas foram incorporadas ao total
+    assert len(counter.labels("a")._shards) == 1
+
+
+def test_histogram_renders_cumulative_buckets(registry):
+    histogram = Histogram("duracao", "Duração", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+
+    assert render_metrics().splitlines() == [
+        "# HELP form_seguranca_duracao Duração",
+        "# TYPE form_seguranca_duracao histogram",
+        'form_seguranca_duracao_bucket{le="0.1"} 2',
+        'form_seguranca_duracao_bucket{le="1"} 3',
+        'form_seguranca_duracao_bucket{le="+Inf"} 4',
+        "form_seguranca_duracao_sum 2.65",
+        "form_seguranca_duracao_count 4",
+    ]
+
+
+def test_label_values_are_escaped(registry):
+    Counter("erros", "Erros", ["motivo"]).labels('linha "1"\nlinha 2').inc()
+
+    assert 'form_seguranca_erros_total{motivo="linha \\"1\\"\\nlinha 2"} 1' in render_metrics()
+
+
+@pytest.fixture
+def unset_backend(monkeypatch):
+    monkeypatch.setattr(storage, "_backend", None)
+    monkeypatch.setattr(storage, "_backend_unconfigured", False)
+    monkeypatch.delenv(storage.LOCAL_DB_ENV, raising=False)
+
+
+def init_failures():
+    return STORAGE_FAILURES.labels("inicializacao").values()[0]
+
+
+def test_unconfigured_storage_is_not_a_failure(unset_backend, monkeypatch):
+    checks = []
+    monkeypatch.setattr(storage, "_firebase_configured", lambda: checks.append(1) or False)
+    before = init_failures()
+
+    assert storage.get_backend() is None
+    assert storage.get_backend() is None
+
+    assert init_failures() == before
+    # A segunda chamada não consulta a configuração de novo
+    assert len(checks) == 2
+
+
+def test_failed_storage_init_is_counted_and_retried(unset_backend, monkeypatch):
+    monkeypatch.setattr(storage, "_firebase_configured", lambda: True)
+    # Secrets sem os campos da conta de serviço: a inicialização falha
+    monkeypatch.setattr(storage.st, "secrets", type("Secrets", (), {"firebase": None})())
+    before = init_failures()
+
+    assert storage.get_backend() is None
+    assert storage.get_backend() is None
+
+    assert init_failures() == before + 2
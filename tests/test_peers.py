@@ -0,0 +1,58 @@
+from assessment import QUESTIONS
+from peers import PeerIndex
+
+
+def test_query_ranks_most_common_fixes():
+    # 100 empresas passaram a atender a pergunta 1 e 70 delas também a pergunta 2
+    leads, dates, masks = [], [], []
+    for lead in range(100):
+        leads += [lead, lead]
+        dates += ["2026-01-01", "2026-02-01"]
+        masks += [0, 0b11 if lead < 70 else 0b01]
+
+    result = PeerIndex.from_arrays(leads, dates, masks).query(0, k=50)
+
+    assert result["melhoraram"] == 100
+    assert result["correcoes"] == [
+        {"pergunta": QUESTIONS[0]["key"], "percentual": 100.0},
+        {"pergunta": QUESTIONS[1]["key"], "percentual": 70.0},
+    ]
+
+
+def test_query_skips_questions_already_met():
+    leads = [0, 0, 1, 1]
+    dates = ["2026-01-01", "2026-02-01"] * 2
+    masks = [0b01, 0b11, 0b00, 0b01]
+
+    result = PeerIndex.from_arrays(leads, dates, masks).query(0b01, k=50)
+
+    assert [fix["pergunta"] for fix in result["correcoes"]] == [QUESTIONS[1]["key"]]
+
+
+def test_nearest_widens_the_radius_until_k_assessments():
+    # 3 avaliações a 1 bit de distância, 2 e 2 (empatadas) a 2 bits, 5 a 3 bits
+    masks = [0b1] * 3 + [0b11] * 2 + [0b101] * 2 + [0b111] * 5
+    index = PeerIndex.from_arrays(list(range(len(masks))), ["2026-01-01"] * len(masks), masks)
+
+    radius, profiles, distances = index.nearest(0, k=4)
+
+    assert radius == 2
+    assert profiles.tolist()[0] == 0b1
+    assert sorted(profiles.tolist()[1:]) == [0b11, 0b101]
+    assert distances.tolist() == [1, 2, 2]
+    assert index.query(0, k=4)["total_pares"] == 7
+
+
+def test_query_of_an_empty_index():
+    assert PeerIndex.from_arrays([], [], []).query(0) is None
+
+
+def test_assessments_without_improvement_suggest_nothing():
+    leads = [0, 0, 1, 1]
+    dates = ["2026-01-01", "2026-02-01"] * 2
+    masks = [0b11, 0b01, 0b00, 0b00]
+
+    result = PeerIndex.from_arrays(leads, dates, masks).query(0, k=50)
+
+    assert result["melhoraram"] == 0
+    assert result["correcoes"] == []
@@ -0,0 +1,56 @@
+import io
+
+from perf_suite import DEFAULT_TOLERANCE_MS, compare, measure, output_size, run_suite
+
+
+def results(**cases):
+    return {"casos": cases}
+
+
+def case(median_ms, peak_kb=100.0):
+    return {"mediana_ms": median_ms, "pico_memoria_kb": peak_kb}
+
+
+def test_compare_reports_regressions_above_threshold_and_tolerance():
+    baseline = results(lento=case(100), rapido=case(0.1), memoria=case(10, 100), novo=case(1))
+    current = results(lento=case(130), rapido=case(0.5), memoria=case(10, 150), outro=case(500))
+
+    regressions = compare(current, baseline, threshold=0.2)
+
+    assert regressions == [("lento", "mediana_ms", 100, 130), ("memoria", "pico_memoria_kb", 100, 150)]
+
+
+def test_compare_skips_unavailable_cases():
+    baseline = results(pdf={"indisponivel": "RuntimeError: sem Chrome"}, grafico=case(1))
+    current = results(pdf=case(500), grafico={"indisponivel": "RuntimeError: sem Chrome"})
+
+    assert compare(current, baseline, threshold=0.1, tolerance_ms=DEFAULT_TOLERANCE_MS) == []
+
+
+def test_measure_reports_time_memory_and_size():
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return bytes(2048)
+
+    result = measure(fn, repeats=3)
+
+    # Aquecimento, repetições e uma execução com o rastreamento de memória
+    assert len(calls) == 5
+    assert result["repeticoes"] == 3
+    assert result["tamanho_bytes"] == 2048
+    assert 0 <= result["min_ms"] <= result["mediana_ms"]
+    assert result["pico_memoria_kb"] >= 2
+
+
+def test_output_size_of_each_kind_of_output():
+    assert output_size(io.BytesIO(b"png")) == 3
+    assert output_size({"valor": 1}) is None
+
+
+def test_suite_runs_the_selected_cases():
+    suite = run_suite(repeats=1, name_filter="pontuacao/", log=io.StringIO())
+
+    assert set(suite["casos"]) == {"pontuacao/vulnerabilidade", "pontuacao/codificacao", "pontuacao/roi"}
+    assert all("mediana_ms" in result for result in suite["casos"].values())
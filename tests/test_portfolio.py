@@ -0,0 +1,63 @@
+from datetime import datetime
+
+import pytest
+
+from portfolio import parse_assessment_ids, portfolio_frame, portfolio_roi
+
+
+def record(company, total, date, roi=None):
+    return {
+        "empresa": company, "setor": "Saúde", "data_avaliacao": date,
+        "pontuacoes": [total, total, total, total], "roi_saidas": roi,
+    }
+
+
+# Investimento, Economia, ROI, Perda de Clientes, Impacto Total, Custo Total Antes, Custo Total Depois
+ROI_A = [1000.0, 3000.0, 200.0, 500.0, 3500.0, 4000.0, 1000.0]
+ROI_B = [3000.0, 1000.0, -66.7, 0.0, 1000.0, 2000.0, 1000.0]
+
+
+def test_ids_come_from_links_and_codes():
+    text = "https://app.exemplo.com/?sessao=abc123&x=1, def456;abc123\n\n ghi789"
+
+    assert parse_assessment_ids(text) == ["abc123", "def456", "ghi789"]
+    assert parse_assessment_ids(None) == []
+
+
+def test_frame_ranks_and_labels_repeated_companies():
+    df = portfolio_frame({
+        "a1": record("Alfa", 60.0, datetime(2025, 1, 10)),
+        "a2": record("Alfa", 80.0, datetime(2025, 3, 5)),
+        "b1": record("Beta", 60.0, datetime(2025, 2, 1)),
+        "c1": dict(record("Gama", 0, None), pontuacoes=None),
+    })
+
+    assert df["id"].tolist()[0] == "a2"
+    assert df["Rótulo"].tolist()[0] == "Alfa (05/03/2025)"
+    assert df.set_index("id")["Rótulo"]["b1"] == "Beta"
+    # Empates dividem a posição; avaliações sem pontuação ficam por último, sem posição
+    assert df["Posição"].tolist()[:3] == [1, 2, 2]
+    assert df["id"].tolist()[-1] == "c1"
+    assert df["Posição"].isna().tolist()[-1]
+
+
+def test_roi_totals_only_assessments_with_roi():
+    df = portfolio_frame({
+        "a1": record("Alfa", 60.0, datetime(2025, 1, 10), ROI_A),
+        "b1": record("Beta", 70.0, datetime(2025, 2, 1), ROI_B),
+        "c1": record("Gama", 80.0, datetime(2025, 2, 1)),
+    })
+
+    totals = portfolio_roi(df)
+
+    assert totals["Avaliações com ROI"] == 2
+    assert totals["Investimento"] == 4000
+    assert totals["Economia"] == 4000
+    assert totals["ROI"] == pytest.approx(0)
+
+
+def test_roi_totals_without_investment():
+    totals = portfolio_roi(portfolio_frame({"a1": record("Alfa", 60.0, datetime(2025, 1, 10))}))
+
+    assert totals["ROI"] == 0.0
+    assert totals["Avaliações com ROI"] == 0
@@ -0,0 +1,82 @@
+import pstats
+import time
+
+import pytest
+
+import profiling
+from profiling import finish_rerun_profile, pending_reruns, recent_profiles, request_profile, start_rerun_profile
+
+
+@pytest.fixture
+def profiles(monkeypatch, tmp_path):
+    monkeypatch.setenv(profiling.PROFILE_DIR_ENV, str(tmp_path))
+    monkeypatch.setattr(profiling, "_requests", {})
+    monkeypatch.setattr(profiling, "_active", {})
+    monkeypatch.setattr(profiling, "_recent_files", [])
+    return tmp_path
+
+
+def busy_rerun(seconds=0.05):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+
+
+def test_only_the_requested_reruns_are_profiled(profiles):
+    request_profile("sessao", 2)
+
+    for _ in range(3):
+        start_rerun_profile("sessao")
+        start_rerun_profile("outra")
+        finish_rerun_profile("outra")
+        finish_rerun_profile("sessao")
+
+    assert pending_reruns("sessao") == 0
+    assert [profile["sessao"] for profile in recent_profiles()] == ["sessao", "sessao"]
+    assert len(list(profiles.iterdir())) == 2
+
+
+def test_sampled_profile_is_written_as_collapsed_stacks(profiles):
+    request_profile("sessao", 1)
+
+    start_rerun_profile("sessao", "rerun 1")
+    busy_rerun()
+    path = finish_rerun_profile("sessao")
+
+    with open(path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert path.endswith(".folded")
+    assert any("busy_rerun (test_profiling.py:" in line for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+def test_cprofile_mode_writes_pstats(profiles):
+    request_profile("sessao", 1, mode="cprofile")
+
+    start_rerun_profile("sessao")
+    busy_rerun(0.01)
+    path = finish_rerun_profile("sessao")
+
+    functions = {name for _, _, name in pstats.Stats(path).stats}
+    assert "busy_rerun" in functions
+
+
+def test_interrupted_rerun_keeps_its_profile(profiles):
+    request_profile("sessao", 2)
+
+    start_rerun_profile("sessao")
+    start_rerun_profile("sessao")
+    finish_rerun_profile("sessao")
+
+    assert [profile["status"] for profile in recent_profiles()] == ["concluído", "interrompido"]
+
+
+def test_requests_are_bounded_and_can_be_cancelled(profiles):
+    request_profile("sessao", 1000)
+    assert pending_reruns("sessao") == profiling.MAX_PROFILED_RERUNS
+
+    request_profile("sessao", 0)
+    assert pending_reruns("sessao") == 0
+
+    with pytest.raises(ValueError):
+        request_profile("sessao", 1, mode="desconhecido")
@@ -0,0 +1,73 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from assessment import CATALOG_VERSION, REGIONS, SIZE_BANDS
+from benchmarks import BENCHMARK_KEYS, SECTORS
+from rebuild_benchmarks import bootstrap_intervals, collect_assessments
+from storage import ASSESSMENTS_COLLECTION, LocalBackend
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return LocalBackend(str(tmp_path / "form.db"))
+
+
+def test_collect_assessments_keeps_only_scored_records(backend):
+    backend.set(ASSESSMENTS_COLLECTION, "av1", {
+        "lead_id": "a", "setor": SECTORS[1], "porte": SIZE_BANDS[2], "regiao": REGIONS[4],
+        "data_avaliacao": datetime(2024, 5, 1), "pontuacoes": [10, 20, 30, 20],
+        "versao_catalogo": CATALOG_VERSION, "mascara": 5,
+    })
+    backend.set(ASSESSMENTS_COLLECTION, "av2", {
+        "lead_id": "b", "setor": "Outro", "data_avaliacao": datetime(2025, 1, 1), "pontuacoes": [1, 2, 3, 2],
+        "versao_catalogo": CATALOG_VERSION - 1, "mascara": 7,
+    })
+    backend.set(ASSESSMENTS_COLLECTION, "av3", {"lead_id": "a", "data_avaliacao": datetime(2025, 2, 1)})
+
+    columns = collect_assessments(backend, page_size=1)
+
+    assert columns["setores"].tolist() == [2, 0]
+    assert columns["portes"].tolist() == [3, 0]
+    assert columns["regioes"].tolist() == [5, 0]
+    assert columns["anos"].tolist() == [2024, 2025]
+    assert columns["pontuacoes"].shape == (2, 4)
+    assert columns["leads"].tolist() == [0, 1]
+    # Máscaras de outra versão do catálogo não entram no índice de pares
+    assert columns["mascaras"].tolist() == [5, -1]
+
+
+def test_collect_assessments_of_an_empty_collection(backend):
+    columns = collect_assessments(backend)
+
+    assert columns["pontuacoes"].shape == (0, 4)
+    assert all(len(column) == 0 for column in columns.values())
+    assert columns["setores"].dtype == np.int64
+
+
+def test_bootstrap_interval_contains_the_sector_mean():
+    rng = np.random.default_rng(1)
+    scores = rng.uniform(0, 100, size=(200, 4))
+    sectors = np.array([1] * 150 + [3] * 50)
+
+    intervals = bootstrap_intervals(sectors, scores, resamples=400, workers=2)
+
+    assert intervals.shape == (len(SECTORS), len(BENCHMARK_KEYS), 4)
+    assert intervals[0, :, 0].tolist() == [150] * 4
+    assert intervals[2, :, 0].tolist() == [50] * 4
+    assert intervals[0, :, 1] == pytest.approx(scores[:150].mean(axis=0))
+    assert np.all(intervals[[0, 2], :, 2] < intervals[[0, 2], :, 1])
+    assert np.all(intervals[[0, 2], :, 1] < intervals[[0, 2], :, 3])
+    # Setores sem avaliações ficam zerados
+    assert not intervals[1].any()
+
+
+def test_bootstrap_is_reproducible_with_the_same_seed():
+    scores = np.random.default_rng(2).uniform(0, 100, size=(60, 4))
+    sectors = np.ones(60, dtype=np.int64)
+
+    first = bootstrap_intervals(sectors, scores, resamples=100, workers=2, seed=7)
+    second = bootstrap_intervals(sectors, scores, resamples=100, workers=2, seed=7)
+
+    assert np.array_equal(first, second)
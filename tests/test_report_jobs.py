@@ -0,0 +1,123 @@
+import threading
+
+import pytest
+
+from report_jobs import CANCELLED, DONE, FAILED, QUEUED, ReportJobQueue
+from reports import report_cache
+
+# Relatório "trava" fica em geração até o teste liberar
+release = threading.Event()
+finished = []
+
+
+def fake_report(name, figures=None, generated_at=None):
+    if name == "trava":
+        release.wait(10)
+    if name == "erro":
+        raise ValueError(name)
+    finished.append(name)
+    return f"pdf de {name}".encode()
+
+
+def make_queue(monkeypatch, workers):
+    monkeypatch.setattr(report_cache, "directory", None)
+    report_cache.clear()
+    release.clear()
+    finished.clear()
+    return ReportJobQueue(workers=workers)
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    jobs = make_queue(monkeypatch, 2)
+    yield jobs
+    release.set()
+    jobs.shutdown()
+
+
+@pytest.fixture
+def single_queue(monkeypatch):
+    """Uma thread, ocupada pelo relatório "trava": as tarefas seguintes ficam na fila"""
+    jobs = make_queue(monkeypatch, 1)
+    jobs.submit(fake_report, "trava")
+    yield jobs
+    release.set()
+    jobs.shutdown()
+
+
+def test_same_inputs_share_one_job(queue):
+    first = queue.submit(fake_report, "a", owner="sessao-a")
+    second = queue.submit(fake_report, "a", owner="sessao-b")
+
+    assert second is first
+    assert first.wait(5) and first.status == DONE
+    assert first.pdf_data == b"pdf de a"
+    assert first.owners == {"sessao-a", "sessao-b"}
+    assert queue.submit(fake_report, "b") is not first
+
+
+def test_failed_job_is_not_reused(queue):
+    failed = queue.submit(fake_report, "erro")
+    assert failed.wait(5) and failed.status == FAILED
+
+    retry = queue.submit(fake_report, "erro")
+    assert retry is not failed
+    assert retry.wait(5)
+
+
+def test_job_is_found_by_id(queue):
+    job = queue.submit(fake_report, "a")
+    assert queue.get(job.id) is job
+    assert job.wait(5)
+
+    queue.clear_finished()
+    assert queue.get(job.id) is None
+
+
+def test_changed_inputs_cancel_the_previous_speculative_job(single_queue):
+    previous = single_queue.submit(fake_report, "a", speculative=True, owner="sessao-a")
+    current = single_queue.submit(fake_report, "b", speculative=True, owner="sessao-a")
+
+    assert previous.status == CANCELLED
+    assert current.status == QUEUED
+    release.set()
+    assert current.wait(5) and current.status == DONE
+    assert "a" not in finished
+
+
+def test_same_inputs_keep_the_speculative_job(single_queue):
+    first = single_queue.submit(fake_report, "a", speculative=True, owner="sessao-a")
+
+    assert single_queue.submit(fake_report, "a", speculative=True, owner="sessao-a") is first
+    assert first.status == QUEUED
+
+
+def test_speculative_job_waited_by_another_session_is_kept(single_queue):
+    job = single_queue.submit(fake_report, "a", speculative=True, owner="sessao-a")
+    assert single_queue.submit(fake_report, "a", owner="sessao-b") is job
+    assert not job.speculative
+
+    single_queue.submit(fake_report, "b", speculative=True, owner="sessao-a")
+
+    assert job.status == QUEUED
+    release.set()
+    assert job.wait(5) and job.status == DONE
+
+
+def test_normal_requests_run_before_speculative_ones(single_queue):
+    speculative = single_queue.submit(fake_report, "especulativo", speculative=True, owner="sessao-a")
+    normal = single_queue.submit(fake_report, "normal", owner="sessao-b")
+
+    release.set()
+    assert speculative.wait(5) and normal.wait(5)
+    assert finished == ["trava", "normal", "especulativo"]
+
+
+def test_promoted_job_leaves_the_queue_with_normal_priority(single_queue):
+    waiting = single_queue.submit(fake_report, "especulativo", speculative=True, owner="sessao-a")
+    watched = single_queue.submit(fake_report, "acompanhado", speculative=True, owner="sessao-b")
+    single_queue.promote(watched)
+
+    release.set()
+    assert waiting.wait(5) and watched.wait(5)
+    assert finished == ["trava", "acompanhado", "especulativo"]
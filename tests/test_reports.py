@@ -0,0 +1,157 @@
+import threading
+from datetime import datetime
+
+import plotly.graph_objects as go
+import pytest
+
+import reports
+from assessment import QUESTIONS, compute_vulnerability_results
+from reports import ReportCache
+
+
+@pytest.fixture
+def rasterize(monkeypatch):
+    """Rasterização falsa: figuras com "trava" no JSON ficam presas até o fim do teste"""
+    release = threading.Event()
+
+    def fake_render(fig_json, width, height, scale):
+        if "trava" in fig_json:
+            release.wait(10)
+        return b"png:" + fig_json.encode()
+
+    monkeypatch.setattr(reports, "_render_png", fake_render)
+    monkeypatch.setattr(reports, "_rasterize_pool", None)
+    monkeypatch.setattr(reports, "_rasterize_inflight", {})
+    monkeypatch.setattr(reports, "_rasterize_paused_until", 0.0)
+    monkeypatch.setattr(reports, "RASTERIZE_WORKERS", 1)
+    monkeypatch.setenv(reports.FIGURE_DEADLINE_ENV, "0.2")
+    yield
+    release.set()
+
+
+def test_timed_out_render_does_not_block_later_renders(rasterize, monkeypatch):
+    monkeypatch.setattr(reports, "RASTERIZE_COOLDOWN", 0)
+
+    assert reports._rasterize_with_deadline("trava", 10, 10, 1) == (None, "prazo")
+    # Com uma única thread, a figura seguinte ficaria na fila atrás da rasterização presa
+    assert reports._rasterize_with_deadline("livre", 10, 10, 1) == (b"png:livre", None)
+
+
+def test_timed_out_render_pauses_rasterization(rasterize):
+    assert reports._rasterize_with_deadline("trava", 10, 10, 1) == (None, "prazo")
+    assert reports._rasterize_with_deadline("livre", 10, 10, 1) == (None, "indisponivel")
+
+
+def test_plotly_fig_to_image_respects_the_deadline(rasterize):
+    figure = go.Figure(go.Bar(x=["trava"], y=[1]))
+
+    with pytest.raises(RuntimeError):
+        reports.plotly_fig_to_image(figure)
+
+
+GENERATED_AT = datetime(2025, 6, 30, 14, 5)
+
+
+class Builder:
+    """Gerador falso que conta as chamadas e escreve a data recebida no "PDF" """
+
+    __name__ = "builder_falso"
+
+    def __init__(self, size=10):
+        self.calls = 0
+        self.size = size
+
+    def __call__(self, *args, figures=None, generated_at=None):
+        self.calls += 1
+        return generated_at.strftime(reports.REPORT_DATE_FORMAT).encode() + b"x" * self.size
+
+
+def test_cached_report_is_built_once_and_stamped_on_every_request():
+    cache = ReportCache()
+    builder = Builder()
+
+    first = cache.get_or_build(builder, "empresa", generated_at=GENERATED_AT)
+    second = cache.get_or_build(builder, "empresa", generated_at=datetime(2025, 7, 1, 9, 0))
+
+    assert builder.calls == 1
+    assert first.startswith(b"30/06/2025 14:05")
+    assert second.startswith(b"01/07/2025 09:00")
+    assert cache.stats()["acertos_memoria"] == 1
+
+
+def test_cache_key_covers_arguments_and_figures():
+    cache = ReportCache()
+    builder = Builder()
+
+    cache.get_or_build(builder, "empresa")
+    cache.get_or_build(builder, "outra")
+    cache.get_or_build(builder, "empresa", figures={"barras": go.Figure(go.Bar(y=[1]))})
+    cache.get_or_build(builder, "empresa", figures={"barras": go.Figure(go.Bar(y=[1]))})
+    cache.get_or_build(builder, "empresa", figures={"barras": go.Figure(go.Bar(y=[2]))})
+
+    assert builder.calls == 4
+
+
+def test_memory_cache_evicts_the_least_recently_used_report():
+    builder = Builder(size=84)
+    cache = ReportCache(max_bytes=200)
+
+    cache.get_or_build(builder, "a")
+    cache.get_or_build(builder, "b")
+    cache.get_or_build(builder, "a")
+    cache.get_or_build(builder, "c")
+    assert cache.stats()["bytes"] <= 200
+
+    cache.get_or_build(builder, "a")
+    assert builder.calls == 3
+    cache.get_or_build(builder, "b")
+    assert builder.calls == 4
+
+
+def test_disk_cache_is_shared_between_processes(tmp_path):
+    builder = Builder()
+    ReportCache(directory=str(tmp_path)).get_or_build(builder, "empresa")
+
+    other = ReportCache(directory=str(tmp_path))
+    pdf_data = other.get_or_build(builder, "empresa", generated_at=GENERATED_AT)
+
+    assert builder.calls == 1
+    assert pdf_data.startswith(b"30/06/2025 14:05")
+    assert other.stats()["acertos_disco"] == 1
+
+
+def test_disk_cache_stays_under_its_limit(tmp_path):
+    builder = Builder(size=84)
+    cache = ReportCache(directory=str(tmp_path), disk_max_bytes=250)
+
+    for company in "abcde":
+        cache.get_or_build(builder, company)
+
+    assert sum(path.stat().st_size for path in tmp_path.iterdir()) <= 250
+    assert cache.stats()["remocoes_disco"] > 0
+
+
+def test_degraded_report_is_not_cached(tmp_path, monkeypatch):
+    builder = Builder()
+    cache = ReportCache(directory=str(tmp_path))
+    monkeypatch.setattr(reports, "report_degraded", lambda: 1)
+
+    cache.get_or_build(builder, "empresa")
+    cache.get_or_build(builder, "empresa")
+
+    assert builder.calls == 2
+    assert not list(tmp_path.iterdir())
+
+
+def test_stamped_pdf_carries_the_generation_date():
+    cache = ReportCache()
+    answers = {q["key"]: q["options"][0] for q in QUESTIONS}
+    report_data = reports.complete_report_data(compute_vulnerability_results(answers))
+
+    pdf_data = cache.get_or_build(reports.create_pdf_report, *report_data, "Empresa", "vulnerability",
+                                  generated_at=GENERATED_AT)
+
+    assert pdf_data.startswith(b"%PDF")
+    assert b"30/06/2025 14:05" in pdf_data
+    assert b"2025 Beirama" in pdf_data
+    assert reports._PLACEHOLDER_DATE_TEXT not in pdf_data
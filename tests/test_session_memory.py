@@ -0,0 +1,60 @@
+import session_memory
+from report_jobs import ReportJobQueue
+from reports import report_cache
+
+
+class FakeState(dict):
+    def to_dict(self):
+        return dict(self)
+
+
+def fake_report(size, figures=None, generated_at=None):
+    return b"x" * size
+
+
+def make_queue(monkeypatch):
+    queue = ReportJobQueue(workers=1)
+    monkeypatch.setattr(session_memory, "report_jobs", queue)
+    monkeypatch.setattr(report_cache, "directory", None)
+    return queue
+
+
+def test_session_over_limit_releases_its_report_jobs(monkeypatch):
+    queue = make_queue(monkeypatch)
+    monkeypatch.setenv(session_memory.SESSION_LIMIT_ENV, "1")
+    job = queue.submit(fake_report, 2 * 1024 * 1024, owner="sessao-a")
+    assert job.wait(5)
+
+    total = session_memory.account_session("sessao-a", FakeState(resultados={"Total": 50}))
+
+    assert total < 1024 * 1024
+    assert queue.get(job.id) is None
+    assert queue.owned("sessao-a") == []
+    queue.shutdown()
+
+
+def test_job_shared_with_another_session_is_kept(monkeypatch):
+    queue = make_queue(monkeypatch)
+    monkeypatch.setenv(session_memory.SESSION_LIMIT_ENV, "1")
+    job = queue.submit(fake_report, 2 * 1024 * 1024, owner="sessao-a")
+    queue.submit(fake_report, 2 * 1024 * 1024, owner="sessao-b")
+    assert job.wait(5)
+
+    session_memory.account_session("sessao-a", FakeState())
+
+    assert queue.get(job.id) is job
+    assert job.owners == {"sessao-b"}
+    queue.shutdown()
+
+
+def test_session_under_limit_keeps_its_report_jobs(monkeypatch):
+    queue = make_queue(monkeypatch)
+    monkeypatch.setenv(session_memory.SESSION_LIMIT_ENV, "32")
+    job = queue.submit(fake_report, 1024, owner="sessao-a")
+    assert job.wait(5)
+
+    total = session_memory.account_session("sessao-a", FakeState())
+
+    assert total >= 1024
+    assert queue.get(job.id) is job
+    queue.shutdown()
@@ -0,0 +1,185 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import pytest
+
+import storage
+from assessment import build_assessment_record, lead_key
+from storage import ASSESSMENTS_COLLECTION, USERS_COLLECTION, LocalBackend, TTLCache
+
+
+@pytest.fixture
+def backend(monkeypatch, tmp_path):
+    local = LocalBackend(str(tmp_path / "form.db"))
+    monkeypatch.setattr(storage, "_backend", local)
+    monkeypatch.setattr(storage, "_lead_index", OrderedDict())
+    monkeypatch.setattr(storage, "_assessment_cache", OrderedDict())
+    monkeypatch.setattr(storage, "_submitted", TTLCache(ttl=60, maxsize=100))
+    return local
+
+
+def lead(**fields):
+    return dict({
+        "nome_completo": "Ana", "telefone": "11 99999-0000", "email": "ana@empresa.com",
+        "empresa": "Empresa", "industry": "Saúde", "porte": "Pequena", "regiao": "Sul",
+    }, **fields)
+
+
+def test_returning_lead_keeps_first_registration_date(backend):
+    assert storage.save_user_to_firebase(lead())
+    first = backend.get(USERS_COLLECTION, lead_key("ana@empresa.com", "Empresa"))["data_cadastro"]
+    storage._lead_index.clear()
+
+    assert storage.save_user_to_firebase(lead(nome_completo="Ana Souza"))
+
+    stored = backend.get(USERS_COLLECTION, lead_key("ana@empresa.com", "Empresa"))
+    assert stored["nome_completo"] == "Ana Souza"
+    assert stored["data_cadastro"] == first
+
+
+@pytest.mark.parametrize("field, value", [("porte", "Grande"), ("regiao", "Nordeste")])
+def test_returning_lead_updates_every_field(backend, field, value):
+    assert storage.save_user_to_firebase(lead())
+    assert storage.save_user_to_firebase(lead(**{field: value}))
+
+    assert backend.get(USERS_COLLECTION, lead_key("ana@empresa.com", "Empresa"))[field] == value
+
+
+def test_assessment_is_written_in_background(backend):
+    record = build_assessment_record(lead())
+
+    assert storage.save_assessment_async("av1", record).result(5)
+
+    stored = backend.get(ASSESSMENTS_COLLECTION, "av1")
+    assert stored["lead_id"] == lead_key("ana@empresa.com", "Empresa")
+    assert isinstance(stored["data_avaliacao"], datetime)
+
+
+def test_history_keeps_the_most_recent_assessments(backend):
+    start = datetime(2025, 1, 1)
+    for day in range(5):
+        backend.set(ASSESSMENTS_COLLECTION, f"av{day}", {"lead_id": "lead", "data_avaliacao": start + timedelta(days=day)})
+    backend.set(ASSESSMENTS_COLLECTION, "outra", {"lead_id": "outro", "data_avaliacao": start})
+
+    history = storage.load_assessment_history("lead", limit=3)
+
+    assert [doc_id for doc_id, _ in history] == ["av2", "av3", "av4"]
+
+
+def fail_reads(monkeypatch, backend):
+    def read(*args):
+        raise AssertionError("leitura inesperada do armazenamento")
+    monkeypatch.setattr(backend, "get", read)
+    monkeypatch.setattr(backend, "get_many", read)
+
+
+def test_resume_of_a_fresh_assessment_skips_storage(backend, monkeypatch):
+    record = build_assessment_record(lead())
+    storage.save_assessment_async("av1", record).result(5)
+    fail_reads(monkeypatch, backend)
+
+    assert storage.load_assessment("av1")["lead_id"] == record["lead_id"]
+
+
+def test_resume_after_restart_reads_storage_once(backend, monkeypatch):
+    storage.save_assessment_async("av1", build_assessment_record(lead())).result(5)
+    storage._assessment_cache.clear()
+
+    first = storage.load_assessment("av1")
+    assert first["lead_id"] == lead_key("ana@empresa.com", "Empresa")
+    assert storage.load_assessment("desconhecida") is None
+    fail_reads(monkeypatch, backend)
+
+    assert storage.load_assessment("av1") == first
+
+
+def test_load_assessments_reads_only_missing_records(backend):
+    storage.save_assessment_async("av1", build_assessment_record(lead())).result(5)
+    storage.save_assessment_async("av2", build_assessment_record(lead(empresa="Outra"))).result(5)
+    del storage._assessment_cache["av2"]
+
+    found = storage.load_assessments(["av1", "av2", "desconhecida"])
+
+    assert set(found) == {"av1", "av2"}
+    assert found["av2"]["empresa"] == "Outra"
+
+
+def count_writes(monkeypatch, backend):
+    writes = []
+
+    def counted(write):
+        def wrapper(*args, **kwargs):
+            writes.append(args)
+            return write(*args, **kwargs)
+        return wrapper
+
+    for method in ("create", "set"):
+        monkeypatch.setattr(backend, method, counted(getattr(backend, method)))
+    return writes
+
+
+def test_token_cache_expires_and_stays_bounded(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(storage.time, "monotonic", lambda: now[0])
+    tokens = TTLCache(ttl=10, maxsize=2)
+
+    assert tokens.add_if_absent("a")
+    assert not tokens.add_if_absent("a")
+    now[0] = 11.0
+    assert tokens.add_if_absent("a")
+
+    tokens.add_if_absent("b")
+    tokens.add_if_absent("c")
+    assert tokens.add_if_absent("a")
+
+
+def test_repeated_submission_is_written_once(backend, monkeypatch):
+    token = storage.submit_token("sessao", lead())
+    writes = count_writes(monkeypatch, backend)
+
+    assert storage.save_user_to_firebase(lead(), token=token)
+    storage._lead_index.clear()
+    assert storage.save_user_to_firebase(lead(), token=token)
+
+    assert len(writes) == 1
+    assert storage.submit_token("sessao", lead()) == token
+    assert storage.submit_token("outra", lead()) != token
+
+
+def test_failed_submission_can_be_retried(backend, monkeypatch):
+    token = storage.submit_token("sessao", lead())
+    create = backend.create
+
+    def unavailable(*args):
+        raise OSError("sem conexão")
+
+    monkeypatch.setattr(backend, "create", unavailable)
+    assert not storage.save_user_to_firebase(lead(), token=token)
+
+    monkeypatch.setattr(backend, "create", create)
+    assert storage.save_user_to_firebase(lead(), token=token)
+    assert backend.get(USERS_COLLECTION, lead_key("ana@empresa.com", "Empresa")) is not None
+
+
+def test_identical_assessment_record_is_not_rewritten(backend):
+    record = build_assessment_record(lead())
+
+    assert storage.save_assessment_async("av1", record).result(5)
+    assert storage.save_assessment_async("av1", storage.load_assessment("av1")) is None
+    assert storage.save_assessment_async("av1", dict(record, setor="Varejo")).result(5)
+
+
+def test_failed_assessment_write_allows_a_retry(backend, monkeypatch):
+    record = build_assessment_record(lead())
+    record["data_avaliacao"] = datetime(2025, 1, 1)
+    write = backend.set
+
+    def unavailable(*args, **kwargs):
+        raise OSError("sem conexão")
+
+    monkeypatch.setattr(backend, "set", unavailable)
+    assert not storage.save_assessment_async("av1", record).result(5)
+
+    monkeypatch.setattr(backend, "set", write)
+    assert storage.save_assessment_async("av1", record).result(5)
+    assert backend.get(ASSESSMENTS_COLLECTION, "av1")["lead_id"] == record["lead_id"]
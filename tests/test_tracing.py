@@ -0,0 +1,94 @@
+import json
+import threading
+from collections import deque
+
+import pytest
+
+import tracing
+from tracing import finish_rerun, recent_timelines, section, span, start_rerun, traced
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(tracing, "_enabled", True)
+    monkeypatch.setattr(tracing, "_timelines", deque(maxlen=tracing.MAX_TIMELINES))
+    monkeypatch.setattr(tracing, "_local", threading.local())
+
+
+@traced()
+def helper():
+    with span("interno"):
+        pass
+
+
+def spans(timeline):
+    return [(span_data["nome"], span_data["nivel"]) for span_data in timeline["spans"]]
+
+
+def test_spans_nest_under_the_current_section(enabled):
+    start_rerun("1")
+    section("formulario")
+    helper()
+    section("relatorio")
+    helper()
+    finish_rerun()
+
+    timeline = recent_timelines()[0]
+    assert timeline["status"] == "concluído"
+    assert spans(timeline) == [
+        ("formulario", 0), ("helper", 1), ("interno", 2), ("relatorio", 0), ("helper", 1), ("interno", 2)
+    ]
+    assert all(span_data["duracao_ms"] >= 0 for span_data in timeline["spans"])
+
+
+def test_new_rerun_closes_the_interrupted_one(enabled):
+    start_rerun("1")
+    section("formulario")
+    start_rerun("2")
+    finish_rerun()
+
+    latest, interrupted = recent_timelines()
+    assert latest["rotulo"] == "2"
+    assert interrupted["status"] == "interrompido"
+    assert interrupted["spans"][0]["duracao_ms"] >= 0
+
+
+def test_disabled_tracing_records_nothing(monkeypatch):
+    monkeypatch.setattr(tracing, "_enabled", False)
+    monkeypatch.setattr(tracing, "_timelines", deque(maxlen=tracing.MAX_TIMELINES))
+    monkeypatch.setattr(tracing, "_local", threading.local())
+
+    start_rerun("1")
+    section("formulario")
+    helper()
+    finish_rerun()
+
+    assert recent_timelines() == []
+    assert span("qualquer") is tracing._NULL_SPAN
+
+
+def test_only_the_latest_timelines_are_kept(enabled):
+    for rerun in range(tracing.MAX_TIMELINES + 5):
+        start_rerun(str(rerun))
+        finish_rerun()
+
+    timelines = recent_timelines()
+    assert len(timelines) == tracing.MAX_TIMELINES
+    assert timelines[0]["rotulo"] == str(tracing.MAX_TIMELINES + 4)
+
+
+def test_chrome_trace_has_one_thread_per_rerun(enabled):
+    for rerun in "12":
+        start_rerun(rerun)
+        section("formulario")
+        helper()
+        finish_rerun()
+
+    events = json.loads(tracing.export_chrome_trace(recent_timelines()))["traceEvents"]
+
+    assert [(event["name"], event["tid"]) for event in events] == [
+        ("rerun 1", 1), ("formulario", 1), ("helper", 1), ("interno", 1),
+        ("rerun 2", 2), ("formulario", 2), ("helper", 2), ("interno", 2),
+    ]
+    assert {event["cat"] for event in events if event["name"] == "formulario"} == {"secao"}
+    assert all(event["ph"] == "X" and event["dur"] >= 0 for event in events)
@@ -0,0 +1,220 @@
+# Instrumentação leve dos reruns do app (spans)
+#
+# Cada rerun do script gera uma linha do tempo com as seções de main.py (marcadas com
+# section) e os spans dos helpers instrumentados (traced/span), aninhados pela ordem de
+# chamada. As últimas linhas do tempo ficam em memória para o painel de administração e podem
+# ser exportadas em JSON ou no formato Chrome trace (chrome://tracing, Perfetto).
+#
+# Com a instrumentação desativada (padrão), traced e section apenas verificam uma variável
+# global; nada é alocado nem medido.
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from datetime import datetime
+from functools import wraps
+
+# Variável de ambiente que ativa a instrumentação desde o início do processo
+TRACING_ENV = 'FORM_SEGURANCA_TRACING'
+
+# Linhas do tempo guardadas em memória (as mais antigas saem primeiro)
+MAX_TIMELINES = 50
+
+_enabled = os.environ.get(TRACING_ENV, '') not in ('', '0')
+_local = threading.local()
+_timelines = deque(maxlen=MAX_TIMELINES)
+_timelines_lock = threading.Lock()
+_NULL_SPAN = nullcontext()
+
+
+class Timeline:
+    """Spans de um rerun: [nome, início, fim, nível] em nanossegundos desde o início do rerun"""
+
+    def __init__(self, label):
+        self.label = label
+        self.started_at = datetime.now()
+        self.origin = time.perf_counter_ns()
+        self.thread = threading.current_thread()
+        self.spans = []
+        self.depth = 0
+        self.section = None
+        self.last = 0
+        self.finished = False
+        self.status = "em andamento"
+
+    def now(self):
+        self.last = time.perf_counter_ns() - self.origin
+        return self.last
+
+    def open(self, name):
+        index = len(self.spans)
+        self.spans.append([name, self.now(), None, self.depth])
+        self.depth += 1
+        return index
+
+    def close(self, index):
+        self.spans[index][2] = self.now()
+        self.depth = self.spans[index][3]
+
+    def finish(self, status):
+        # Spans que ficaram abertos (rerun interrompido) terminam no último instante registrado
+        if status == "concluído":
+            self.now()
+        for span_data in self.spans:
+            if span_data[2] is None:
+                span_data[2] = self.last
+        self.depth = 0
+        self.section = None
+        self.finished = True
+        self.status = status
+
+    def current_status(self):
+        if not self.finished and not self.thread.is_alive():
+            return "interrompido"
+        return self.status
+
+    def to_dict(self):
+        return {
+            "rotulo": self.label,
+            "inicio": self.started_at.isoformat(timespec="milliseconds"),
+            "duracao_ms": self.last / 1e6,
+            "status": self.current_status(),
+            "spans": [
+                {"nome": name, "inicio_ms": start / 1e6, "duracao_ms": ((end if end is not None else self.last) - start) / 1e6, "nivel": depth}
+                for name, start, end, depth in self.spans
+            ],
+        }
+
+
+class _Span:
+    __slots__ = ("name", "timeline", "index")
+
+    def __init__(self, name, timeline):
+        self.name = name
+        self.timeline = timeline
+
+    def __enter__(self):
+        self.index = self.timeline.open(self.name)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timeline.close(self.index)
+        return False
+
+
+def is_enabled():
+    return _enabled
+
+
+def set_enabled(value):
+    global _enabled
+    _enabled = bool(value)
+
+
+# Função para iniciar a linha do tempo de um rerun (na thread do script)
+def start_rerun(label=""):
+    previous = getattr(_local, 'timeline', None)
+    if previous is not None and not previous.finished:
+        # O rerun anterior desta thread foi interrompido (por exemplo, por st.rerun)
+        previous.finish("interrompido")
+    _local.timeline = None
+    if not _enabled:
+        return
+
+    timeline = Timeline(label)
+    _local.timeline = timeline
+    with _timelines_lock:
+        _timelines.append(timeline)
+
+
+# Função para encerrar a linha do tempo do rerun atual
+def finish_rerun():
+    timeline = getattr(_local, 'timeline', None)
+    if timeline is not None and not timeline.finished:
+        timeline.finish("concluído")
+
+
+# Função para marcar o início de uma seção do script (encerra a seção anterior)
+def section(name):
+    if not _enabled:
+        return
+    timeline = getattr(_local, 'timeline', None)
+    if timeline is None or timeline.finished:
+        return
+    if timeline.section is not None:
+        timeline.close(timeline.section)
+    timeline.depth = 0
+    timeline.section = timeline.open(name)
+
+
+# Função para medir um trecho de código: with span("nome"): ...
+def span(name):
+    if not _enabled:
+        return _NULL_SPAN
+    timeline = getattr(_local, 'timeline', None)
+    if timeline is None or timeline.finished:
+        return _NULL_SPAN
+    return _Span(name, timeline)
+
+
+# Decorador que mede cada chamada da função como um span
+def traced(name=None):
+    def decorator(fn):
+        label = name or fn.__name__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Função para obter as últimas linhas do tempo (mais recentes primeiro)
+def recent_timelines(limit=MAX_TIMELINES):
+    with _timelines_lock:
+        timelines = list(_timelines)[-limit:]
+    return [timeline.to_dict() for timeline in reversed(timelines)]
+
+
+def clear_timelines():
+    with _timelines_lock:
+        _timelines.clear()
+
+
+# Função para exportar as linhas do tempo em JSON
+def export_json(timelines):
+    return json.dumps(timelines, ensure_ascii=False, indent=2)
+
+
+# Função para exportar as linhas do tempo no formato Chrome trace (eventos completos, "ph": "X")
+def export_chrome_trace(timelines):
+    events = []
+    pid = os.getpid()
+    for tid, timeline in enumerate(reversed(timelines), start=1):
+        origin_us = datetime.fromisoformat(timeline["inicio"]).timestamp() * 1e6
+        events.append({
+            "name": f"rerun {timeline['rotulo']}".strip(),
+            "cat": "rerun",
+            "ph": "X",
+            "ts": origin_us,
+            "dur": timeline["duracao_ms"] * 1000,
+            "pid": pid,
+            "tid": tid,
+            "args": {"status": timeline["status"]},
+        })
+        for span_data in timeline["spans"]:
+            events.append({
+                "name": span_data["nome"],
+                "cat": "secao" if span_data["nivel"] == 0 else "span",
+                "ph": "X",
+                "ts": origin_us + span_data["inicio_ms"] * 1000,
+                "dur": span_data["duracao_ms"] * 1000,
+                "pid": pid,
+                "tid": tid,
+            })
+    return json.dumps({"traceEvents": events, "displayTimeUnit": "ms"})